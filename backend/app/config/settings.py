@@ -7,6 +7,34 @@ class Settings(BaseSettings):
     database_name: str = ""
     collection_name: str = ""
     allowed_origins: str = ""
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 10
+    mongodb_server_selection_timeout_ms: int = 5000
+    metadata_collection_name: str = "metadata"
+    facets_collection_name: str = "facets"
+    clusters_collection_name: str = "clusters"
+    dataset_version_poll_seconds: float = 5.0
+    engine_enabled: bool = False
+    engine_refresh_seconds: float = 0.0
+    snapshot_dir: str = ""
+    count_cache_size: int = 1024
+    count_cache_ttl_seconds: float = 300.0
+    response_cache_size: int = 512
+    response_cache_ttl_seconds: float = 60.0
+    cache_control_max_age: int = 30
+    export_batch_size: int = 500
+    viewport_max_trucks: int = 200
+    fuzzy_max_matches: int = 1000
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 5
+    schedule_timezone: str = "America/Los_Angeles"
+    query_max_time_ms: int = 2000
+    count_max_time_ms: int = 500
+    max_concurrent_queries: int = 50
+    max_queued_queries: int = 200
+    queue_timeout_seconds: float = 1.0
+    retry_after_seconds: int = 1
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config.settings import get_settings
+from app.database.indexes import CLUSTER_INDEXES, ensure_indexes
+from app.services.clusters import BBox, ClusterTable, cell_range, cluster_zoom
+
+settings = get_settings()
+
+INSERT_BATCH_SIZE = 1000
+POSITION_PROJECTION = {"_id": 0, "latitude": 1, "longitude": 1, "status": 1}
+
+# Dataset versions whose cluster tables are known to be complete; versions never change once built.
+_built_versions: Set[int] = set()
+
+def _marker_id() -> str:
+    return f"{settings.collection_name}.clusters"
+
+async def rebuild_cluster_tables(db: AsyncIOMotorDatabase, version: int) -> int:
+    """Recompute every zoom's cluster grid and store it under the dataset version. Called by init_db.py after every load.
+
+    New rows are written before the version marker moves, so readers always find a
+    complete table. The previous version's rows are kept until the next rebuild, since
+    workers that cached that version keep reading them for a while after the swap.
+    Returns the number of cells stored.
+    """
+    table = ClusterTable()
+    async for doc in db[settings.collection_name].find({}, POSITION_PROJECTION):
+        table.add(doc.get("latitude"), doc.get("longitude"), doc.get("status"))
+    clusters = db[settings.clusters_collection_name]
+    await ensure_indexes(clusters, CLUSTER_INDEXES)
+    await clusters.delete_many({"version": version})
+    documents = table.documents(version)
+    stored = 0
+    while batch := list(islice(documents, INSERT_BATCH_SIZE)):
+        await clusters.insert_many(batch, ordered=False)
+        stored += len(batch)
+    marker = await db[settings.metadata_collection_name].find_one({"_id": _marker_id()})
+    kept = [version] if not marker or marker.get("version") is None else [marker["version"], version]
+    await db[settings.metadata_collection_name].replace_one(
+        {"_id": _marker_id()},
+        {"version": version, "updated_at": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    await clusters.delete_many({"version": {"$nin": kept}})
+    return stored
+
+async def read_clusters(
+    db: AsyncIOMotorDatabase,
+    version: int,
+    bbox: BBox,
+    zoom: int,
+    max_time_ms: Optional[int] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """Stored clusters overlapping `bbox`, or None when no table was built for this dataset version."""
+    if version not in _built_versions:
+        marker = await db[settings.metadata_collection_name].find_one({"_id": _marker_id()})
+        if not marker or marker.get("version") != version:
+            return None
+        _built_versions.add(version)
+    zoom = cluster_zoom(zoom)
+    x0, y0, x1, y1 = cell_range(bbox, zoom)
+    cursor = db[settings.clusters_collection_name].find(
+        {"version": version, "zoom": zoom, "x": {"$gte": x0, "$lte": x1}, "y": {"$gte": y0, "$lte": y1}},
+        {"_id": 0, "latitude": 1, "longitude": 1, "count": 1, "status": 1}
+    ).sort([("x", 1), ("y", 1)])
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    return await cursor.to_list(length=None)
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from app.database.mongodb import mongodb
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+async def read_dataset_version(db: AsyncIOMotorDatabase) -> int:
+    """Read the version stamp of the food trucks dataset (0 if it was never loaded)."""
+    doc = await db[settings.metadata_collection_name].find_one({"_id": settings.collection_name})
+    return int(doc["version"]) if doc else 0
+
+async def bump_dataset_version(db: AsyncIOMotorDatabase) -> int:
+    """Increment the dataset version stamp. Called by init_db.py after every load."""
+    doc = await db[settings.metadata_collection_name].find_one_and_update(
+        {"_id": settings.collection_name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["version"])
+
+class DatasetVersion:
+    """Caches the dataset version so request handlers don't pay a round trip to read it."""
+
+    def __init__(self):
+        self._value: Optional[int] = None
+        self._checked_at = 0.0
+
+    async def fetch(self) -> int:
+        """Read the version from MongoDB and refresh the cached value."""
+        self._value = await read_dataset_version(mongodb.db)
+        self._checked_at = time.monotonic()
+        return self._value
+
+    async def current(self) -> int:
+        """Return the cached version, re-reading it at most every `dataset_version_poll_seconds`."""
+        if self._value is None or time.monotonic() - self._checked_at >= settings.dataset_version_poll_seconds:
+            return await self.fetch()
+        return self._value
+
+    def reset(self):
+        self._value = None
+        self._checked_at = 0.0
+
+dataset_version = DatasetVersion()
@@ -0,0 +1,72 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, TypedDict
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+FACET_FIELDS = ("status", "facility_type")
+# Food items kept in the summary; requests can ask for any prefix of this list.
+SUMMARY_FOOD_ITEMS = 100
+
+class FacetSummary(TypedDict):
+    """Counts per facet value as [{value, count}], and the number of trucks counted."""
+    status: List[Dict[str, Any]]
+    facility_type: List[Dict[str, Any]]
+    food_items: List[Dict[str, Any]]
+    total: int
+
+def top_counts(counts: Counter, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Facet values as [{value, count}], most frequent first and ties by value."""
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0] is None, item[0] or ""))
+    return [{"value": value, "count": count} for value, count in ordered[:limit]]
+
+def facet_pipeline(filters: Dict[str, Any], food_items_limit: int) -> List[Dict[str, Any]]:
+    """One aggregation returning every facet, used for query-scoped facets and the summary rebuild."""
+    def group(field: str) -> List[Dict[str, Any]]:
+        return [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}]
+
+    facets = {field: group(field) for field in FACET_FIELDS}
+    facets["food_items"] = [{"$unwind": "$food_items"}, *group("food_items"), {"$limit": food_items_limit}]
+    facets["total"] = [{"$count": "count"}]
+    pipeline = [{"$match": filters}] if filters else []
+    return pipeline + [{"$facet": facets}]
+
+def parse_facet_result(result: Dict[str, Any]) -> FacetSummary:
+    def buckets(field: str) -> List[Dict[str, Any]]:
+        return [{"value": bucket["_id"], "count": bucket["count"]} for bucket in result.get(field, [])]
+
+    return FacetSummary(
+        status=buckets("status"),
+        facility_type=buckets("facility_type"),
+        food_items=buckets("food_items"),
+        total=result["total"][0]["count"] if result.get("total") else 0
+    )
+
+async def aggregate_facets(
+    collection,
+    filters: Dict[str, Any],
+    food_items_limit: int,
+    max_time_ms: Optional[int] = None
+) -> FacetSummary:
+    options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+    results = await collection.aggregate(facet_pipeline(filters, food_items_limit), **options).to_list(length=1)
+    return parse_facet_result(results[0] if results else {})
+
+async def rebuild_facet_summary(db: AsyncIOMotorDatabase, version: int) -> FacetSummary:
+    """Recount every facet and store it under the dataset version. Called by init_db.py after every load."""
+    facets = await aggregate_facets(db[settings.collection_name], {}, SUMMARY_FOOD_ITEMS)
+    await db[settings.facets_collection_name].replace_one(
+        {"_id": settings.collection_name},
+        {**facets, "version": version, "updated_at": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    return facets
+
+async def read_facet_summary(db: AsyncIOMotorDatabase, version: int) -> Optional[FacetSummary]:
+    """The stored summary, or None when it is missing or was built for another dataset version."""
+    doc = await db[settings.facets_collection_name].find_one({"_id": settings.collection_name})
+    if not doc or doc.get("version") != version:
+        return None
+    return FacetSummary(status=doc["status"], facility_type=doc["facility_type"], food_items=doc["food_items"], total=doc["total"])
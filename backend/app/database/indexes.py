@@ -0,0 +1,32 @@
+from typing import List
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, GEOSPHERE, IndexModel
+
+# Every index the food trucks collection needs. Add new ones here rather than
+# creating them ad hoc; `ensure_indexes` applies the registry at startup and after ingest.
+FOOD_TRUCK_INDEXES: List[IndexModel] = [
+    IndexModel([("locationid", ASCENDING)], name="locationid_unique", unique=True),
+    IndexModel([("status", ASCENDING), ("locationid", ASCENDING)], name="status_locationid"),
+    IndexModel([("permit", ASCENDING)], name="permit"),
+    IndexModel([("search_grams", ASCENDING)], name="search_grams"),
+    IndexModel([("food_tokens", ASCENDING)], name="food_tokens"),
+    IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    # Bounding-box range scans for /foodtrucks/viewport: latitude range, longitude checked in the index.
+    IndexModel([("latitude", ASCENDING), ("longitude", ASCENDING)], name="latitude_longitude"),
+]
+
+# The per-zoom cluster grids init_db.py stores next to the collection.
+CLUSTER_INDEXES: List[IndexModel] = [
+    IndexModel([("version", ASCENDING), ("zoom", ASCENDING), ("x", ASCENDING), ("y", ASCENDING)], name="version_zoom_x_y"),
+]
+
+async def ensure_indexes(collection: AsyncIOMotorCollection, indexes: List[IndexModel] = FOOD_TRUCK_INDEXES) -> List[str]:
+    """Create the registered indexes that don't exist yet and return their names.
+
+    Safe to call repeatedly: existing indexes are left untouched.
+    """
+    existing = await collection.index_information()
+    missing = [index for index in indexes if index.document["name"] not in existing]
+    if not missing:
+        return []
+    return await collection.create_indexes(missing)
@@ -1,4 +1,8 @@
+from typing import Any, Dict
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from app.database.indexes import ensure_indexes
+from app.database.monitoring import event_listeners
+from app.services.metrics import mongodb_pool_connections
 from app.config.settings import get_settings
 
 settings = get_settings()
@@ -9,14 +13,38 @@ class MongoDB:
 
     @classmethod
     async def connect_to_database(cls):
-        cls.client = AsyncIOMotorClient(settings.mongodb_url)
+        cls.client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+            event_listeners=event_listeners()
+        )
         cls.db = cls.client[settings.database_name]
 
+    @classmethod
+    async def ping(cls):
+        """Round trip to the server; raises if none is reachable within serverSelectionTimeoutMS."""
+        await cls.client.admin.command("ping")
+
+    @classmethod
+    def pool_state(cls) -> Dict[str, Any]:
+        return {
+            "max_pool_size": settings.mongodb_max_pool_size,
+            "min_pool_size": settings.mongodb_min_pool_size,
+            "open_connections": int(mongodb_pool_connections.value(state="open")),
+            "connections_in_use": int(mongodb_pool_connections.value(state="in_use"))
+        }
+
     @classmethod
     async def close_database_connection(cls):
         if cls.client:
             cls.client.close()
 
+    @classmethod
+    async def ensure_indexes(cls):
+        await ensure_indexes(cls.get_collection(settings.collection_name))
+
     @classmethod
     def get_collection(cls, collection_name: str):
         return cls.db[collection_name]
@@ -0,0 +1,56 @@
+from pymongo import monitoring
+from app.services.metrics import mongodb_command_duration, mongodb_pool_checkout_wait, mongodb_pool_connections
+
+class CommandTimer(monitoring.CommandListener):
+    """Records the duration of every MongoDB command by command name."""
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        mongodb_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        mongodb_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Records how long operations wait for a pooled connection, and how many are open and in use."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongodb_pool_connections.inc(state="open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongodb_pool_connections.dec(state="open")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent):
+        if event.duration is not None:
+            mongodb_pool_checkout_wait.observe(event.duration, outcome="failure")
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        if event.duration is not None:
+            mongodb_pool_checkout_wait.observe(event.duration, outcome="success")
+        mongodb_pool_connections.inc(state="in_use")
+
+    def connection_checked_in(self, event):
+        mongodb_pool_connections.dec(state="in_use")
+
+def event_listeners():
+    return [CommandTimer(), PoolMonitor()]
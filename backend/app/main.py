@@ -1,16 +1,32 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.routes import food_trucks
+from app.routes import food_trucks, health
 from app.database.mongodb import mongodb
+from app.services.food_truck_engine import food_truck_engine
+from app.services.food_truck_service import FoodTruckService
+from app.services.suggester import suggester
+from app.services.fuzzy_matcher import fuzzy_matcher
+from app.services.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.services.compression import CompressionMiddleware
 from app.config.settings import get_settings
 
 settings = get_settings()
 
 @asynccontextmanager
-async def lifespan(_app: FastAPI):
+async def lifespan(app: FastAPI):
     await mongodb.connect_to_database()
+    # Fail the deploy on an unreachable database instead of on the first query.
+    await mongodb.ping()
+    await mongodb.ensure_indexes()
+    app.state.food_truck_service = FoodTruckService()
+    if settings.engine_enabled:
+        await food_truck_engine.start()
+    else:
+        await suggester.load()
+        await fuzzy_matcher.load()
     yield
+    await food_truck_engine.stop()
     await mongodb.close_database_connection()
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
@@ -23,8 +39,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(food_trucks.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Food Facilities API"} 
\ No newline at end of file
+    return {"message": "Welcome to Food Facilities API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,6 +1,20 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
-from pydantic import BaseModel, Field
+from enum import Enum
+from pydantic import BaseModel, Field, model_validator
+
+class FoodTruckStatus(str, Enum):
+    APPROVED = "APPROVED"
+    REQUESTED = "REQUESTED"
+    EXPIRED = "EXPIRED"
+    SUSPEND = "SUSPEND"
+    ISSUED = "ISSUED"
+
+def normalize_status(status: Optional[str]) -> Optional[str]:
+    """Canonical stored form of a permit status: stripped and upper case."""
+    if status is None:
+        return None
+    return status.strip().upper() or None
 
 class FoodTruck(BaseModel):
     locationid: int = Field(..., description="Unique identifier for the food truck location")
@@ -36,9 +50,13 @@ class FoodTruck(BaseModel):
             }
         }
 
+# Only the fields the API returns; skips _id and ingest-only fields such as search_grams.
+FOOD_TRUCK_PROJECTION = {"_id": 0, **{field: 1 for field in FoodTruck.model_fields}}
+
 class FoodTruckListResponse(BaseModel):
     food_trucks: List[FoodTruck] = Field(..., description="List of food trucks")
-    total: int = Field(..., description="Total number of food trucks matching the query")
+    total: Optional[int] = Field(..., description="Total number of food trucks matching the query, omitted when include_total=false")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor for the next page when paginating with cursor/limit")
 
     class Config:
         json_schema_extra = {
@@ -60,6 +78,56 @@ class FoodTruckListResponse(BaseModel):
                         "expiration_date": "2024-12-31T00:00:00"
                     }
                 ],
-                "total": 1
+                "total": 1,
+                "next_cursor": None
             }
-        } 
\ No newline at end of file
+        } 
+
+class NearbyFoodTruck(FoodTruck):
+    distance: float = Field(..., description="Distance from the requested point, in meters")
+
+class FacetCount(BaseModel):
+    value: Optional[str] = Field(..., description="Facet value")
+    count: int = Field(..., description="Number of food trucks with this value")
+
+class FoodTruckFacetsResponse(BaseModel):
+    status: List[FacetCount] = Field(..., description="Counts by permit status")
+    facility_type: List[FacetCount] = Field(..., description="Counts by facility type")
+    food_items: List[FacetCount] = Field(..., description="Most common food items")
+    total: int = Field(..., description="Number of food trucks counted")
+
+class Cluster(BaseModel):
+    latitude: float = Field(..., description="Centroid latitude of the food trucks in the cluster")
+    longitude: float = Field(..., description="Centroid longitude of the food trucks in the cluster")
+    count: int = Field(..., description="Number of food trucks in the cluster")
+    status: Dict[str, int] = Field(..., description="Number of food trucks by permit status")
+
+class ViewportResponse(BaseModel):
+    food_trucks: List[FoodTruck] = Field(..., description="Food trucks in the viewport, when there are few enough to draw one by one")
+    clusters: List[Cluster] = Field(..., description="Grid clusters covering the viewport, when there are more food trucks than that")
+    total: int = Field(..., description="Food trucks in the viewport; for clusters, in the grid cells it overlaps")
+
+class Suggestion(BaseModel):
+    text: str = Field(..., description="Applicant name or food item to complete to")
+    kind: str = Field(..., description="applicant or food_item")
+    count: int = Field(..., description="Number of food trucks carrying this text")
+
+MAX_BATCH_SIZE = 100
+
+class FoodTruckBatchRequest(BaseModel):
+    locationids: List[int] = Field(default_factory=list, description="Location ids to fetch")
+    permits: List[str] = Field(default_factory=list, description="Permit numbers to fetch; a permit can cover several locations")
+
+    @model_validator(mode="after")
+    def check_size(self):
+        requested = len(self.locationids) + len(self.permits)
+        if requested == 0:
+            raise ValueError("Provide at least one locationid or permit")
+        if requested > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} locationids and permits per request")
+        return self
+
+class FoodTruckBatchResponse(BaseModel):
+    food_trucks: List[FoodTruck] = Field(..., description="Matching food trucks, in request order: locationids first, then permits")
+    missing_locationids: List[int] = Field(..., description="Requested locationids with no food truck")
+    missing_permits: List[str] = Field(..., description="Requested permits with no food truck")
@@ -1,26 +1,247 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends
-from app.models.food_truck import FoodTruck, FoodTruckListResponse
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from app.models.food_truck import (
+    FoodTruck,
+    FoodTruckBatchRequest,
+    FoodTruckBatchResponse,
+    FoodTruckFacetsResponse,
+    FoodTruckListResponse,
+    NearbyFoodTruck,
+    Suggestion,
+    ViewportResponse,
+    normalize_status
+)
+from app.database.facet_summary import SUMMARY_FOOD_ITEMS
+from app.services.clusters import MAX_ZOOM, parse_bbox
 from app.services.food_truck_service import FoodTruckService
+from app.services.export import ENCODERS, MEDIA_TYPES
+from app.services.fields import parse_fields
+from app.services.negotiation import COLUMNS, JSON, MSGPACK, accepts, encode
+from app.services.pagination import MAX_LIMIT, PAGE_SIZE, next_cursor
+from app.services.response_cache import ResponseCache, Uncacheable, response_cache
+from app.services.schedule import local_time, slot_at
+from app.services.search_index import food_tokens, normalize_text
 
 router = APIRouter(prefix="/foodtrucks", tags=["foodtrucks"])
 
-def get_food_truck_service() -> FoodTruckService:
-    return FoodTruckService()
+# Serializers for pre-encoded responses; the service already returns trusted models,
+# so going through response_model would only validate them a second time.
+food_truck_adapter = TypeAdapter(FoodTruck)
+food_truck_list_adapter = TypeAdapter(List[FoodTruck])
+food_truck_list_response_adapter = TypeAdapter(FoodTruckListResponse)
+food_truck_batch_response_adapter = TypeAdapter(FoodTruckBatchResponse)
+food_truck_facets_response_adapter = TypeAdapter(FoodTruckFacetsResponse)
+nearby_food_truck_list_adapter = TypeAdapter(List[NearbyFoodTruck])
+suggestion_list_adapter = TypeAdapter(List[Suggestion])
+viewport_response_adapter = TypeAdapter(ViewportResponse)
+
+TRUCK_FIELDS = tuple(FoodTruck.model_fields)
+NEARBY_FIELDS = tuple(NearbyFoodTruck.model_fields)
+
+# Routes returning lists of trucks can also answer in the column-oriented shape.
+accepts_rows = accepts(JSON, COLUMNS, MSGPACK)
+accepts_document = accepts(JSON, MSGPACK)
+
+FIELDS_QUERY = Query(None, description="Comma-separated food truck fields to return, e.g. locationid,applicant,latitude,longitude,status")
+
+def get_food_truck_service(request: Request) -> FoodTruckService:
+    """The service created once per process by the app lifespan."""
+    return request.app.state.food_truck_service
+
+def get_response_cache() -> ResponseCache:
+    return response_cache
 
 @router.get("/", response_model=FoodTruckListResponse)
 async def read_foodtrucks(
+    request: Request,
     query: Optional[str] = None,
     status: Optional[str] = None,
-    page: Optional[int] = 1,
-    service: FoodTruckService = Depends(get_food_truck_service)
+    page: int = Query(1, ge=1, description="Page number for page/skip pagination, starting at 1"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous response's next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description="Page size for cursor pagination"),
+    include_total: bool = Query(True, description="Set to false to skip counting the matching food trucks"),
+    fields: Optional[str] = FIELDS_QUERY,
+    food: Optional[str] = Query(None, description="Only trucks whose food items contain all of these words, e.g. tacos"),
+    open_at: Optional[datetime] = Query(None, description="Only trucks open at this time, e.g. 2024-05-03T12:30 (local San Francisco time unless an offset is given)"),
+    open_now: bool = Query(False, description="Only trucks open right now"),
+    fuzzy: bool = Query(False, description="Match applicant names despite typos, closest first"),
+    service: FoodTruckService = Depends(get_food_truck_service),
+    cache: ResponseCache = Depends(get_response_cache),
+    media_type: str = Depends(accepts_rows)
 ):
-    food_trucks, total = await service.get_food_trucks(query=query, status=status, page=page or 1)
-    return {"food_trucks": food_trucks, "total": total}
+    selected_fields = parse_fields(fields)
+    if open_now and open_at is None:
+        open_at = local_time()
+
+    async def render() -> bytes:
+        food_trucks, total = await service.get_food_trucks(
+            query=query,
+            status=status,
+            page=page,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total,
+            fields=selected_fields,
+            food=food,
+            open_at=open_at,
+            fuzzy=fuzzy
+        )
+        cursor_for_next = None
+        if cursor is not None or limit is not None:
+            cursor_for_next = next_cursor(food_trucks, limit or PAGE_SIZE)
+        response = FoodTruckListResponse.model_construct(food_trucks=food_trucks, total=total, next_cursor=cursor_for_next)
+        include = None
+        if selected_fields is not None:
+            include = {"food_trucks": {"__all__": set(selected_fields)}, "total": True, "next_cursor": True}
+        body = encode(
+            media_type,
+            food_truck_list_response_adapter,
+            response,
+            include=include,
+            columns=selected_fields or TRUCK_FIELDS,
+            rows_key="food_trucks"
+        )
+        # A missing total that was asked for means the count ran over its time budget.
+        return Uncacheable(body) if include_total and total is None else body
+
+    params = {
+        "query": normalize_text(query),
+        "status": normalize_status(status),
+        "page": page,
+        "cursor": cursor,
+        "limit": limit,
+        "include_total": include_total,
+        "fields": selected_fields,
+        "food": food_tokens([food]) if food else None,
+        "open_slot": slot_at(open_at) if open_at is not None else None,
+        "fuzzy": bool(fuzzy and normalize_text(query)),
+    }
+    key = cache.make_key("list", params, await service.get_dataset_version())
+    return await cache.respond(request, key, render, media_type)
 
 @router.get("/status/{status}", response_model=List[FoodTruck])
 async def read_foodtrucks_by_status(
+    request: Request,
     status: str,
+    fields: Optional[str] = FIELDS_QUERY,
+    service: FoodTruckService = Depends(get_food_truck_service),
+    cache: ResponseCache = Depends(get_response_cache),
+    media_type: str = Depends(accepts_rows)
+):
+    selected_fields = parse_fields(fields)
+
+    async def render() -> bytes:
+        food_trucks = await service.get_food_trucks_by_status(status=status, fields=selected_fields)
+        include = None if selected_fields is None else {"__all__": set(selected_fields)}
+        return encode(media_type, food_truck_list_adapter, food_trucks, include=include, columns=selected_fields or TRUCK_FIELDS)
+
+    params = {"status": normalize_status(status), "fields": selected_fields}
+    key = cache.make_key("status", params, await service.get_dataset_version())
+    return await cache.respond(request, key, render, media_type)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_foodtrucks(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Export format"),
+    status: Optional[str] = None,
     service: FoodTruckService = Depends(get_food_truck_service)
 ):
-    return await service.get_food_trucks_by_status(status=status) 
\ No newline at end of file
+    return StreamingResponse(
+        ENCODERS[format](service.export_food_trucks(status=status)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="foodtrucks.{format}"'}
+    )
+
+@router.get("/nearby", response_model=List[NearbyFoodTruck])
+async def read_nearby_foodtrucks(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the search point"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude of the search point"),
+    radius: float = Query(1000, gt=0, le=50000, description="Search radius in meters"),
+    k: int = Query(10, ge=1, le=100, description="Maximum number of food trucks to return"),
+    service: FoodTruckService = Depends(get_food_truck_service),
+    media_type: str = Depends(accepts_rows)
+):
+    food_trucks = await service.get_nearby_food_trucks(latitude=lat, longitude=lon, radius=radius, k=k)
+    body = encode(media_type, nearby_food_truck_list_adapter, food_trucks, columns=NEARBY_FIELDS)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_foodtrucks(
+    prefix: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=20, description="Maximum number of suggestions"),
+    service: FoodTruckService = Depends(get_food_truck_service),
+    media_type: str = Depends(accepts_document)
+):
+    suggestions = await service.suggest(prefix=prefix, limit=limit)
+    return Response(content=encode(media_type, suggestion_list_adapter, suggestions), media_type=media_type, headers={"Vary": "Accept"})
+
+@router.get("/facets", response_model=FoodTruckFacetsResponse)
+async def read_foodtruck_facets(
+    request: Request,
+    query: Optional[str] = None,
+    food_items: int = Query(10, ge=1, le=SUMMARY_FOOD_ITEMS, description="Number of top food items to return"),
+    service: FoodTruckService = Depends(get_food_truck_service),
+    cache: ResponseCache = Depends(get_response_cache),
+    media_type: str = Depends(accepts_document)
+):
+    async def render() -> bytes:
+        facets = await service.get_facets(query=query, food_items_limit=food_items)
+        return encode(media_type, food_truck_facets_response_adapter, FoodTruckFacetsResponse.model_validate(facets))
+
+    params = {"query": normalize_text(query), "food_items": food_items}
+    key = cache.make_key("facets", params, await service.get_dataset_version())
+    return await cache.respond(request, key, render, media_type)
+
+@router.get("/viewport", response_model=ViewportResponse)
+async def read_foodtrucks_viewport(
+    request: Request,
+    bbox: str = Query(..., description="Visible area as minLon,minLat,maxLon,maxLat, e.g. -122.45,37.75,-122.40,37.80"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM, description="Map zoom level, which sets the cluster grid size"),
+    service: FoodTruckService = Depends(get_food_truck_service),
+    cache: ResponseCache = Depends(get_response_cache),
+    media_type: str = Depends(accepts_document)
+):
+    box = parse_bbox(bbox)
+
+    async def render() -> bytes:
+        viewport = await service.get_viewport(bbox=box, zoom=zoom)
+        return encode(media_type, viewport_response_adapter, ViewportResponse.model_construct(**viewport))
+
+    key = cache.make_key("viewport", {"bbox": box, "zoom": zoom}, await service.get_dataset_version())
+    return await cache.respond(request, key, render, media_type)
+
+@router.post("/batch", response_model=FoodTruckBatchResponse)
+async def read_foodtrucks_batch(
+    body: FoodTruckBatchRequest,
+    service: FoodTruckService = Depends(get_food_truck_service),
+    media_type: str = Depends(accepts_rows)
+):
+    food_trucks, missing_locationids, missing_permits = await service.get_food_trucks_batch(
+        locationids=body.locationids,
+        permits=body.permits
+    )
+    response = FoodTruckBatchResponse.model_construct(
+        food_trucks=food_trucks,
+        missing_locationids=missing_locationids,
+        missing_permits=missing_permits
+    )
+    content = encode(media_type, food_truck_batch_response_adapter, response, columns=TRUCK_FIELDS, rows_key="food_trucks")
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
+# Declared last so the fixed paths above (/nearby, /export, ...) are matched before it.
+@router.get("/{locationid}", response_model=FoodTruck)
+async def read_foodtruck(
+    request: Request,
+    locationid: int,
+    service: FoodTruckService = Depends(get_food_truck_service),
+    cache: ResponseCache = Depends(get_response_cache),
+    media_type: str = Depends(accepts_document)
+):
+    async def render() -> bytes:
+        food_truck = await service.get_food_truck(locationid)
+        return encode(media_type, food_truck_adapter, food_truck)
+
+    key = cache.make_key("truck", {"locationid": locationid}, await service.get_dataset_version())
+    return await cache.respond(request, key, render, media_type)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from app.database.mongodb import mongodb
+from app.services.food_truck_engine import food_truck_engine
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+router = APIRouter(tags=["health"])
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is serving requests. Doesn't touch MongoDB, so a database
+    outage takes workers out of rotation through /readyz instead of restarting them."""
+    return {"status": "ok", "pool": mongodb.pool_state()}
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: MongoDB answers a ping and, when enabled, the in-memory dataset is loaded."""
+    checks = {"database": "ok"}
+    try:
+        await mongodb.ping()
+    except PyMongoError as e:
+        checks["database"] = f"unavailable: {type(e).__name__}"
+    if settings.engine_enabled:
+        checks["engine"] = "ok" if food_truck_engine.is_loaded else "loading"
+    ready = all(value == "ok" for value in checks.values())
+    return JSONResponse(
+        {"status": "ok" if ready else "unavailable", "checks": checks, "pool": mongodb.pool_state()},
+        status_code=200 if ready else 503
+    )
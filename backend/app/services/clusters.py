@@ -0,0 +1,148 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import product
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+
+MAX_ZOOM = 22
+# Zoom levels with a precomputed cluster grid; deeper zooms reuse the last one.
+MAX_CLUSTER_ZOOM = 16
+# Cells are 1/8 of a 256px map tile, about 32px on screen, at every zoom.
+CELL_LEVELS = 3
+MAX_LATITUDE = 85.05112878
+
+BBox = Tuple[float, float, float, float]
+
+def parse_bbox(bbox: str) -> BBox:
+    """Validate a `minLon,minLat,maxLon,maxLat` parameter."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be minLon,minLat,maxLon,maxLat")
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox corners must be within -180..180, -90..90 and ordered min before max")
+    return min_lon, min_lat, max_lon, max_lat
+
+def mercator(lat: float, lon: float) -> Tuple[float, float]:
+    """Web Mercator position of a point as fractions of the world, y growing southwards."""
+    phi = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+    x = (lon + 180) / 360
+    y = (1 - math.log(math.tan(phi) + 1 / math.cos(phi)) / math.pi) / 2
+    return x, y
+
+def _cell(fx: float, fy: float, zoom: int) -> Tuple[int, int]:
+    n = 1 << (zoom + CELL_LEVELS)
+    return min(int(fx * n), n - 1), min(int(fy * n), n - 1)
+
+def cell_range(bbox: BBox, zoom: int) -> Tuple[int, int, int, int]:
+    """Inclusive (x0, y0, x1, y1) range of the grid cells a bounding box overlaps at `zoom`."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x0, y0 = _cell(*mercator(max_lat, min_lon), zoom)
+    x1, y1 = _cell(*mercator(min_lat, max_lon), zoom)
+    return x0, y0, x1, y1
+
+def cluster_zoom(zoom: int) -> int:
+    return min(zoom, MAX_CLUSTER_ZOOM)
+
+def make_cluster(count: int, latitude_sum: float, longitude_sum: float, statuses: Counter) -> Dict[str, Any]:
+    return {
+        "latitude": latitude_sum / count,
+        "longitude": longitude_sum / count,
+        "count": count,
+        "status": dict(statuses)
+    }
+
+class ClusterTable:
+    """Per-zoom grid aggregates of truck positions: count, centroid and status breakdown per cell.
+
+    Only occupied cells are stored, so a table over n trucks holds at most n cells per zoom.
+    """
+
+    def __init__(self, zooms: Iterable[int] = range(MAX_CLUSTER_ZOOM + 1)):
+        # zoom -> (x, y) -> [count, latitude sum, longitude sum, status counts]
+        self.cells: Dict[int, Dict[Tuple[int, int], list]] = {zoom: {} for zoom in zooms}
+
+    def add(self, latitude: Optional[float], longitude: Optional[float], status: Optional[str]):
+        if latitude is None or longitude is None or math.isnan(latitude) or math.isnan(longitude):
+            return
+        fx, fy = mercator(latitude, longitude)
+        for zoom, cells in self.cells.items():
+            key = _cell(fx, fy, zoom)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0, 0.0, 0.0, Counter()]
+            cell[0] += 1
+            cell[1] += latitude
+            cell[2] += longitude
+            cell[3][status or "UNKNOWN"] += 1
+
+    def query(self, bbox: BBox, zoom: int) -> List[Dict[str, Any]]:
+        """Clusters of the cells overlapping `bbox`, in cell order."""
+        zoom = cluster_zoom(zoom)
+        cells = self.cells[zoom]
+        x0, y0, x1, y1 = cell_range(bbox, zoom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(cells):
+            keys = [(x, y) for x, y in product(range(x0, x1 + 1), range(y0, y1 + 1)) if (x, y) in cells]
+        else:
+            keys = sorted(key for key in cells if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+        return [make_cluster(*cells[key]) for key in keys]
+
+    def documents(self, version: int) -> Iterator[Dict[str, Any]]:
+        """Rows of the clusters collection that init_db.py stores with each dataset version."""
+        for zoom, cells in self.cells.items():
+            for (x, y), cell in cells.items():
+                yield {"version": version, "zoom": zoom, "x": x, "y": y, **make_cluster(*cell)}
+
+def _pack(x: int, y: int) -> int:
+    return x << 32 | y
+
+class ClusterGrid:
+    """Read-only ClusterTable laid out as flat arrays per zoom, so a snapshot can store it.
+
+    Each zoom keeps its occupied cells sorted by (x, y) as packed keys, with parallel
+    count and coordinate sum arrays and a cell-by-status count matrix.
+    """
+
+    def __init__(self, state: Dict[str, Any]):
+        self.statuses: List[str] = state["statuses"]
+        self.zooms: Dict[int, Dict[str, Any]] = {int(zoom): level for zoom, level in state["zooms"].items()}
+
+    @classmethod
+    def from_table(cls, table: ClusterTable) -> "ClusterGrid":
+        statuses = sorted({status for cells in table.cells.values() for cell in cells.values() for status in cell[3]})
+        zooms = {}
+        for zoom, cells in table.cells.items():
+            keys = sorted(cells)
+            zooms[str(zoom)] = {
+                "keys": array("q", (_pack(x, y) for x, y in keys)),
+                "counts": array("I", (cells[key][0] for key in keys)),
+                "latitude_sums": array("d", (cells[key][1] for key in keys)),
+                "longitude_sums": array("d", (cells[key][2] for key in keys)),
+                "status_counts": array("I", (cells[key][3][status] for key in keys for status in statuses))
+            }
+        return cls({"statuses": statuses, "zooms": zooms})
+
+    def state(self) -> Dict[str, Any]:
+        return {"statuses": self.statuses, "zooms": {str(zoom): level for zoom, level in self.zooms.items()}}
+
+    def _cluster(self, level: Dict[str, Any], n: int) -> Dict[str, Any]:
+        width = len(self.statuses)
+        counts = level["status_counts"][n * width:(n + 1) * width]
+        statuses = Counter({status: count for status, count in zip(self.statuses, counts) if count})
+        return make_cluster(level["counts"][n], level["latitude_sums"][n], level["longitude_sums"][n], statuses)
+
+    def query(self, bbox: BBox, zoom: int) -> List[Dict[str, Any]]:
+        """Clusters of the cells overlapping `bbox`, in cell order, like `ClusterTable.query`."""
+        level = self.zooms[cluster_zoom(zoom)]
+        keys = level["keys"]
+        x0, y0, x1, y1 = cell_range(bbox, cluster_zoom(zoom))
+        if x1 - x0 + 1 <= len(keys):
+            positions = [
+                n for x in range(x0, x1 + 1)
+                for n in range(bisect_left(keys, _pack(x, y0)), bisect_right(keys, _pack(x, y1)))
+            ]
+        else:
+            positions = [n for n, key in enumerate(keys) if x0 <= key >> 32 <= x1 and y0 <= key & 0xFFFFFFFF <= y1]
+        return [self._cluster(level, n) for n in positions]
@@ -0,0 +1,128 @@
+import zlib
+from typing import Optional
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+# Streamed bodies are flushed to the client whenever this much input has been compressed since the last flush.
+STREAM_FLUSH_SIZE = 16 * 1024
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br" or "gzip" when the client accepts it, brotli first; None to send the body as is."""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            q = float(value) if name.strip() == "q" else 1.0
+        except ValueError:
+            q = 0.0
+        qualities[coding.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if qualities.get(coding, qualities.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+class Compressor:
+    """Incremental gzip or brotli encoder: feed chunks to `compress`, then call `finish` once.
+
+    `flush` returns everything compressed so far without ending the stream, so a client
+    can decode the body up to that point.
+    """
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            encoder = brotli.Compressor(quality=settings.brotli_quality)
+            self.compress, self.flush, self.finish = encoder.process, encoder.flush, encoder.finish
+        else:
+            encoder = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+            self.compress, self.finish = encoder.compress, encoder.flush
+            self.flush = lambda: encoder.flush(zlib.Z_SYNC_FLUSH)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressor = Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+def add_vary(headers: MutableHeaders, value: str):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = value
+    elif value.lower() not in vary.lower():
+        headers["Vary"] = f"{vary}, {value}"
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies of at least `minimum_size` bytes.
+
+    Streamed responses such as /foodtrucks/export are compressed chunk by chunk and
+    flushed after the first chunk and then every STREAM_FLUSH_SIZE bytes, so clients
+    still get the first rows immediately. Responses
+    that already carry a Content-Encoding, like the pre-compressed bodies of the response
+    cache, pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        compressor = None
+        # Uncompressed bytes since the last flush; None until the first chunk has been flushed.
+        unflushed = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor, unflushed
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the response is worth compressing.
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" not in headers:
+                    add_vary(headers, "Accept-Encoding")
+                    if more_body or len(body) >= self.minimum_size:
+                        compressor = Compressor(encoding)
+                        headers["Content-Encoding"] = encoding
+                        del headers["content-length"]
+                        if not more_body:
+                            body = compressor.compress(body) + compressor.finish()
+                            headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+                if compressor is None or not more_body:
+                    compressor = None
+                    await send({**message, "body": body})
+                    return
+            if compressor is None:
+                # The response went out uncompressed.
+                await send(message)
+                return
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+                compressor = None
+            else:
+                first_chunk = unflushed is None
+                unflushed = (unflushed or 0) + len(body)
+                if first_chunk or unflushed >= STREAM_FLUSH_SIZE:
+                    chunk += compressor.flush()
+                    unflushed = 0
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict
+from app.models.food_truck import FoodTruck
+
+EXPORT_FIELDS = tuple(FoodTruck.model_fields)
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+async def encode_ndjson(trucks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """One JSON object per line, written as each document arrives."""
+    async for truck in trucks:
+        yield json.dumps({field: truck.get(field) for field in EXPORT_FIELDS}, default=_json_default).encode() + b"\n"
+
+async def encode_csv(trucks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """CSV with a header row; food items are joined with ': ' like the source permit file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(EXPORT_FIELDS)
+    yield flush()
+    async for truck in trucks:
+        row = []
+        for field in EXPORT_FIELDS:
+            value = truck.get(field)
+            if field == "food_items":
+                value = ": ".join(value or [])
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row.append(value)
+        writer.writerow(row)
+        yield flush()
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv}
@@ -0,0 +1,22 @@
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+from app.models.food_truck import FOOD_TRUCK_PROJECTION, FoodTruck
+
+# Keyset cursors are built from the locationid, so it is part of every partial response.
+ALWAYS_INCLUDED = ("locationid",)
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Validate a comma-separated `fields=` parameter, returned in model order. None means every field."""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(requested - set(FoodTruck.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(field for field in FoodTruck.model_fields if field in requested or field in ALWAYS_INCLUDED)
+
+def projection_for(fields: Optional[Tuple[str, ...]]) -> Dict[str, int]:
+    """MongoDB projection returning only the selected fields."""
+    if fields is None:
+        return FOOD_TRUCK_PROJECTION
+    return {"_id": 0, **{field: 1 for field in fields}}
@@ -0,0 +1,451 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.database.mongodb import mongodb
+from app.database.dataset_version import dataset_version
+from app.database.facet_summary import FacetSummary, top_counts
+from app.models.food_truck import FoodTruck, normalize_status
+from app.services.clusters import BBox, ClusterGrid, ClusterTable
+from app.services.fuzzy_index import FuzzyIndex
+from app.services.geo_index import GeoGrid
+from app.services.packed import Postings
+from app.services.prefix_trie import PrefixTrie
+from app.services.schedule import ScheduleError, parse_days_hours
+from app.services.search_index import TrigramIndex, food_tokens
+from app.services.snapshot import Snapshot, build_lock, open_snapshot, remove_old_snapshots, snapshot_path, write_snapshot
+from app.config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+FIELDS = tuple(FoodTruck.model_fields)
+NUMERIC_FIELDS = {"locationid": "q", "latitude": "d", "longitude": "d"}
+CATEGORICAL_FIELDS = ("facility_type", "status")
+
+def _encode_columns(docs: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, List[Optional[str]]]]:
+    values: Dict[str, Any] = {}
+    vocabularies: Dict[str, List[Optional[str]]] = {}
+    for field in FIELDS:
+        column: List[Any] = [doc.get(field) for doc in docs]
+        if field in NUMERIC_FIELDS:
+            typecode = NUMERIC_FIELDS[field]
+            if typecode == "d":
+                column = [math.nan if value is None else value for value in column]
+            values[field] = array(typecode, column)
+        elif field in CATEGORICAL_FIELDS:
+            vocabulary = list(dict.fromkeys(column))
+            codes = {value: code for code, value in enumerate(vocabulary)}
+            vocabularies[field] = vocabulary
+            values[field] = array("H", (codes[value] for value in column))
+        else:
+            values[field] = tuple(column)
+    return values, vocabularies
+
+def save_snapshot(docs: List[Dict[str, Any]], version: int):
+    """Write the snapshot workers map for dataset `version`, indexes included, and delete older ones."""
+    values, vocabularies = _encode_columns(docs)
+    columns = _Columns(len(docs), values, vocabularies)
+    write_snapshot(snapshot_path(version), version, len(docs), values, vocabularies, indexes=columns.index_state())
+    remove_old_snapshots(keep=version)
+
+class _Columns:
+    """Immutable column-oriented copy of the food trucks collection.
+
+    Numbers live in typed arrays, low-cardinality strings are dictionary encoded and
+    everything else is kept as one tuple per field, or as views of a memory-mapped
+    snapshot shared by every worker. A new instance is built on every refresh and
+    swapped in whole, so readers never see a half-loaded dataset.
+
+    The derived indexes are built from the columns, or restored from the state a
+    snapshot stores with them, in which case their arrays are views of the mapping too.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        values: Dict[str, Any],
+        vocabularies: Dict[str, List[Optional[str]]],
+        indexes: Optional[Dict[str, Any]] = None,
+        snapshot: Optional[Snapshot] = None
+    ):
+        self.size = size
+        self.values = values
+        self.vocabularies = vocabularies
+        # Keeps the mapping alive for as long as these columns are in use.
+        self.snapshot = snapshot
+        if indexes:
+            self._restore_indexes(indexes)
+        else:
+            self._build_indexes()
+
+    def _build_indexes(self):
+        locationids = self.values["locationid"]
+        self.rows_by_locationid = array("I", sorted(range(self.size), key=locationids.__getitem__))
+        self.sorted_locationids = array("q", (locationids[i] for i in self.rows_by_locationid))
+        rows_by_permit: Dict[str, List[int]] = {}
+        for i, permit in enumerate(self.values["permit"]):
+            if permit is not None:
+                rows_by_permit.setdefault(permit, []).append(i)
+        self.rows_by_permit = Postings.from_dict(rows_by_permit)
+        self.search_index = TrigramIndex(self.values["applicant"], self.values["address"])
+        self.fuzzy_index = FuzzyIndex(self.values["applicant"])
+        rows_by_status: Dict[Optional[str], array] = {}
+        for i, code in enumerate(self.values["status"]):
+            key = normalize_status(self.vocabularies["status"][code])
+            rows_by_status.setdefault(key, array("I")).append(i)
+        self.rows_by_status = Postings.from_dict(rows_by_status)
+        self.geo = GeoGrid(self.values["latitude"], self.values["longitude"])
+        self.facet_counts = self.count_facets(range(self.size))
+        rows_by_food_token: Dict[str, array] = {}
+        for i, items in enumerate(self.values["food_items"]):
+            for token in food_tokens(items):
+                rows_by_food_token.setdefault(token, array("I")).append(i)
+        self.rows_by_food_token = Postings.from_dict(rows_by_food_token)
+        terms = [("applicant", applicant) for applicant in self.values["applicant"]]
+        terms += [("food_item", item) for items in self.values["food_items"] for item in items or ()]
+        self.suggestions = PrefixTrie(terms)
+        # Rows grouped by weekly schedule bitmap: permits share a few dozen distinct schedules,
+        # so an open-at query tests each bitmap once instead of every row.
+        rows_by_schedule: Dict[int, array] = {}
+        for i, days_hours in enumerate(self.values["days_hours"]):
+            try:
+                bitmap = parse_days_hours(days_hours.strip()) if days_hours and days_hours.strip() else 0
+            except ScheduleError:
+                bitmap = 0
+            if bitmap:
+                rows_by_schedule.setdefault(bitmap, array("I")).append(i)
+        self.rows_by_schedule = Postings.from_dict(rows_by_schedule)
+        table = ClusterTable()
+        statuses = self.vocabularies["status"]
+        for latitude, longitude, code in zip(self.values["latitude"], self.values["longitude"], self.values["status"]):
+            table.add(latitude, longitude, statuses[code])
+        self.clusters = ClusterGrid.from_table(table)
+
+    def _restore_indexes(self, indexes: Dict[str, Any]):
+        self.rows_by_locationid = indexes["rows_by_locationid"]
+        self.sorted_locationids = indexes["sorted_locationids"]
+        for name in ("rows_by_permit", "rows_by_status", "rows_by_food_token", "rows_by_schedule"):
+            setattr(self, name, Postings.from_state(indexes[name]))
+        self.search_index = TrigramIndex.from_state(indexes["search_index"])
+        self.fuzzy_index = FuzzyIndex.from_state(indexes["fuzzy_index"])
+        self.geo = GeoGrid.from_state(self.values["latitude"], self.values["longitude"], indexes["geo"])
+        self.facet_counts = {field: Counter(dict(pairs)) for field, pairs in indexes["facet_counts"].items()}
+        self.suggestions = PrefixTrie.from_state(indexes["suggestions"])
+        self.clusters = ClusterGrid(indexes["clusters"])
+
+    def index_state(self) -> Dict[str, Any]:
+        """The derived indexes as a tree of JSON values and arrays, for `write_snapshot`."""
+        return {
+            "rows_by_locationid": self.rows_by_locationid,
+            "sorted_locationids": self.sorted_locationids,
+            **{name: getattr(self, name).state() for name in ("rows_by_permit", "rows_by_status", "rows_by_food_token", "rows_by_schedule")},
+            "search_index": self.search_index.state(),
+            "fuzzy_index": self.fuzzy_index.state(),
+            "geo": self.geo.state(),
+            # Pairs rather than objects: facet values can be None.
+            "facet_counts": {field: list(counter.items()) for field, counter in self.facet_counts.items()},
+            "suggestions": self.suggestions.state(),
+            "clusters": self.clusters.state()
+        }
+
+    @classmethod
+    def from_documents(cls, docs: List[Dict[str, Any]]) -> "_Columns":
+        return cls(len(docs), *_encode_columns(docs))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> "_Columns":
+        return cls(snapshot.size, snapshot.values, snapshot.vocabularies, snapshot.indexes, snapshot)
+
+    def rows_open_at(self, slot: int) -> List[int]:
+        rows = [i for bitmap, schedule_rows in self.rows_by_schedule.items() if bitmap >> slot & 1 for i in schedule_rows]
+        rows.sort()
+        return rows
+
+    def count_facets(self, rows) -> Dict[str, Counter]:
+        counts = {field: Counter() for field in CATEGORICAL_FIELDS}
+        food_items = Counter()
+        for i in rows:
+            for field in CATEGORICAL_FIELDS:
+                counts[field][self.values[field][i]] += 1
+            food_items.update(self.values["food_items"][i] or ())
+        facets = {
+            field: Counter({self.vocabularies[field][code]: count for code, count in counter.items()})
+            for field, counter in counts.items()
+        }
+        facets["food_items"] = food_items
+        return facets
+
+    def value(self, field: str, i: int) -> Any:
+        column = self.values[field]
+        if field in CATEGORICAL_FIELDS:
+            return self.vocabularies[field][column[i]]
+        value = column[i]
+        if field in NUMERIC_FIELDS and NUMERIC_FIELDS[field] == "d" and math.isnan(value):
+            return None
+        return value
+
+    def row(self, i: int, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        return {field: self.value(field, i) for field in fields or FIELDS}
+
+class FoodTruckEngine:
+    """In-process read engine that answers food truck listings from memory.
+
+    The collection is loaded once at startup and reloaded when `init_db.py` bumps the
+    dataset version, or when `engine_refresh_seconds` (off by default) have passed since
+    it was read. Indexes are built in a worker thread and swapped in whole, so the event
+    loop keeps answering requests from the previous dataset while a reload runs.
+
+    With `snapshot_dir` set, workers map a snapshot file of the current version instead
+    of each holding a copy: the first worker to need one reads MongoDB and writes it
+    (or `init_db.py` already did), the others map it without querying the collection.
+    """
+
+    def __init__(self):
+        self._columns: Optional[_Columns] = None
+        self._version: Optional[int] = None
+        # Wall-clock time the data was read from MongoDB, which for a snapshot may predate this process.
+        self._built_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._columns is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def _swap(self, columns: _Columns, version: int, built_at: float):
+        self._columns = columns
+        self._version = version
+        self._built_at = built_at
+
+    def load_documents(self, docs: List[Dict[str, Any]], version: int):
+        """Replace the in-memory dataset with `docs`."""
+        self._swap(_Columns.from_documents(docs), version, time.time())
+
+    def load_snapshot(self, snapshot: Snapshot):
+        """Replace the in-memory dataset with a mapped snapshot."""
+        self._swap(_Columns.from_snapshot(snapshot), snapshot.version, snapshot.built_at)
+
+    async def _read_collection(self) -> List[Dict[str, Any]]:
+        collection = mongodb.get_collection(settings.collection_name)
+        return await collection.find({}, {"_id": 0}).to_list(length=None)
+
+    def _expired(self, built_at: float) -> bool:
+        return bool(settings.engine_refresh_seconds) and time.time() - built_at >= settings.engine_refresh_seconds
+
+    async def _load_documents(self, docs: List[Dict[str, Any]], version: int):
+        built_at = time.time()
+        self._swap(await asyncio.to_thread(_Columns.from_documents, docs), version, built_at)
+        logger.info("Loaded %d food trucks (dataset version %s) into memory", len(docs), version)
+
+    async def load(self, allow_expired: bool = False):
+        """Load the current dataset version, from its snapshot when `snapshot_dir` is set.
+
+        `allow_expired` maps a snapshot older than `engine_refresh_seconds` anyway, so a
+        starting worker is ready at once and the refresh loop rebuilds it afterwards.
+        """
+        version = await dataset_version.fetch()
+        if not settings.snapshot_dir:
+            await self._load_documents(await self._read_collection(), version)
+            return
+        snapshot = open_snapshot(version)
+        if snapshot is None or (not allow_expired and self._expired(snapshot.built_at)):
+            async with build_lock():
+                # Another worker may have written it while this one waited for the lock.
+                snapshot = open_snapshot(version)
+                if snapshot is None or (not allow_expired and self._expired(snapshot.built_at)):
+                    docs = await self._read_collection()
+                    try:
+                        await asyncio.to_thread(save_snapshot, docs, version)
+                        logger.info("Wrote a snapshot of %d food trucks (dataset version %s)", len(docs), version)
+                    except OSError:
+                        logger.exception("Error writing the snapshot of dataset version %s", version)
+                    snapshot = open_snapshot(version)
+                    if snapshot is None:
+                        # Serve from the documents already read rather than fail the load.
+                        await self._load_documents(docs, version)
+                        return
+        self._swap(await asyncio.to_thread(_Columns.from_snapshot, snapshot), snapshot.version, snapshot.built_at)
+        logger.info("Mapped %s (%d food trucks, dataset version %s)", snapshot.path, snapshot.size, version)
+
+    async def start(self):
+        await self.load(allow_expired=True)
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_stale(self, version: int) -> bool:
+        if version != self._version:
+            return True
+        return self._expired(self._built_at)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.dataset_version_poll_seconds)
+            try:
+                if self.is_stale(await dataset_version.fetch()):
+                    await self.load()
+            except Exception:
+                logger.exception("Error refreshing the in-memory food truck dataset")
+
+    def _match(
+        self,
+        columns: _Columns,
+        query: Optional[str],
+        status: Optional[str],
+        food: Optional[str] = None,
+        open_slot: Optional[int] = None,
+        fuzzy: bool = False
+    ) -> Sequence[int]:
+        # Row ids allowed by the status, food and opening hours filters, in load order; None means no filter.
+        filtered: Optional[Sequence[int]] = None
+        if status and status != "all":
+            filtered = columns.rows_by_status.get(normalize_status(status), array("I"))
+        row_filters = [columns.rows_by_food_token.get(token, array("I")) for token in (food_tokens([food]) if food else ())]
+        if open_slot is not None:
+            row_filters.append(columns.rows_open_at(open_slot))
+        for rows in row_filters:
+            filtered = rows if filtered is None else sorted(set(filtered).intersection(rows))
+        if not query:
+            # Returned as is rather than copied, so a page of an unfiltered listing stays O(page).
+            return range(columns.size) if filtered is None else filtered
+        if fuzzy:
+            rows = columns.fuzzy_index.search(query, settings.fuzzy_max_matches)
+        else:
+            rows = columns.search_index.search(query)
+        if filtered is not None:
+            allowed = set(filtered)
+            rows = [i for i in rows if i in allowed]
+        return rows
+
+    def search(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        page: int,
+        page_size: int,
+        fields: Optional[Tuple[str, ...]] = None,
+        food: Optional[str] = None,
+        open_slot: Optional[int] = None,
+        fuzzy: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Filter like `FoodTruckService.get_food_trucks` and return one page plus the total.
+
+        With `fuzzy` the query matches applicant names within a few typos, closest first.
+        """
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        rows = self._match(columns, query, status, food, open_slot, fuzzy)
+        skip = (page - 1) * page_size
+        return [columns.row(i, fields) for i in rows[skip:skip + page_size]], len(rows)
+
+    def iter_rows(self, status: Optional[str], fields: Optional[Tuple[str, ...]] = None) -> Iterator[Dict[str, Any]]:
+        """Every row matching the status filter, materialized one at a time."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        for i in self._match(columns, None, status):
+            yield columns.row(i, fields)
+
+    def search_after(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        after: Optional[int],
+        limit: int,
+        fields: Optional[Tuple[str, ...]] = None,
+        food: Optional[str] = None,
+        open_slot: Optional[int] = None,
+        fuzzy: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Keyset variant of `search`: the first `limit` matches with a locationid greater than `after`."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        if not query and not food and open_slot is None and not (status and status != "all"):
+            start = bisect_right(columns.sorted_locationids, after) if after is not None else 0
+            return [columns.row(i, fields) for i in columns.rows_by_locationid[start:start + limit]], columns.size
+        rows = self._match(columns, query, status, food, open_slot, fuzzy)
+        locationids = columns.values["locationid"]
+        remaining = rows if after is None else [i for i in rows if locationids[i] > after]
+        return [columns.row(i, fields) for i in heapq.nsmallest(limit, remaining, key=locationids.__getitem__)], len(rows)
+
+    def facets(self, query: Optional[str], food_items_limit: int) -> FacetSummary:
+        """Counts by status, facility type and top food items, precomputed at load unless scoped by a query."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        if query:
+            rows = self._match(columns, query, None)
+            counts, total = columns.count_facets(rows), len(rows)
+        else:
+            counts, total = columns.facet_counts, columns.size
+        return {
+            "status": top_counts(counts["status"]),
+            "facility_type": top_counts(counts["facility_type"]),
+            "food_items": top_counts(counts["food_items"], food_items_limit),
+            "total": total
+        }
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """Type-ahead completions for applicant names and food items."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        return columns.suggestions.suggest(prefix, limit)
+
+    def lookup(self, locationids: List[int], permits: List[str]) -> List[Dict[str, Any]]:
+        """Rows with any of the given locationids or permits, in no particular order."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        rows = set()
+        for locationid in locationids:
+            j = bisect_left(columns.sorted_locationids, locationid)
+            if j < columns.size and columns.sorted_locationids[j] == locationid:
+                rows.add(columns.rows_by_locationid[j])
+        for permit in permits:
+            rows.update(columns.rows_by_permit.get(permit, ()))
+        return [columns.row(i) for i in rows]
+
+    def viewport(self, bbox: BBox, zoom: int, max_trucks: int) -> Dict[str, Any]:
+        """Trucks inside `bbox` when there are at most `max_trucks`, else the precomputed clusters at `zoom`."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        clusters = columns.clusters.query(bbox, zoom)
+        total = sum(cluster["count"] for cluster in clusters)
+        # Clusters cover whole cells, so their total bounds the number of trucks inside the box.
+        if total > max_trucks:
+            return {"food_trucks": [], "clusters": clusters, "total": total}
+        min_lon, min_lat, max_lon, max_lat = bbox
+        rows = columns.geo.within(min_lat, min_lon, max_lat, max_lon)
+        return {"food_trucks": [columns.row(i) for i in rows], "clusters": [], "total": len(rows)}
+
+    def nearby(self, latitude: float, longitude: float, radius: float, k: int) -> List[Dict[str, Any]]:
+        """Return the `k` trucks closest to a point within `radius` meters, closest first."""
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("The food truck engine has not been loaded")
+        return [
+            {**columns.row(i), "distance": distance}
+            for distance, i in columns.geo.nearest(latitude, longitude, k, max_distance=radius)
+        ]
+
+food_truck_engine = FoodTruckEngine()
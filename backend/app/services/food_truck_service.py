@@ -1,37 +1,410 @@
-from typing import List, Optional, Tuple
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCommandCursor, AsyncIOMotorCursor
+from pymongo import ASCENDING
+from pymongo.errors import ExecutionTimeout
 from app.database.mongodb import mongodb
-from app.models.food_truck import FoodTruck
+from app.database.dataset_version import dataset_version
+from app.database.cluster_tables import POSITION_PROJECTION, read_clusters
+from app.database.facet_summary import FacetSummary, aggregate_facets, read_facet_summary
+from app.models.food_truck import FOOD_TRUCK_PROJECTION, Cluster, FoodTruck, NearbyFoodTruck, Suggestion, normalize_status
+from app.services.clusters import BBox, ClusterTable, cluster_zoom
+from app.services.food_truck_engine import food_truck_engine
+from app.services.fuzzy_matcher import fuzzy_matcher
+from app.services.search_index import food_filter, food_tokens, normalize_text, search_filter, search_rank
+from app.services.single_flight import SingleFlight
+from app.services.limiter import query_limiter, query_timeouts, service_unavailable
+from app.services.schedule import open_at_filter, slot_at
+from app.services.suggester import suggester
+from app.services.pagination import PAGE_SIZE, decode_cursor
+from app.services.cache import LRUCache
+from app.services.fields import projection_for
+from app.services.metrics import registry
 from app.config.settings import get_settings
 
 settings = get_settings()
 
+count_cache = LRUCache(maxsize=settings.count_cache_size, ttl=settings.count_cache_ttl_seconds)
+registry.register_cache("count", count_cache)
+food_truck_flights = SingleFlight()
+registry.register_single_flight("food_trucks", food_truck_flights)
+
 class FoodTruckService:
+    """Read side of the food trucks API.
+
+    Documents are validated when init_db.py ingests them, so reads project only the
+    API fields and wrap them with `model_construct` instead of validating them again.
+
+    MongoDB queries run behind `query_limiter` and with `maxTimeMS` budgets: a request
+    that can't get a slot, or a query over its budget, is answered with a fast 503,
+    except for totals, which are dropped (total=None) when the count runs over.
+    """
+
     def __init__(self):
         self.collection = mongodb.get_collection(settings.collection_name)
 
-    async def get_food_trucks(self, query: Optional[str], status: Optional[str], page: int) -> Tuple[List[FoodTruck], int]:
-        """Get food trucks with optional search query and status filter."""
-        page_size = 10
+    def _build_filters(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        food: Optional[str] = None,
+        open_slot: Optional[int] = None
+    ) -> Dict[str, Any]:
         filters = {}
-        skip = (page - 1) * page_size 
         if query:
-            filters["$or"] = [
-                {"applicant": {"$regex": query, "$options": "i"}},
-                {"address": {"$regex": query, "$options": "i"}}
-            ]
+            filters.update(search_filter(query))
         if status and status != "all":
-            filters["status"] = {"$regex": f"^{status}$", "$options": "i"}
-        total = await self.collection.count_documents(filters)
-        trucks_cursor = self.collection.find(filters).skip(skip).limit(page_size)
-        trucks_list = await trucks_cursor.to_list()
-        food_trucks = [FoodTruck(**truck) for truck in trucks_list]
+            filters["status"] = normalize_status(status)
+        if food:
+            filters.update(food_filter(food))
+        if open_slot is not None:
+            filters.update(open_at_filter(open_slot))
+        return filters
+
+    async def _fuzzy_filters(
+        self,
+        query: str,
+        status: Optional[str],
+        food: Optional[str],
+        open_slot: Optional[int]
+    ) -> Tuple[Dict[str, Any], List[int]]:
+        """Filters limited to the locationids `fuzzy_matcher` finds for the query, and their ranking."""
+        ranked = await fuzzy_matcher.search(query, settings.fuzzy_max_matches)
+        filters = self._build_filters(None, status, food, open_slot)
+        filters["locationid"] = {"$in": ranked}
+        return filters, ranked
+
+    async def get_dataset_version(self) -> int:
+        """Version of the data the next answer will come from, which callers key caches on."""
+        version: Optional[int] = food_truck_engine.version if food_truck_engine.is_loaded else None
+        if version is None:
+            version = await dataset_version.current()
+        return version
+
+    @asynccontextmanager
+    async def _mongo_query(self, name: str) -> AsyncIterator[None]:
+        """Hold a query slot, and turn a query stopped by maxTimeMS into a 503."""
+        async with query_limiter.slot():
+            try:
+                yield
+            except ExecutionTimeout:
+                query_timeouts.inc(query=name)
+                raise service_unavailable("The query took too long, try again or narrow the search")
+
+    async def _count_food_trucks(self, filters: Dict[str, Any]) -> Optional[int]:
+        """Count matches, caching the result per filter for the current dataset version.
+
+        Returns None when the count doesn't fit in `count_max_time_ms`.
+        """
+        try:
+            if not filters:
+                return await self.collection.estimated_document_count(maxTimeMS=settings.count_max_time_ms)
+            key = (await dataset_version.current(), json.dumps(filters, sort_keys=True))
+            total = count_cache.get(key)
+            if total is None:
+                total = await self.collection.count_documents(filters, maxTimeMS=settings.count_max_time_ms)
+                count_cache.set(key, total)
+            return total
+        except ExecutionTimeout:
+            query_timeouts.inc(query="count")
+            return None
+
+    async def _find_page(
+        self,
+        filters: Dict[str, Any],
+        cursor: Union[AsyncIOMotorCursor, AsyncIOMotorCommandCursor],
+        include_total: bool
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Run the count and the page query concurrently; `cursor`, a find or an aggregate, already carries its time budget."""
+        if not include_total:
+            return await cursor.to_list(), None
+        total, trucks_list = await asyncio.gather(self._count_food_trucks(filters), cursor.to_list())
+        return trucks_list, total
+
+    async def get_food_trucks(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        page: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_total: bool = True,
+        fields: Optional[Tuple[str, ...]] = None,
+        food: Optional[str] = None,
+        open_at: Optional[datetime] = None,
+        fuzzy: bool = False
+    ) -> Tuple[List[FoodTruck], Optional[int]]:
+        """Get food trucks with optional search query, status, food and opening hours filters.
+
+        The query is an exact, case-insensitive substring of the applicant or address,
+        and page/skip results are ranked by relevance (see `search_rank`);
+        `food` keeps trucks whose food items contain all of its words and `open_at` those
+        whose schedule covers that moment (to the half hour, in `schedule_timezone`).
+        With `fuzzy` the query instead matches applicant names within a few typos per
+        word, closest first (at most `fuzzy_max_matches` trucks).
+        Passing a cursor or a limit switches from page/skip pagination to keyset
+        pagination ordered by locationid, where every page costs the same as the first.
+        The total is None when include_total is False. `fields` limits the returned
+        models (and the MongoDB projection) to those fields.
+
+        Identical concurrent calls share one MongoDB round trip (see SingleFlight).
+        """
+        open_slot = slot_at(open_at) if open_at is not None else None
+        fuzzy = bool(fuzzy and normalize_text(query))
+        args = (query, status, page, cursor, limit, include_total, fields, food, open_slot, fuzzy)
+        if food_truck_engine.is_loaded:
+            # Answered synchronously from memory; there is nothing in flight to share.
+            return await self._get_food_trucks(*args)
+        key = (
+            normalize_text(query),
+            normalize_status(status),
+            page if cursor is None and limit is None else None,
+            cursor,
+            limit,
+            include_total,
+            fields,
+            tuple(food_tokens([food])) if food else None,
+            open_slot,
+            fuzzy
+        )
+
+        async def run() -> Tuple[List[FoodTruck], Optional[int]]:
+            async with self._mongo_query("food_trucks"):
+                return await self._get_food_trucks(*args)
+
+        return await food_truck_flights.do(key, run)
+
+    async def _get_food_trucks(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        page: int,
+        cursor: Optional[str],
+        limit: Optional[int],
+        include_total: bool,
+        fields: Optional[Tuple[str, ...]],
+        food: Optional[str],
+        open_slot: Optional[int],
+        fuzzy: bool = False
+    ) -> Tuple[List[FoodTruck], Optional[int]]:
+        if cursor is not None or limit is not None:
+            return await self._get_food_trucks_after(query, status, cursor, limit or PAGE_SIZE, include_total, fields, food, open_slot, fuzzy)
+        page_size = PAGE_SIZE
+        if food_truck_engine.is_loaded:
+            trucks_list, total = food_truck_engine.search(query, status, page, page_size, fields, food, open_slot, fuzzy)
+            return [FoodTruck.model_construct(**truck) for truck in trucks_list], total if include_total else None
+        skip = (page - 1) * page_size 
+        if fuzzy and query:
+            filters, ranked = await self._fuzzy_filters(query, status, food, open_slot)
+            # Every candidate is read to put it in rank order; fuzzy_max_matches bounds how many.
+            trucks_cursor = self.collection.find(filters, projection_for(fields)).max_time_ms(settings.query_max_time_ms)
+            trucks_list = await trucks_cursor.to_list(length=None)
+            rank = {locationid: i for i, locationid in enumerate(ranked)}
+            trucks_list.sort(key=lambda truck: rank[truck["locationid"]])
+            food_trucks = [FoodTruck.model_construct(**truck) for truck in trucks_list[skip:skip + page_size]]
+            return food_trucks, len(trucks_list) if include_total else None
+        filters = self._build_filters(query, status, food, open_slot)
+        needle = normalize_text(query)
+        if needle:
+            # Ranked like the engine: applicant matches first, by how much of the name they cover.
+            pipeline = [
+                {"$match": filters},
+                {"$addFields": {"search_rank": search_rank(needle)}},
+                {"$sort": {"search_rank": ASCENDING, "locationid": ASCENDING}},
+                {"$skip": skip},
+                {"$limit": page_size},
+                {"$project": projection_for(fields)}
+            ]
+            trucks_cursor = self.collection.aggregate(pipeline, maxTimeMS=settings.query_max_time_ms)
+        else:
+            trucks_cursor = self.collection.find(filters, projection_for(fields)).skip(skip).limit(page_size)
+            trucks_cursor = trucks_cursor.max_time_ms(settings.query_max_time_ms)
+        trucks_list, total = await self._find_page(filters, trucks_cursor, include_total)
+        food_trucks = [FoodTruck.model_construct(**truck) for truck in trucks_list]
         return food_trucks, total
     
-    async def get_food_trucks_by_status(self, status: str) -> List[FoodTruck]:
-        """Get food trucks by status."""
-        cursor = self.collection.find({"status": {"$regex": f"^{status}$", "$options": "i"}})
-        foodtrucks = await cursor.to_list(length=100)
+    async def _get_food_trucks_after(
+        self,
+        query: Optional[str],
+        status: Optional[str],
+        cursor: Optional[str],
+        limit: int,
+        include_total: bool,
+        fields: Optional[Tuple[str, ...]],
+        food: Optional[str] = None,
+        open_slot: Optional[int] = None,
+        fuzzy: bool = False
+    ) -> Tuple[List[FoodTruck], Optional[int]]:
+        after = decode_cursor(cursor) if cursor else None
+        if food_truck_engine.is_loaded:
+            trucks_list, total = food_truck_engine.search_after(query, status, after, limit, fields, food, open_slot, fuzzy)
+            return [FoodTruck.model_construct(**truck) for truck in trucks_list], total if include_total else None
+        if fuzzy and query:
+            filters, _ = await self._fuzzy_filters(query, status, food, open_slot)
+        else:
+            filters = self._build_filters(query, status, food, open_slot)
+        page_filters = filters if after is None else {**filters, "locationid": {**filters.get("locationid", {}), "$gt": after}}
+        trucks_cursor = self.collection.find(page_filters, projection_for(fields)).sort("locationid", ASCENDING).limit(limit)
+        trucks_cursor = trucks_cursor.max_time_ms(settings.query_max_time_ms)
+        trucks_list, total = await self._find_page(filters, trucks_cursor, include_total)
+        return [FoodTruck.model_construct(**truck) for truck in trucks_list], total
+
+    async def get_food_trucks_by_status(self, status: str, fields: Optional[Tuple[str, ...]] = None) -> List[FoodTruck]:
+        """Get up to 100 food trucks by status, optionally limited to the given fields."""
+        if food_truck_engine.is_loaded:
+            foodtrucks = list(islice(food_truck_engine.iter_rows(status, fields), 100))
+            if not foodtrucks:
+                raise HTTPException(status_code=404, detail=f"No food trucks found with status: {status}")
+            return [FoodTruck.model_construct(**truck) for truck in foodtrucks]
+        cursor = self.collection.find({"status": normalize_status(status)}, projection_for(fields))
+        async with self._mongo_query("status"):
+            foodtrucks = await cursor.max_time_ms(settings.query_max_time_ms).to_list(length=100)
         if not foodtrucks:
             raise HTTPException(status_code=404, detail=f"No food trucks found with status: {status}")
-        return [FoodTruck(**truck) for truck in foodtrucks] 
\ No newline at end of file
+        return [FoodTruck.model_construct(**truck) for truck in foodtrucks] 
+
+    async def suggest(self, prefix: str, limit: int) -> List[Suggestion]:
+        """Type-ahead completions for applicant names and food items, answered from memory."""
+        if food_truck_engine.is_loaded:
+            suggestions = food_truck_engine.suggest(prefix, limit)
+        else:
+            suggestions = await suggester.suggest(prefix, limit)
+        return [Suggestion.model_construct(**suggestion) for suggestion in suggestions]
+
+    async def get_facets(self, query: Optional[str], food_items_limit: int) -> FacetSummary:
+        """Counts by status, facility type and the top food items, optionally scoped by a search query.
+
+        Unscoped facets come from the summary init_db.py stores with each dataset version;
+        a query, or a summary from another version, falls back to one aggregation.
+        """
+        if food_truck_engine.is_loaded:
+            return food_truck_engine.facets(query, food_items_limit)
+        if not query:
+            summary = await read_facet_summary(mongodb.db, await dataset_version.current())
+            if summary is not None:
+                summary["food_items"] = summary["food_items"][:food_items_limit]
+                return summary
+        filters = self._build_filters(query, None)
+        async with self._mongo_query("facets"):
+            return await aggregate_facets(self.collection, filters, food_items_limit, settings.query_max_time_ms)
+
+    async def get_viewport(self, bbox: BBox, zoom: int) -> Dict[str, Any]:
+        """Food trucks inside a bounding box, or grid clusters at `zoom` when there are more than `viewport_max_trucks`.
+
+        Clusters come from the per-zoom tables init_db.py stores with each dataset version,
+        so a zoomed-out map never scans the collection; without a table for the current
+        version they are computed from a bounding-box scan instead.
+        """
+        max_trucks = settings.viewport_max_trucks
+        if food_truck_engine.is_loaded:
+            viewport = food_truck_engine.viewport(bbox, zoom, max_trucks)
+        else:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            filters = {"latitude": {"$gte": min_lat, "$lte": max_lat}, "longitude": {"$gte": min_lon, "$lte": max_lon}}
+            async with self._mongo_query("viewport"):
+                clusters = await read_clusters(mongodb.db, await dataset_version.current(), bbox, zoom, settings.query_max_time_ms)
+                if clusters is None:
+                    table = ClusterTable([cluster_zoom(zoom)])
+                    cursor = self.collection.find(filters, POSITION_PROJECTION).max_time_ms(settings.query_max_time_ms)
+                    async for doc in cursor:
+                        table.add(doc.get("latitude"), doc.get("longitude"), doc.get("status"))
+                    clusters = table.query(bbox, zoom)
+                total = sum(cluster["count"] for cluster in clusters)
+                # Clusters cover whole cells, so their total bounds the number of trucks inside the box.
+                if total > max_trucks:
+                    viewport = {"food_trucks": [], "clusters": clusters, "total": total}
+                else:
+                    cursor = self.collection.find(filters, FOOD_TRUCK_PROJECTION).sort("locationid", ASCENDING)
+                    trucks_list = await cursor.max_time_ms(settings.query_max_time_ms).to_list(length=max_trucks)
+                    viewport = {"food_trucks": trucks_list, "clusters": [], "total": len(trucks_list)}
+        return {
+            "food_trucks": [FoodTruck.model_construct(**truck) for truck in viewport["food_trucks"]],
+            "clusters": [Cluster.model_construct(**cluster) for cluster in viewport["clusters"]],
+            "total": viewport["total"]
+        }
+
+    async def _find_by_ids(self, locationids: List[int], permits: List[str]) -> List[Dict[str, Any]]:
+        if food_truck_engine.is_loaded:
+            return food_truck_engine.lookup(locationids, permits)
+        clauses = []
+        if locationids:
+            clauses.append({"locationid": {"$in": locationids}})
+        if permits:
+            clauses.append({"permit": {"$in": permits}})
+        filters = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        cursor = self.collection.find(filters, FOOD_TRUCK_PROJECTION).max_time_ms(settings.query_max_time_ms)
+        async with self._mongo_query("lookup"):
+            return await cursor.to_list(length=None)
+
+    async def get_food_truck(self, locationid: int) -> FoodTruck:
+        """Get one food truck by locationid."""
+        trucks_list = await self._find_by_ids([locationid], [])
+        if not trucks_list:
+            raise HTTPException(status_code=404, detail=f"No food truck found with locationid: {locationid}")
+        return FoodTruck.model_construct(**trucks_list[0])
+
+    async def get_food_trucks_batch(self, locationids: List[int], permits: List[str]) -> Tuple[List[FoodTruck], List[int], List[str]]:
+        """Resolve locationids and permits with one indexed `$in` query.
+
+        Returns the food trucks in request order (locationids first, then every truck of
+        each permit by locationid, without repeats) and the ids that matched nothing.
+        """
+        trucks_list = await self._find_by_ids(locationids, permits)
+        by_locationid = {truck["locationid"]: truck for truck in trucks_list}
+        by_permit: Dict[str, List[Dict[str, Any]]] = {}
+        for truck in sorted(trucks_list, key=lambda truck: truck["locationid"]):
+            # Trucks without a permit were matched by locationid and can't answer a permit.
+            permit = truck.get("permit")
+            if permit is not None:
+                by_permit.setdefault(permit, []).append(truck)
+
+        ordered, seen = [], set()
+        missing_locationids = [locationid for locationid in locationids if locationid not in by_locationid]
+        missing_permits = [permit for permit in permits if permit not in by_permit]
+        candidates = [by_locationid[locationid] for locationid in locationids if locationid in by_locationid]
+        candidates += [truck for permit in permits for truck in by_permit.get(permit, ())]
+        for truck in candidates:
+            if truck["locationid"] not in seen:
+                seen.add(truck["locationid"])
+                ordered.append(FoodTruck.model_construct(**truck))
+        return ordered, missing_locationids, missing_permits
+
+    async def export_food_trucks(self, status: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every food truck, optionally filtered by status, one document at a time.
+
+        The Motor cursor is read in batches of `export_batch_size`, so memory use doesn't
+        depend on the size of the result.
+        """
+        if food_truck_engine.is_loaded:
+            for truck in food_truck_engine.iter_rows(status):
+                yield truck
+            return
+        filters = {"status": normalize_status(status)} if status and status != "all" else {}
+        cursor = self.collection.find(filters, FOOD_TRUCK_PROJECTION).batch_size(settings.export_batch_size)
+        async for truck in cursor:
+            yield truck
+
+    async def get_nearby_food_trucks(self, latitude: float, longitude: float, radius: float, k: int) -> List[NearbyFoodTruck]:
+        """Get the k food trucks closest to a point, within radius meters, sorted by distance."""
+        if food_truck_engine.is_loaded:
+            return [NearbyFoodTruck.model_construct(**truck) for truck in food_truck_engine.nearby(latitude, longitude, radius, k)]
+        pipeline = [
+            {
+                "$geoNear": {
+                    "near": {"type": "Point", "coordinates": [longitude, latitude]},
+                    "distanceField": "distance",
+                    "maxDistance": radius,
+                    "spherical": True
+                }
+            },
+            {"$limit": k},
+            {"$project": {**FOOD_TRUCK_PROJECTION, "distance": 1}}
+        ]
+        async with self._mongo_query("nearby"):
+            trucks_list = await self.collection.aggregate(pipeline, maxTimeMS=settings.query_max_time_ms).to_list(length=k)
+        return [NearbyFoodTruck.model_construct(**truck) for truck in trucks_list]
\ No newline at end of file
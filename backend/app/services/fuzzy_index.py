@@ -0,0 +1,116 @@
+import heapq
+import re
+from array import array
+from itertools import combinations
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+from app.services.packed import Postings
+from app.services.search_index import normalize_text
+
+MAX_DISTANCE = 2
+
+def words(text: Optional[str]) -> List[str]:
+    """Distinct normalized words of an applicant name or a query."""
+    return list(dict.fromkeys(re.findall(r"\w+", normalize_text(text))))
+
+def max_distance_for(word: str) -> int:
+    """Typos tolerated in a query word: none in very short words, where one edit changes the word entirely."""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else MAX_DISTANCE
+
+def deletes(word: str, distance: int) -> Iterator[str]:
+    """`word` with every combination of up to `distance` characters removed, including itself."""
+    seen: Set[str] = set()
+    for n in range(min(distance, len(word)) + 1):
+        for removed in combinations(range(len(word)), n):
+            variant = "".join(char for i, char in enumerate(word) if i not in removed)
+            if variant not in seen:
+                seen.add(variant)
+                yield variant
+
+def edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Damerau-Levenshtein distance (adjacent swaps count once), or None when it exceeds `max_distance`."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    # Rows i - 2, i - 1 and i of the table; the older two start out unused.
+    previous: List[int] = []
+    current = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1] if current[-1] <= max_distance else None
+
+class FuzzyIndex:
+    """Typo-tolerant word index over applicant names, after SymSpell.
+
+    Every word of every name is stored under each of its variants with up to
+    MAX_DISTANCE characters deleted. A query word is looked up by its own deletes,
+    which meet a stored word's deletes exactly when the two are within that many
+    edits, so a lookup costs the same however many names are indexed; only the few
+    words it finds are checked with a real edit distance.
+    """
+
+    def __init__(self, names: Sequence[Optional[str]]):
+        rows_by_word: Dict[str, array] = {}
+        for i, name in enumerate(names):
+            for word in words(name):
+                rows_by_word.setdefault(word, array("I")).append(i)
+        # Deletes point at words by their position in rows_by_word.
+        words_by_delete: Dict[str, array] = {}
+        for n, word in enumerate(rows_by_word):
+            for variant in deletes(word, MAX_DISTANCE):
+                words_by_delete.setdefault(variant, array("I")).append(n)
+        self.rows_by_word = Postings.from_dict(rows_by_word)
+        self.words_by_delete = Postings.from_dict(words_by_delete)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "FuzzyIndex":
+        index = cls.__new__(cls)
+        index.rows_by_word = Postings.from_state(state["rows_by_word"])
+        index.words_by_delete = Postings.from_state(state["words_by_delete"])
+        return index
+
+    def state(self) -> Dict[str, Any]:
+        return {"rows_by_word": self.rows_by_word.state(), "words_by_delete": self.words_by_delete.state()}
+
+    def lookup(self, word: str) -> Dict[str, int]:
+        """Indexed words within `max_distance_for(word)` edits of `word`, with their distance."""
+        distance = max_distance_for(word)
+        if distance == 0:
+            return {word: 0} if word in self.rows_by_word else {}
+        matches: Dict[str, int] = {}
+        for variant in deletes(word, distance):
+            for n in self.words_by_delete.get(variant, ()):
+                candidate = self.rows_by_word.key_list[n]
+                if candidate not in matches:
+                    found = edit_distance(word, candidate, distance)
+                    if found is not None:
+                        matches[candidate] = found
+        return matches
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """Rows whose name has a close match for every query word, closest first.
+
+        A row scores the sum over query words of its best match's distance; ties keep
+        load order. At most `limit` rows are returned.
+        """
+        scores: Optional[Dict[int, int]] = None
+        for word in words(query):
+            best: Dict[int, int] = {}
+            for match, distance in self.lookup(word).items():
+                for i in self.rows_by_word[match]:
+                    if distance < best.get(i, MAX_DISTANCE + 1):
+                        best[i] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {i: score + best[i] for i, score in scores.items() if i in best}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return heapq.nsmallest(limit, scores, key=lambda i: (scores[i], i))
@@ -0,0 +1,32 @@
+from array import array
+from typing import List, Tuple
+from app.database.mongodb import mongodb
+from app.services.fuzzy_index import FuzzyIndex
+from app.services.versioned_index import VersionedIndex
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+class FuzzyMatcher(VersionedIndex):
+    """Fuzzy applicant index for `fuzzy=true` searches when the in-memory engine is off.
+
+    Built from locationids and applicant names. It resolves a query to ranked
+    locationids, which the service then fetches with one indexed `$in` query.
+    """
+
+    description = "fuzzy applicant index"
+
+    async def build(self) -> Tuple[FuzzyIndex, array]:
+        collection = mongodb.get_collection(settings.collection_name)
+        locationids, applicants = array("q"), []
+        async for doc in collection.find({}, {"_id": 0, "locationid": 1, "applicant": 1}):
+            locationids.append(doc["locationid"])
+            applicants.append(doc.get("applicant"))
+        return FuzzyIndex(applicants), locationids
+
+    async def search(self, query: str, limit: int) -> List[int]:
+        """Locationids of the closest applicant matches, closest first."""
+        index, locationids = await self.get()
+        return [locationids[i] for i in index.search(query, limit)]
+
+fuzzy_matcher = FuzzyMatcher()
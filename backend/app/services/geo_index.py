@@ -0,0 +1,120 @@
+import heapq
+import math
+from array import array
+from typing import Any, Dict, List, Sequence, Tuple
+from app.services.packed import Postings
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+class GeoGrid:
+    """Uniform lat/lon grid over row ids for k-nearest and radius queries.
+
+    Cells are searched in rings of growing size around the query point, and the
+    search stops as soon as no unvisited cell can hold anything closer than the
+    current k-th result, so a query only touches the cells near the point.
+    """
+
+    def __init__(self, latitudes: Sequence[float], longitudes: Sequence[float], cell_degrees: float = 0.01):
+        cells: Dict[Tuple[int, int], array] = {}
+        self.cell_degrees = cell_degrees
+        for i, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            cells.setdefault(self._cell(lat, lon), array("I")).append(i)
+        self._set_cells(latitudes, longitudes, Postings.from_dict(cells))
+
+    @classmethod
+    def from_state(cls, latitudes: Sequence[float], longitudes: Sequence[float], state: Dict[str, Any]) -> "GeoGrid":
+        grid = cls.__new__(cls)
+        grid.cell_degrees = state["cell_degrees"]
+        grid._set_cells(latitudes, longitudes, Postings.from_state(state["cells"]))
+        return grid
+
+    def state(self) -> Dict[str, Any]:
+        return {"cell_degrees": self.cell_degrees, "cells": self.cells.state()}
+
+    def _set_cells(self, latitudes: Sequence[float], longitudes: Sequence[float], cells: Postings):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.cells = cells
+        if self.cells:
+            xs = [x for x, _ in self.cells]
+            ys = [y for _, y in self.cells]
+            self._bounds = (min(xs), max(xs), min(ys), max(ys))
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lon / self.cell_degrees), math.floor(lat / self.cell_degrees)
+
+    def _ring(self, cx: int, cy: int, r: int):
+        if r == 0:
+            yield cx, cy
+            return
+        for x in range(cx - r, cx + r + 1):
+            yield x, cy - r
+            yield x, cy + r
+        for y in range(cy - r + 1, cy + r):
+            yield cx - r, y
+            yield cx + r, y
+
+    def _max_ring(self, cx: int, cy: int) -> int:
+        min_x, max_x, min_y, max_y = self._bounds
+        return max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+
+    def _ring_meters(self, lat: float, r: int) -> float:
+        # Narrowest width of a cell up to r rings away; longitude cells shrink towards the poles.
+        widest_lat = min(abs(lat) + (r + 1) * self.cell_degrees, 90.0)
+        return self.cell_degrees * METERS_PER_DEGREE * max(math.cos(math.radians(widest_lat)), 1e-6)
+
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Row ids inside a latitude/longitude box, in load order."""
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self.cells):
+            cells = (self.cells.get((x, y), ()) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        else:
+            cells = (rows for (x, y), rows in self.cells.items() if x0 <= x <= x1 and y0 <= y <= y1)
+        return sorted(
+            i for rows in cells for i in rows
+            if min_lat <= self.latitudes[i] <= max_lat and min_lon <= self.longitudes[i] <= max_lon
+        )
+
+    def nearest(self, lat: float, lon: float, k: int, max_distance: float = math.inf) -> List[Tuple[float, int]]:
+        """Return up to `k` (distance in meters, row id) pairs within `max_distance`, closest first."""
+        if not self.cells or k <= 0:
+            return []
+        cx, cy = self._cell(lat, lon)
+        best: List[Tuple[float, int]] = []  # max-heap on distance through negated values
+
+        def consider(rows: Sequence[int]):
+            for i in rows:
+                distance = haversine_meters(lat, lon, self.latitudes[i], self.longitudes[i])
+                if distance > max_distance:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, i))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, i))
+
+        for r in range(self._max_ring(cx, cy) + 1):
+            # Everything in ring r is at least r - 1 whole cells away from the query point.
+            reach = (r - 1) * self._ring_meters(lat, r) if r > 1 else 0.0
+            if reach > max_distance or (len(best) == k and reach > -best[0][0]):
+                break
+            if (2 * r + 1) ** 2 > 4 * len(self.cells):
+                # Rings this wide are mostly empty cells; scan the remaining occupied ones instead.
+                for (x, y), rows in self.cells.items():
+                    if max(abs(x - cx), abs(y - cy)) >= r:
+                        consider(rows)
+                break
+            for cell in self._ring(cx, cy, r):
+                consider(self.cells.get(cell, ()))
+        return sorted((-distance, i) for distance, i in best)
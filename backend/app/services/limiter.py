@@ -0,0 +1,62 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.services.metrics import CallbackCounter, CallbackGauge, Counter, registry
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+def service_unavailable(detail: str) -> HTTPException:
+    """503 telling clients when to retry, for load that the API sheds instead of queueing."""
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(settings.retry_after_seconds)})
+
+class ConcurrencyLimiter:
+    """Bounds the MongoDB queries running at once and the requests waiting for a slot.
+
+    A request that finds the queue full, or that waits longer than `queue_timeout`,
+    gets a 503 right away, so a spike sheds load instead of slowing every request.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise service_unavailable("Too many concurrent requests")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise service_unavailable("Too many concurrent requests")
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+query_limiter = ConcurrencyLimiter(
+    max_concurrent=settings.max_concurrent_queries,
+    max_queued=settings.max_queued_queries,
+    queue_timeout=settings.queue_timeout_seconds
+)
+
+registry.register(CallbackGauge("query_limiter_active", "MongoDB queries holding a slot.", (), lambda: [((), query_limiter.active)]))
+registry.register(CallbackGauge("query_limiter_queued", "Requests waiting for a query slot.", (), lambda: [((), query_limiter.queued)]))
+registry.register(CallbackCounter("query_limiter_rejected_total", "Requests shed with a 503.", (), lambda: [((), query_limiter.rejected)]))
+query_timeouts = registry.register(Counter("query_timeouts_total", "MongoDB queries stopped by their maxTimeMS budget.", ("query",)))
@@ -0,0 +1,258 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+from app.services.cache import LRUCache
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+M = TypeVar("M", bound="Metric")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+def _counter_name(name: str) -> str:
+    return name if name.endswith("_total") else f"{name}_total"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric(ABC):
+    """A named family of samples in the Prometheus text exposition format."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # pymongo listeners fire on Motor's worker threads, not the event loop.
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples()]
+        return lines
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class Counter(Metric):
+    """Monotonic count; the exposed name always ends in `_total`."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(_counter_name(name), documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts with a trailing +Inf slot, then the sum.
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are read from `collect` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class CallbackCounter(CallbackGauge):
+    """Counter whose samples are read from `collect` at scrape time."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        super().__init__(_counter_name(name), documentation, labelnames, collect)
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.caches: Dict[str, LRUCache] = {}
+        self.single_flights: Dict[str, Any] = {}
+
+    def register(self, metric: M) -> M:
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, cache: LRUCache):
+        """Expose hits, misses, size and hit ratio of a cache under `cache="name"`."""
+        self.caches[name] = cache
+
+    def register_single_flight(self, name: str, single_flight):
+        """Expose started and coalesced call counts of a SingleFlight under `group="name"`."""
+        self.single_flights[name] = single_flight
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.", ("method",)
+))
+mongodb_command_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trip time.", ("command", "outcome")
+))
+mongodb_pool_checkout_wait = registry.register(Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection.", ("outcome",)
+))
+mongodb_pool_connections = registry.register(Gauge(
+    "mongodb_pool_connections", "Open MongoDB connections by state.", ("state",)
+))
+
+def _cache_stat(read: Callable[[LRUCache], float]) -> Callable[[], Iterable[Tuple[Labels, float]]]:
+    return lambda: [((name,), read(cache)) for name, cache in sorted(registry.caches.items())]
+
+registry.register(CallbackCounter("cache_hits", "Cache lookups answered from the cache.", ("cache",), _cache_stat(lambda cache: cache.hits)))
+registry.register(CallbackCounter("cache_misses", "Cache lookups that missed.", ("cache",), _cache_stat(lambda cache: cache.misses)))
+registry.register(CallbackGauge("cache_entries", "Entries currently held by the cache.", ("cache",), _cache_stat(len)))
+registry.register(CallbackGauge("cache_hit_ratio", "Hits over lookups since startup.", ("cache",), _cache_stat(lambda cache: cache.hit_ratio)))
+
+def _single_flight_stat(read: Callable[[Any], float]) -> Callable[[], Iterable[Tuple[Labels, float]]]:
+    return lambda: [((name,), read(group)) for name, group in sorted(registry.single_flights.items())]
+
+registry.register(CallbackCounter(
+    "single_flight_calls", "Calls that started their own query.", ("group",), _single_flight_stat(lambda group: group.calls)
+))
+registry.register(CallbackCounter(
+    "single_flight_coalesced", "Calls that joined an identical in-flight query.", ("group",), _single_flight_stat(lambda group: group.coalesced)
+))
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template and in-flight requests.
+
+    The route label is the matched path template (`/foodtrucks/status/{status}`), not the
+    raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=method,
+                route=getattr(route, "path", "unmatched"),
+                status=str(status)
+            )
+            http_requests_in_progress.dec(method=method)
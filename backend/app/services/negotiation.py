@@ -0,0 +1,86 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple, cast
+import msgpack
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Lists of trucks as {field: [values...]}, so each key is sent once instead of once per truck.
+COLUMNS = "application/vnd.foodtrucks.columns+json"
+ALIASES = {"application/x-msgpack": MSGPACK}
+
+def parse_accept(header: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in header.split(","):
+        media_range, *params = (item.strip() for item in part.split(";"))
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        ranges.append((ALIASES.get(media_range, media_range), q))
+    return ranges
+
+def negotiate(accept: Optional[str], offered: Sequence[str]) -> str:
+    """The offered media type the client prefers, the first one on ties or without an Accept header.
+
+    Raises 406 when the client accepts none of them.
+    """
+    if not accept or not accept.strip():
+        return offered[0]
+    qualities = dict(parse_accept(accept))
+    best, best_q = None, 0.0
+    for media_type in offered:
+        # The most specific matching range sets the quality, as in RFC 9110.
+        candidates = (media_type, media_type.split("/")[0] + "/*", "*/*")
+        q = next((qualities[media_range] for media_range in candidates if media_range in qualities), 0.0)
+        if q > best_q:
+            best, best_q = media_type, q
+    if best is None:
+        raise HTTPException(status_code=406, detail=f"Acceptable media types: {', '.join(offered)}")
+    return best
+
+def accepts(*media_types: str) -> Callable[[Request], str]:
+    """Dependency resolving the response media type of a route from its Accept header."""
+    offered = media_types
+
+    def dependency(request: Request) -> str:
+        return negotiate(request.headers.get("accept"), offered)
+
+    return dependency
+
+def encode(
+    media_type: str,
+    adapter: TypeAdapter,
+    value: Any,
+    include: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    rows_key: Optional[str] = None
+) -> bytes:
+    """Serialize `value` as `media_type`.
+
+    JSON goes straight through pydantic's serializer. For COLUMNS the list of trucks,
+    `value` itself or its `rows_key` entry, is turned into one array per field in `columns`,
+    or per field of the rows in first-seen order when `columns` is None.
+    """
+    if media_type == JSON:
+        return adapter.dump_json(value, include=include)
+    data = adapter.dump_python(value, mode="json", include=include)
+    if media_type == COLUMNS:
+        rows = data if rows_key is None else data[rows_key]
+        if columns is None:
+            columns = list(dict.fromkeys(field for row in rows for field in row))
+        table = {field: [row.get(field) for row in rows] for field in columns}
+        if rows_key is None:
+            data = table
+        else:
+            data[rows_key] = table
+        return to_json(data)
+    return cast(bytes, msgpack.packb(data))
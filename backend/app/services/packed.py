@@ -0,0 +1,108 @@
+from abc import abstractmethod
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TypeVar, Union, overload
+
+T = TypeVar("T")
+# Array data held in memory, or a view of it in a mapped snapshot.
+Buffer = Union[array, memoryview]
+
+class Postings(Mapping):
+    """Read-only key -> row ids map laid out as two flat arrays.
+
+    The rows of the n-th key are `rows[offsets[n]:offsets[n + 1]]`. The arrays can be
+    views of a memory-mapped snapshot, so every worker shares one copy of the lists;
+    only the key lookup table is per process.
+    """
+
+    def __init__(self, key_list: List[Any], offsets: Sequence[int], rows: Sequence[int]):
+        self.key_list = key_list
+        self.offsets = offsets
+        self.rows = rows
+        self._positions = {key: n for n, key in enumerate(key_list)}
+
+    @classmethod
+    def from_dict(cls, rows_by_key: Mapping[Any, Iterable[int]]) -> "Postings":
+        offsets, rows = array("Q", [0]), array("I")
+        for key_rows in rows_by_key.values():
+            rows.extend(key_rows)
+            offsets.append(len(rows))
+        return cls(list(rows_by_key), offsets, rows)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Postings":
+        # JSON turns tuple keys into lists.
+        key_list = [tuple(key) if isinstance(key, list) else key for key in state["keys"]]
+        return cls(key_list, state["offsets"], state["rows"])
+
+    def state(self) -> Dict[str, Any]:
+        """What a snapshot stores: the keys in its header, the arrays as sections."""
+        return {"keys": self.key_list, "offsets": self.offsets, "rows": self.rows}
+
+    def position(self, key: Any) -> Optional[int]:
+        return self._positions.get(key)
+
+    def at(self, n: int) -> Sequence[int]:
+        return self.rows[self.offsets[n]:self.offsets[n + 1]]
+
+    def __getitem__(self, key: Any) -> Sequence[int]:
+        return self.at(self._positions[key])
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.key_list)
+
+    def __len__(self) -> int:
+        return len(self.key_list)
+
+class Column(Sequence[T]):
+    """Read-only sequence whose items are decoded on access by `item`; slices come back as lists."""
+
+    @abstractmethod
+    def item(self, i: int) -> T:
+        ...
+
+    @overload
+    def __getitem__(self, i: int) -> T:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[T]:
+        ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(i, slice):
+            return [self.item(j) for j in range(*i.indices(len(self)))]
+        return self.item(i)
+
+class PackedText(Column[Optional[str]]):
+    """Read-only sequence of optional strings stored as offsets, null flags and UTF-8 data."""
+
+    def __init__(self, offsets: Sequence[int], nulls: Sequence[int], data: Buffer):
+        self.offsets = offsets
+        self.nulls = nulls
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[Optional[str]]) -> "PackedText":
+        offsets, nulls, data = array("Q", [0]), array("B"), array("B")
+        for value in strings:
+            nulls.append(value is None)
+            if value is not None:
+                data.frombytes(value.encode())
+            offsets.append(len(data))
+        return cls(offsets, nulls, data)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "PackedText":
+        return cls(state["offsets"], state["nulls"], state["data"])
+
+    def state(self) -> Dict[str, Any]:
+        return {"offsets": self.offsets, "nulls": self.nulls, "data": self.data}
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    def item(self, i: int) -> Optional[str]:
+        if self.nulls[i]:
+            return None
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
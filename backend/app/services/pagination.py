@@ -0,0 +1,31 @@
+import base64
+import binascii
+import json
+from typing import List, Optional
+from fastapi import HTTPException
+from app.models.food_truck import FoodTruck
+
+PAGE_SIZE = 10
+MAX_LIMIT = 100
+
+def encode_cursor(locationid: int) -> str:
+    """Opaque keyset cursor pointing just after the given locationid."""
+    payload = json.dumps({"locationid": locationid}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> int:
+    """Return the locationid encoded in a cursor produced by `encode_cursor`."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        locationid = json.loads(payload)["locationid"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(locationid, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return locationid
+
+def next_cursor(food_trucks: List[FoodTruck], limit: int) -> Optional[str]:
+    """Cursor for the page after `food_trucks`, or None when this page was the last one."""
+    if len(food_trucks) < limit or not food_trucks:
+        return None
+    return encode_cursor(food_trucks[-1].locationid)
@@ -0,0 +1,119 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.services.packed import PackedText
+from app.services.search_index import normalize_text
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.top: List[int] = []
+
+class PrefixTrie:
+    """Type-ahead index over applicant names and food items.
+
+    Every word start of a term is a key, so "sisig" completes "Senor Sisig". Each node
+    keeps the ids of its best `top_k` completions, computed once at build time, so a
+    lookup only walks the prefix and never visits the subtree below it.
+    Completions are ranked by whether the prefix starts the term, then by how many
+    trucks carry it.
+
+    Once built, nodes are numbered breadth-first and flattened into arrays: the edges
+    of node n, sorted by character, are `edge_chars`/`edge_nodes[child_offsets[n]:child_offsets[n + 1]]`
+    and its completions `top_ids[top_offsets[n]:top_offsets[n + 1]]`. A snapshot can store them (see `state`).
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, str]], top_k: int = 20):
+        """`terms` are (kind, display text) pairs, one per occurrence on a truck.
+
+        Spellings that normalize alike ("Tacos", "tacos") are one suggestion, counted
+        together and shown as the most frequent spelling.
+        """
+        self.top_k = top_k
+        spellings: Dict[Tuple[str, str], Counter] = {}
+        for kind, text in terms:
+            key = normalize_text(text)
+            if key:
+                spellings.setdefault((kind, key), Counter())[text.strip()] += 1
+        texts, kinds, suggestion_counts = [], [], array("I")
+        entries = []
+        for (kind, key), spelling_counts in spellings.items():
+            count = sum(spelling_counts.values())
+            suggestion_id = len(texts)
+            texts.append(spelling_counts.most_common(1)[0][0])
+            kinds.append(kind)
+            suggestion_counts.append(count)
+            for start in range(len(key)):
+                if start == 0 or key[start - 1] == " ":
+                    entries.append(((start > 0, -count, key), key[start:], suggestion_id))
+        # Inserting best-first means a node's list is final once it holds top_k ids.
+        entries.sort()
+        root = _Node()
+        for _, key, suggestion_id in entries:
+            node = root
+            self._offer(node, suggestion_id)
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                self._offer(node, suggestion_id)
+        self.kinds = sorted(set(kinds))
+        kind_codes = {kind: code for code, kind in enumerate(self.kinds)}
+        self.texts = PackedText.from_strings(texts)
+        self.kind_codes = array("B", (kind_codes[kind] for kind in kinds))
+        self.counts = suggestion_counts
+        self._flatten(root)
+
+    def _offer(self, node: _Node, suggestion_id: int):
+        if len(node.top) < self.top_k and suggestion_id not in node.top:
+            node.top.append(suggestion_id)
+
+    def _flatten(self, root: _Node):
+        self.child_offsets, self.edge_chars, self.edge_nodes = array("Q", [0]), array("I"), array("I")
+        self.top_offsets, self.top_ids = array("Q", [0]), array("I")
+        queue, numbered = deque([root]), 1
+        while queue:
+            node = queue.popleft()
+            for char in sorted(node.children):
+                self.edge_chars.append(ord(char))
+                self.edge_nodes.append(numbered)
+                numbered += 1
+                queue.append(node.children[char])
+            self.child_offsets.append(len(self.edge_chars))
+            self.top_ids.extend(node.top)
+            self.top_offsets.append(len(self.top_ids))
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "PrefixTrie":
+        trie = cls.__new__(cls)
+        trie.top_k = state["top_k"]
+        trie.kinds = state["kinds"]
+        trie.texts = PackedText.from_state(state["texts"])
+        for name in ("kind_codes", "counts", "child_offsets", "edge_chars", "edge_nodes", "top_offsets", "top_ids"):
+            setattr(trie, name, state[name])
+        return trie
+
+    def state(self) -> Dict[str, Any]:
+        state = {"top_k": self.top_k, "kinds": self.kinds, "texts": self.texts.state()}
+        for name in ("kind_codes", "counts", "child_offsets", "edge_chars", "edge_nodes", "top_offsets", "top_ids"):
+            state[name] = getattr(self, name)
+        return state
+
+    def suggestion(self, suggestion_id: int) -> Dict[str, object]:
+        return {
+            "text": self.texts[suggestion_id],
+            "kind": self.kinds[self.kind_codes[suggestion_id]],
+            "count": self.counts[suggestion_id]
+        }
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        node = 0
+        for char in normalize_text(prefix):
+            start, end = self.child_offsets[node], self.child_offsets[node + 1]
+            j = bisect_left(self.edge_chars, ord(char), start, end)
+            if j == end or self.edge_chars[j] != ord(char):
+                return []
+            node = self.edge_nodes[j]
+        top = self.top_ids[self.top_offsets[node]:self.top_offsets[node + 1]]
+        return [self.suggestion(i) for i in top[:limit]]
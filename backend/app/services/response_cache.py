@@ -0,0 +1,91 @@
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import Request, Response
+from app.services.cache import LRUCache
+from app.services.compression import compress, negotiate_encoding
+from app.services.metrics import registry
+from app.services.negotiation import JSON
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+def make_etag(key: str, encoding: Optional[str] = None) -> str:
+    """Strong ETag for a cache key. Keys include the dataset version, so equal keys mean equal bodies.
+
+    Compressed variants get their own tag, since their bytes differ; `encoding` is the one actually served.
+    """
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}{suffix}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match names `etag`; `*` matches any body, so only check it once one exists."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+class Uncacheable(bytes):
+    """A rendered body to send once but not keep, such as a list degraded to no total."""
+
+class ResponseCache:
+    """Bounded cache of encoded bodies keyed by media type, route, normalized parameters and dataset version.
+
+    Each entry also keeps the gzip and brotli variants of its body, compressed on first
+    use, so cache hits don't pay for compression again.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float]):
+        self.bodies = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.not_modified = 0
+
+    @staticmethod
+    def make_key(route: str, params: Dict[str, Any], version: Any) -> str:
+        return json.dumps([route, version, params], sort_keys=True, default=str)
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        render: Callable[[], Awaitable[bytes]],
+        media_type: str = JSON
+    ) -> Response:
+        """Answer from the cache, with 304 when the client already has this version of the body.
+
+        `render` only runs on a cache miss and must encode the body as `media_type`.
+        """
+        key = f"{media_type} {key}"
+        # Rendered before any If-None-Match check, so `*` never answers for a body that
+        # doesn't exist (a 404 stays a 404) and the tag names the variant actually served.
+        variants: Optional[Dict[Optional[str], bytes]] = self.bodies.get(key)
+        if variants is None:
+            body = await render()
+            if isinstance(body, Uncacheable):
+                # Left to CompressionMiddleware, like any other uncached response.
+                return Response(content=bytes(body), media_type=media_type, headers={"Cache-Control": "no-store", "Vary": "Accept"})
+            variants = {None: body}
+            self.bodies.set(key, variants)
+        body = variants[None]
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if len(body) < settings.compression_minimum_size:
+            encoding = None
+        headers = {
+            "ETag": make_etag(key, encoding),
+            "Cache-Control": f"public, max-age={settings.cache_control_max_age}",
+            "Vary": "Accept, Accept-Encoding"
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            if encoding not in variants:
+                variants[encoding] = compress(body, encoding)
+            body = variants[encoding]
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def clear(self):
+        self.bodies.clear()
+
+response_cache = ResponseCache(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl_seconds)
+registry.register_cache("response", response_cache.bodies)
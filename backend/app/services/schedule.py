@@ -0,0 +1,95 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+DAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+BITMAP_BYTES = WEEK_SLOTS // 8
+
+_TIME = r"(\d{1,2})(?::(\d{2}))?\s*(AM|PM)"
+TIME_RANGE = re.compile(rf"^{_TIME}\s*-\s*{_TIME}$", re.IGNORECASE)
+
+class ScheduleError(ValueError):
+    """A days_hours value that doesn't follow the permit dump's schedule grammar."""
+
+def _minutes(hour: str, minute: Optional[str], meridiem: str) -> int:
+    h, m = int(hour), int(minute or 0)
+    if not 1 <= h <= 12 or m >= 60:
+        raise ScheduleError("invalid time")
+    return (h % 12 + (12 if meridiem.upper() == "PM" else 0)) * 60 + m
+
+def _days(text: str):
+    days = []
+    for part in text.split("/"):
+        ends = [end.strip().capitalize() for end in part.split("-")]
+        if len(ends) > 2 or any(end not in DAYS for end in ends):
+            raise ScheduleError(f"invalid days {part!r}")
+        first, last = DAYS.index(ends[0]), DAYS.index(ends[-1])
+        days += [(first + offset) % 7 for offset in range((last - first) % 7 + 1)]
+    return days
+
+@lru_cache(maxsize=4096)
+def parse_days_hours(text: str) -> int:
+    """Weekly schedule as a WEEK_SLOTS-bit integer; bit `day * SLOTS_PER_DAY + slot` is set when open.
+
+    The grammar is the one used by the permits dump: `;`-separated groups of
+    `days:ranges`, days as `Mo`, `Mo-Fr` or `Mo/We/Fr`, ranges as `9AM-5PM` joined by
+    `/`. A range ending at or before its start runs past midnight into the next day.
+    """
+    bitmap = 0
+    for group in filter(None, (group.strip() for group in text.split(";"))):
+        days, sep, ranges = group.partition(":")
+        if not sep:
+            raise ScheduleError("missing ':' between days and hours")
+        for time_range in ranges.split("/"):
+            match = TIME_RANGE.match(time_range.strip())
+            if not match:
+                raise ScheduleError(f"invalid hours {time_range.strip()!r}")
+            start = _minutes(*match.group(1, 2, 3))
+            end = _minutes(*match.group(4, 5, 6))
+            if end <= start:
+                end += 24 * 60
+            first_slot = start // SLOT_MINUTES
+            last_slot = -(-end // SLOT_MINUTES)
+            for day in _days(days):
+                for slot in range(first_slot, last_slot):
+                    bitmap |= 1 << ((day * SLOTS_PER_DAY + slot) % WEEK_SLOTS)
+    if not bitmap:
+        raise ScheduleError("no opening hours")
+    return bitmap
+
+def schedule_bitmap(text: Optional[str]) -> Optional[bytes]:
+    """days_hours packed into BITMAP_BYTES little-endian bytes, as stored in `open_hours`.
+
+    Returns None for an empty schedule; raises ScheduleError when it can't be parsed.
+    Bit n is bit n % 8 of byte n // 8, the numbering `$bitsAnySet` uses for BinData.
+    """
+    if not text or not text.strip():
+        return None
+    return parse_days_hours(text.strip()).to_bytes(BITMAP_BYTES, "little")
+
+def local_time(moment: Optional[datetime] = None) -> datetime:
+    """`moment` in the permits' time zone; naive values are taken as already local."""
+    zone = ZoneInfo(settings.schedule_timezone)
+    if moment is None:
+        return datetime.now(zone)
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(zone)
+
+def slot_at(moment: Optional[datetime] = None) -> int:
+    """Week slot of `moment` (now by default) in the permits' time zone."""
+    moment = local_time(moment)
+    return moment.weekday() * SLOTS_PER_DAY + (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+def open_at_filter(slot: int) -> Dict[str, Any]:
+    # Bitwise operators can't use an index to narrow the scan, so on MongoDB this filter
+    # is checked per document the other filters leave; the engine groups rows by bitmap instead.
+    return {"open_hours": {"$bitsAnySet": [slot]}}
@@ -0,0 +1,149 @@
+import re
+from array import array
+from typing import Any, Collection, Dict, List, Optional, Sequence
+from app.services.packed import PackedText, Postings
+
+GRAM_SIZE = 3
+
+def normalize_text(text: Optional[str]) -> str:
+    """Case-fold and collapse whitespace so indexing and matching agree on one form."""
+    return " ".join((text or "").casefold().split())
+
+def trigrams(text: str) -> List[str]:
+    """Distinct trigrams of an already normalized string, in first-seen order."""
+    return list(dict.fromkeys(text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)))
+
+def search_grams(applicant: Optional[str], address: Optional[str]) -> List[str]:
+    """Trigrams stored on each document at ingest and covered by a multikey index."""
+    return list(dict.fromkeys(trigrams(normalize_text(applicant)) + trigrams(normalize_text(address))))
+
+def food_token(word: str) -> str:
+    """Fold simple plurals so "taco" and "tacos" index to the same token."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def food_tokens(food_items: Optional[Sequence[str]]) -> List[str]:
+    """Distinct normalized words of a food items list, stored on each document under a multikey index."""
+    words = re.findall(r"\w+", normalize_text(" ".join(food_items or ())))
+    return list(dict.fromkeys(food_token(word) for word in words))
+
+def food_filter(food: str) -> Dict[str, Any]:
+    """MongoDB filter for trucks whose food items contain every word of `food` (empty if it has no words)."""
+    tokens = food_tokens([food])
+    return {"food_tokens": {"$all": tokens}} if tokens else {}
+
+def _search_pattern(normalized: str) -> str:
+    return r"\s+".join(re.escape(token) for token in normalized.split())
+
+def search_filter(query: str) -> Dict[str, Any]:
+    """MongoDB filter for an exact, case-insensitive substring match on applicant or address.
+
+    The `$all` clause on `search_grams` lets the index narrow the candidates; the escaped
+    regex only has to confirm the substring on those documents.
+    """
+    normalized = normalize_text(query)
+    pattern = _search_pattern(normalized)
+    filters: Dict[str, Any] = {
+        "$or": [
+            {"applicant": {"$regex": pattern, "$options": "i"}},
+            {"address": {"$regex": pattern, "$options": "i"}}
+        ]
+    }
+    grams = trigrams(normalized)
+    if grams:
+        filters["search_grams"] = {"$all": grams}
+    return filters
+
+def search_rank(query: str) -> Dict[str, Any]:
+    """Aggregation expression ranking a `search_filter` match like `TrigramIndex.rank` (lower is better).
+
+    Applicant matches come first (the whole name, then its start, then a word start,
+    then anywhere), then address matches at a word start, then anywhere else.
+    """
+    pattern = _search_pattern(normalize_text(query))
+
+    def matches(field: str, regex: str) -> Dict[str, Any]:
+        return {"$regexMatch": {"input": {"$ifNull": [f"${field}", ""]}, "regex": regex, "options": "i"}}
+
+    branches = [
+        matches("applicant", rf"^\s*{pattern}\s*$"),
+        matches("applicant", rf"^\s*{pattern}"),
+        matches("applicant", rf"(^|\s){pattern}"),
+        matches("applicant", pattern),
+        matches("address", rf"(^|\s){pattern}")
+    ]
+    return {"$switch": {"branches": [{"case": case, "then": rank} for rank, case in enumerate(branches)], "default": len(branches)}}
+
+def _word_start(text: str, needle: str) -> bool:
+    return text.startswith(needle) or f" {needle}" in text
+
+class TrigramIndex:
+    """Inverted trigram index over normalized applicant and address values.
+
+    Candidates come from intersecting the posting lists of the query's trigrams,
+    smallest first, and are then checked for the exact substring. Queries shorter
+    than a trigram fall back to a scan. The normalized text and the posting lists are
+    packed into flat arrays, which a snapshot stores and workers map (see `state`).
+    """
+
+    def __init__(self, applicants: Sequence[Optional[str]], addresses: Sequence[Optional[str]]):
+        postings: Dict[str, array] = {}
+        for i, (applicant, address) in enumerate(zip(applicants, addresses)):
+            for gram in dict.fromkeys(trigrams(normalize_text(applicant)) + trigrams(normalize_text(address))):
+                postings.setdefault(gram, array("I")).append(i)
+        self.applicants = PackedText.from_strings(normalize_text(value) for value in applicants)
+        self.addresses = PackedText.from_strings(normalize_text(value) for value in addresses)
+        self.postings = Postings.from_dict(postings)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "TrigramIndex":
+        index = cls.__new__(cls)
+        index.applicants = PackedText.from_state(state["applicants"])
+        index.addresses = PackedText.from_state(state["addresses"])
+        index.postings = Postings.from_state(state["postings"])
+        return index
+
+    def state(self) -> Dict[str, Any]:
+        return {"applicants": self.applicants.state(), "addresses": self.addresses.state(), "postings": self.postings.state()}
+
+    def _candidates(self, needle: str) -> Collection[int]:
+        grams = trigrams(needle)
+        if not grams:
+            return range(len(self.applicants))
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        if not lists[0]:
+            return ()
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                break
+        return candidates
+
+    def rank(self, i: int, needle: str) -> Optional[int]:
+        """Relevance bucket of row i for needle (lower is better), or None if it doesn't match."""
+        # Stored normalized, so never None.
+        applicant, address = self.applicants[i] or "", self.addresses[i] or ""
+        if needle in applicant:
+            if applicant == needle:
+                return 0
+            if applicant.startswith(needle):
+                return 1
+            return 2 if _word_start(applicant, needle) else 3
+        if needle in address:
+            return 4 if _word_start(address, needle) else 5
+        return None
+
+    def search(self, query: str) -> List[int]:
+        """Row ids whose applicant or address contain the query, most relevant first."""
+        needle = normalize_text(query)
+        if not needle:
+            return list(range(len(self.applicants)))
+        ranked = []
+        for i in self._candidates(needle):
+            rank = self.rank(i, needle)
+            if rank is not None:
+                ranked.append((rank, i))
+        ranked.sort()
+        return [i for _, i in ranked]
@@ -0,0 +1,256 @@
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import time
+from array import array
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Sequence
+from app.services.packed import Column, PackedText
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+MAGIC = b"FTSNAP02"
+ALIGNMENT = 8
+# Object columns that aren't plain text; food items are stored joined by a unit separator.
+LIST_FIELDS = ("food_items",)
+DATETIME_FIELDS = ("expiration_date",)
+LIST_SEPARATOR = "\x1f"
+EPOCH = datetime(1970, 1, 1)
+NULL_TIMESTAMP = -2 ** 63
+# Marks an array section inside the header's tree of index state.
+ARRAY_KEY = "$array"
+# Array typecodes the engine's columns and indexes use.
+Typecode = Literal["B", "H", "I", "Q", "q", "d"]
+
+class SnapshotError(Exception):
+    """A snapshot file that is truncated, from another format version or otherwise unreadable."""
+
+class TextColumn(PackedText):
+    """Read-only view of a string column inside a mapped snapshot; values are decoded on access."""
+
+class ListColumn(Column[Optional[List[str]]]):
+    def __init__(self, texts: TextColumn):
+        self.texts = texts
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def item(self, i: int) -> Optional[List[str]]:
+        text = self.texts.item(i)
+        if text is None:
+            return None
+        return text.split(LIST_SEPARATOR) if text else []
+
+class DatetimeColumn(Column[Optional[datetime]]):
+    def __init__(self, timestamps: memoryview):
+        self.timestamps = timestamps
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def item(self, i: int) -> Optional[datetime]:
+        value = self.timestamps[i]
+        return None if value == NULL_TIMESTAMP else EPOCH + timedelta(microseconds=value)
+
+class Snapshot:
+    """A memory-mapped snapshot of the engine's columns.
+
+    Numeric and dictionary-encoded columns are zero-copy views of the mapping and string
+    columns decode on access, so every worker mapping the same file shares one copy of
+    the data in the page cache. The same goes for `indexes`, the engine's derived
+    indexes: a tree of header values whose arrays are views of the mapping too.
+    The mapping is released once nothing references it.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        buffer = memoryview(self._mmap)
+        if len(buffer) < 16 or bytes(buffer[:8]) != MAGIC:
+            raise SnapshotError(f"{path} is not a food truck snapshot")
+        header_length = int.from_bytes(buffer[8:16], "little")
+        try:
+            header = json.loads(bytes(buffer[16:16 + header_length]))
+        except ValueError:
+            raise SnapshotError(f"{path} has a corrupt header")
+        if header.get("length") != len(buffer):
+            raise SnapshotError(f"{path} is truncated")
+        self.version: int = header["version"]
+        self.built_at: float = header["built_at"]
+        self.size: int = header["size"]
+        self.vocabularies: Dict[str, List[Optional[str]]] = header["vocabularies"]
+        self.values: Dict[str, Any] = {}
+
+        def section(offset: int, length: int, typecode: Typecode = "B") -> "memoryview[Any]":
+            return buffer[offset:offset + length].cast(typecode)
+
+        for field, spec in header["columns"].items():
+            if spec["kind"] == "array":
+                itemsize = array(spec["typecode"]).itemsize
+                self.values[field] = section(spec["offset"], self.size * itemsize, spec["typecode"])
+            elif spec["kind"] == "datetime":
+                self.values[field] = DatetimeColumn(section(spec["offset"], self.size * 8, "q"))
+            else:
+                texts = TextColumn(
+                    section(spec["offsets"], (self.size + 1) * 8, "Q"),
+                    section(spec["nulls"], self.size),
+                    section(spec["data"], spec["data_length"])
+                )
+                self.values[field] = ListColumn(texts) if spec["kind"] == "list" else texts
+
+        def restore(node: Any) -> Any:
+            if isinstance(node, dict):
+                if ARRAY_KEY in node:
+                    spec = node[ARRAY_KEY]
+                    return section(spec["offset"], spec["length"] * array(spec["typecode"]).itemsize, spec["typecode"])
+                return {key: restore(value) for key, value in node.items()}
+            return node
+
+        self.indexes: Dict[str, Any] = restore(header.get("indexes") or {})
+
+def _encode_text(field: str, column: Sequence[Any]):
+    nulls = bytearray(len(column))
+    offsets = array("Q", [0])
+    data = bytearray()
+    for i, value in enumerate(column):
+        if value is None:
+            nulls[i] = 1
+        elif field in LIST_FIELDS:
+            data += LIST_SEPARATOR.join(value).encode()
+        else:
+            data += value.encode()
+        offsets.append(len(data))
+    return offsets.tobytes(), bytes(nulls), bytes(data)
+
+def write_snapshot(
+    path: str,
+    version: int,
+    size: int,
+    values: Dict[str, Any],
+    vocabularies: Dict[str, List[Optional[str]]],
+    built_at: Optional[float] = None,
+    indexes: Optional[Dict[str, Any]] = None
+):
+    """Write columns to `path` atomically: readers see the old file or the complete new one.
+
+    `indexes` is a tree of JSON values and arrays; the arrays are stored as sections.
+    """
+    sections: List[bytes] = []
+    columns: Dict[str, Dict[str, Any]] = {}
+    position = 0
+
+    def add(blob: bytes) -> int:
+        nonlocal position
+        offset = position
+        padding = -len(blob) % ALIGNMENT
+        sections.append(blob + b"\0" * padding)
+        position += len(blob) + padding
+        return offset
+
+    for field, column in values.items():
+        if isinstance(column, (array, memoryview)):
+            typecode = column.typecode if isinstance(column, array) else column.format
+            columns[field] = {"kind": "array", "typecode": typecode, "offset": add(bytes(column))}
+        elif field in DATETIME_FIELDS:
+            timestamps = array("q", (
+                NULL_TIMESTAMP if value is None else (value.replace(tzinfo=None) - EPOCH) // timedelta(microseconds=1)
+                for value in column
+            ))
+            columns[field] = {"kind": "datetime", "offset": add(timestamps.tobytes())}
+        else:
+            offsets, nulls, data = _encode_text(field, column)
+            columns[field] = {
+                "kind": "list" if field in LIST_FIELDS else "text",
+                "offsets": add(offsets),
+                "nulls": add(nulls),
+                "data": add(data),
+                "data_length": len(data)
+            }
+
+    def add_tree(node: Any) -> Any:
+        if isinstance(node, (array, memoryview)):
+            typecode = node.typecode if isinstance(node, array) else node.format
+            return {ARRAY_KEY: {"typecode": typecode, "offset": add(bytes(node)), "length": len(node)}}
+        if isinstance(node, dict):
+            return {key: add_tree(value) for key, value in node.items()}
+        return node
+
+    index_tree = add_tree(indexes or {})
+
+    def shift_tree(node: Any, start: int) -> Any:
+        if isinstance(node, dict):
+            if ARRAY_KEY in node:
+                return {ARRAY_KEY: {**node[ARRAY_KEY], "offset": node[ARRAY_KEY]["offset"] + start}}
+            return {key: shift_tree(value, start) for key, value in node.items()}
+        return node
+
+    def header_bytes(start: int) -> bytes:
+        shifted = {
+            field: {key: value + start if key in ("offset", "offsets", "nulls", "data") else value for key, value in spec.items()}
+            for field, spec in columns.items()
+        }
+        header = {
+            "version": version,
+            "built_at": time.time() if built_at is None else built_at,
+            "size": size,
+            "length": start + position,
+            "vocabularies": vocabularies,
+            "columns": shifted,
+            "indexes": shift_tree(index_tree, start)
+        }
+        encoded = json.dumps(header).encode()
+        return encoded + b" " * (-len(encoded) % ALIGNMENT)
+
+    # Section offsets depend on the header length and vice versa; pad until they agree.
+    start = 16
+    while True:
+        header = header_bytes(start)
+        if 16 + len(header) == start:
+            break
+        start = 16 + len(header)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for blob in sections:
+            file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def snapshot_path(version: int) -> str:
+    return os.path.join(settings.snapshot_dir, f"{settings.collection_name}-v{version}.snapshot")
+
+def open_snapshot(version: int) -> Optional[Snapshot]:
+    """The snapshot of dataset `version`, or None when it hasn't been written (or is unreadable)."""
+    try:
+        return Snapshot(snapshot_path(version))
+    except (FileNotFoundError, SnapshotError, ValueError):
+        return None
+
+def remove_old_snapshots(keep: int):
+    """Delete snapshots of versions older than `keep`. Workers still mapping one keep reading it."""
+    prefix = f"{settings.collection_name}-v"
+    for name in os.listdir(settings.snapshot_dir):
+        if name.startswith(prefix) and name.endswith(".snapshot"):
+            version = name[len(prefix):-len(".snapshot")]
+            if version.isdigit() and int(version) < keep:
+                try:
+                    os.remove(os.path.join(settings.snapshot_dir, name))
+                except FileNotFoundError:
+                    pass
+
+@asynccontextmanager
+async def build_lock() -> AsyncIterator[None]:
+    """Cross-process lock so only one worker per box reads MongoDB and writes a snapshot."""
+    os.makedirs(settings.snapshot_dir, exist_ok=True)
+    fd = os.open(os.path.join(settings.snapshot_dir, f"{settings.collection_name}.lock"), os.O_CREAT | os.O_RDWR)
+    try:
+        await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
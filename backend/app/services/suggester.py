@@ -0,0 +1,29 @@
+from typing import Any, Dict, List
+from app.database.mongodb import mongodb
+from app.services.prefix_trie import PrefixTrie
+from app.services.versioned_index import VersionedIndex
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+class Suggester(VersionedIndex):
+    """Prefix trie for type-ahead when the in-memory engine is off.
+
+    Built from applicant names and food items; lookups never query MongoDB.
+    """
+
+    description = "suggestion trie"
+
+    async def build(self) -> PrefixTrie:
+        collection = mongodb.get_collection(settings.collection_name)
+        terms = []
+        async for doc in collection.find({}, {"_id": 0, "applicant": 1, "food_items": 1}):
+            terms.append(("applicant", doc.get("applicant")))
+            terms += [("food_item", item) for item in doc.get("food_items") or ()]
+        return PrefixTrie(terms)
+
+    async def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        trie = await self.get()
+        return trie.suggest(prefix, limit)
+
+suggester = Suggester()
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+from app.database.dataset_version import dataset_version
+
+logger = logging.getLogger(__name__)
+
+class VersionedIndex(ABC):
+    """An in-memory index over the collection, rebuilt in the background when the dataset version changes.
+
+    Subclasses implement `build`. `get` loads the index on first use; after that it
+    keeps answering from the current one while a newer version builds.
+    """
+
+    description = "index"
+
+    def __init__(self):
+        self._index: Any = None
+        self._version: Optional[int] = None
+        self._refresh: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def build(self) -> Any:
+        """Read the collection and return the index."""
+
+    async def load(self):
+        version = await dataset_version.fetch()
+        self._index = await self.build()
+        self._version = version
+        logger.info("Built the %s for dataset version %s", self.description, version)
+
+    async def _reload(self):
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Error rebuilding the %s", self.description)
+
+    async def get(self) -> Any:
+        if self._index is None:
+            await self.load()
+        elif await dataset_version.current() != self._version and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.create_task(self._reload())
+        return self._index
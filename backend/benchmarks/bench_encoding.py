@@ -0,0 +1,105 @@
+"""Bytes on the wire and encode CPU per response format and content encoding.
+
+Renders /foodtrucks list bodies (a MAX_LIMIT page and a bulk body of up to BULK_TRUCKS)
+as JSON, column-oriented JSON and msgpack, then compresses each with gzip and brotli,
+exactly as the routes and the response cache do.
+
+    python benchmarks/bench_encoding.py [--rows 100k] [--json]
+"""
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+from app.models.food_truck import FoodTruck, FoodTruckListResponse
+from app.routes.food_trucks import TRUCK_FIELDS, food_truck_list_response_adapter
+from app.services.compression import compress
+from app.services.negotiation import COLUMNS, JSON, MSGPACK, encode
+from app.services.pagination import MAX_LIMIT
+from bench_serialization import load_documents, project
+from generate_dataset import generate, parse_rows
+from scripts.init_db import CSV_FILE
+
+BULK_TRUCKS = 10_000
+FORMATS = {"json": JSON, "columns": COLUMNS, "msgpack": MSGPACK}
+
+def cpu_us(work: Callable[[], Any], min_seconds: float) -> float:
+    """Mean CPU time of `work` in microseconds."""
+    work()  # warm up
+    iterations = 0
+    started = time.process_time()
+    while True:
+        work()
+        iterations += 1
+        elapsed = time.process_time() - started
+        if elapsed >= min_seconds:
+            return elapsed / iterations * 1e6
+
+def measure(docs: List[Dict[str, Any]], min_seconds: float) -> List[Dict[str, Any]]:
+    response = FoodTruckListResponse.model_construct(
+        food_trucks=[FoodTruck.model_construct(**project(doc)) for doc in docs],
+        total=len(docs),
+        next_cursor=None
+    )
+    encodings = ("identity", "gzip", "br")
+    results = []
+    for name, media_type in FORMATS.items():
+        def render() -> bytes:
+            return encode(media_type, food_truck_list_response_adapter, response, columns=TRUCK_FIELDS, rows_key="food_trucks")
+
+        body = render()
+        encode_us = cpu_us(render, min_seconds)
+        for encoding in encodings:
+            if encoding == "identity":
+                size, compress_us = len(body), 0.0
+            else:
+                size = len(compress(body, encoding))
+                compress_us = cpu_us(lambda: compress(body, encoding), min_seconds)
+            results.append({
+                "format": name,
+                "encoding": encoding,
+                "bytes": size,
+                "encode_us": encode_us,
+                "compress_us": compress_us
+            })
+    return results
+
+def run(path: str, min_seconds: float, label: str = "bundled") -> List[Dict[str, Any]]:
+    docs = load_documents(path)
+    results = []
+    for body, page in (("page", docs[:MAX_LIMIT]), ("bulk", docs[:BULK_TRUCKS])):
+        for result in measure(page, min_seconds):
+            results.append({"dataset": label, "body": body, "trucks": len(page), **result})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").strip().split("\n")[0])
+    parser.add_argument("--rows", default="10k", help="Size of the scaled dataset measured after the bundled one: a row count or 10k/100k/1m")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum CPU time spent per measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    source = str(Path(project_root) / CSV_FILE)
+    results = run(source, args.min_seconds)
+    with tempfile.TemporaryDirectory() as tmp:
+        scaled = str(Path(tmp) / "permits.csv")
+        generate(source, scaled, parse_rows(args.rows))
+        results += run(scaled, args.min_seconds, label=args.rows)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'dataset':>8}  {'body':>4}  {'trucks':>7}  {'format':>8}  {'encoding':>8}  {'bytes':>12}  {'encode us':>10}  {'compress us':>11}")
+    for result in results:
+        print(
+            f"{result['dataset']:>8}  {result['body']:>4}  {result['trucks']:>7}  {result['format']:>8}  {result['encoding']:>8}  "
+            f"{result['bytes']:>12,}  {result['encode_us']:>10,.0f}  {result['compress_us']:>11,.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
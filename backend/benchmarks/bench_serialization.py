@@ -0,0 +1,100 @@
+"""Compare the validated and trusted serialization paths of the /foodtrucks list response.
+
+"validated" is what the route did before: FoodTruck(**doc) in the service, then FastAPI
+validating and serializing the result again through response_model. "trusted" is the
+current path: model_construct on projected documents and a single model_dump_json.
+
+Everything runs on one core, so pages/sec is a per-core figure.
+
+    python benchmarks/bench_serialization.py [--json]
+"""
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.models.food_truck import FoodTruck, FoodTruckListResponse
+from scripts.init_db import CSV_FILE, iter_chunks, parse_chunk
+
+PAGE_SIZES = (10, 100, 488)
+RESPONSE_FIELD = create_model_field(name="Response_read_foodtrucks", type_=FoodTruckListResponse, mode="serialization")
+LOOP = asyncio.new_event_loop()
+
+def load_documents(path: str) -> List[Dict[str, Any]]:
+    docs = []
+    for chunk in iter_chunks(path, 5000):
+        docs.extend(parse_chunk(chunk)[0])
+    return docs
+
+def project(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: doc.get(field) for field in FoodTruck.model_fields}
+
+def validated_page(docs: List[Dict[str, Any]]) -> bytes:
+    food_trucks = [FoodTruck(**doc) for doc in docs]
+    content = LOOP.run_until_complete(serialize_response(
+        field=RESPONSE_FIELD,
+        response_content={"food_trucks": food_trucks, "total": len(food_trucks)},
+        is_coroutine=True
+    ))
+    return bytes(JSONResponse(content).body)
+
+def trusted_page(docs: List[Dict[str, Any]]) -> bytes:
+    food_trucks = [FoodTruck.model_construct(**doc) for doc in docs]
+    return FoodTruckListResponse.model_construct(food_trucks=food_trucks, total=len(food_trucks)).model_dump_json().encode()
+
+def measure(render: Callable[[List[Dict[str, Any]]], bytes], docs: List[Dict[str, Any]], min_seconds: float) -> Dict[str, float]:
+    render(docs)  # warm up
+    iterations = 0
+    started = time.perf_counter()
+    while True:
+        render(docs)
+        iterations += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+    return {"pages_per_sec": iterations / elapsed, "us_per_page": elapsed / iterations * 1e6}
+
+def run(path: str, min_seconds: float) -> List[Dict[str, Any]]:
+    docs = load_documents(path)
+    projected = [project(doc) for doc in docs]
+    results = []
+    for page_size in PAGE_SIZES:
+        before = measure(validated_page, docs[:page_size], min_seconds)
+        after = measure(trusted_page, projected[:page_size], min_seconds)
+        results.append({
+            "page_size": min(page_size, len(docs)),
+            "validated": before,
+            "trusted": after,
+            "speedup": after["pages_per_sec"] / before["pages_per_sec"]
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").strip().split("\n")[0])
+    parser.add_argument("--file", default=str(Path(project_root) / CSV_FILE), help="Permits CSV to build pages from")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum time spent per measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.file, args.min_seconds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'page size':>9}  {'validated pages/s':>17}  {'trusted pages/s':>15}  {'speedup':>7}")
+    for result in results:
+        print(
+            f"{result['page_size']:>9}  {result['validated']['pages_per_sec']:>17,.0f}  "
+            f"{result['trusted']['pages_per_sec']:>15,.0f}  {result['speedup']:>6.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
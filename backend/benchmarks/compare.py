@@ -0,0 +1,66 @@
+"""Compare two benchmarks/run.py result files and flag regressions.
+
+    python benchmarks/compare.py base.json head.json [--threshold 0.1]
+
+Exits with status 1 when any metric got worse by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+# (metric name, value, True when higher is better)
+Metric = Tuple[str, float, bool]
+
+def iter_metrics(results: Dict[str, Any]) -> Iterator[Metric]:
+    for scenario, stats in results.get("get_food_trucks", {}).items():
+        if scenario == "meta":
+            continue
+        yield f"get_food_trucks.{scenario}.p50_ms", stats["p50_ms"], False
+        yield f"get_food_trucks.{scenario}.p99_ms", stats["p99_ms"], False
+        yield f"get_food_trucks.{scenario}.requests_per_sec", stats["requests_per_sec"], True
+    if "ingest" in results:
+        yield "ingest.rows_per_sec", results["ingest"]["rows_per_sec"], True
+    for result in results.get("serialization", []):
+        yield f"serialization.{result['page_size']}.trusted_pages_per_sec", result["trusted"]["pages_per_sec"], True
+    for result in results.get("encoding", []):
+        name = f"encoding.{result['dataset']}.{result['body']}.{result['format']}.{result['encoding']}"
+        yield f"{name}.bytes", result["bytes"], False
+        yield f"{name}.cpu_us", result["encode_us"] + result["compress_us"], False
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float):
+    """Yield (name, base value, head value, relative change, regressed) for metrics present in both."""
+    head_metrics = {name: value for name, value, _ in iter_metrics(head)}
+    for name, before, higher_is_better in iter_metrics(base):
+        if name not in head_metrics or not before:
+            continue
+        after = head_metrics[name]
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        yield name, before, after, change, worse > threshold
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").strip().split("\n")[0])
+    parser.add_argument("base", help="Results of the reference commit")
+    parser.add_argument("head", help="Results of the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as file:
+        base = json.load(file)
+    with open(args.head) as file:
+        head = json.load(file)
+    if base["meta"]["rows"] != head["meta"]["rows"] or base["meta"]["backend"] != head["meta"]["backend"]:
+        print("warning: runs used different dataset sizes or backends", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'metric':<55}  {'base':>12}  {'head':>12}  {'change':>8}")
+    for name, before, after, change, regressed in compare(base, head, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<55}  {before:>12,.3f}  {after:>12,.3f}  {change:>+7.1%}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
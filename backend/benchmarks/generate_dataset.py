@@ -0,0 +1,68 @@
+"""Scale Mobile_Food_Facility_Permit.csv up to a synthetic permits dump of any size.
+
+Rows are sampled from the bundled file and made unique: each gets a new locationid
+and permit, a numbered applicant variant and coordinates jittered by up to ~500m,
+so search, status, geo and pagination queries see a realistic value distribution.
+
+    python benchmarks/generate_dataset.py --rows 100000 --output /tmp/permits_100k.csv
+"""
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+import argparse
+import csv
+import random
+from typing import Dict, Iterator, List
+from scripts.init_db import CSV_FILE
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+JITTER_DEGREES = 0.005
+FIRST_LOCATIONID = 10_000_000
+
+def read_source(path: str) -> List[Dict[str, str]]:
+    with open(path, "r", newline="") as file:
+        return list(csv.DictReader(file))
+
+def scale_rows(source: List[Dict[str, str]], rows: int, seed: int = 42) -> Iterator[Dict[str, str]]:
+    """Yield `rows` synthetic rows derived from `source`; deterministic for a given seed."""
+    rng = random.Random(seed)
+    for n in range(rows):
+        row = dict(rng.choice(source))
+        row["locationid"] = str(FIRST_LOCATIONID + n)
+        row["permit"] = f"{row['permit'] or 'SYN'}-{n}"
+        if n >= len(source):
+            row["Applicant"] = f"{row['Applicant']} {n // len(source)}"
+        for key in ("Latitude", "Longitude"):
+            if row.get(key) and float(row[key]) != 0:
+                row[key] = repr(float(row[key]) + rng.uniform(-JITTER_DEGREES, JITTER_DEGREES))
+        yield row
+
+def generate(source_path: str, output_path: str, rows: int, seed: int = 42) -> int:
+    source = read_source(source_path)
+    with open(output_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(source[0]))
+        writer.writeheader()
+        written = 0
+        for row in scale_rows(source, rows, seed):
+            writer.writerow(row)
+            written += 1
+    return written
+
+def parse_rows(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").strip().split("\n")[0])
+    parser.add_argument("--source", default=str(Path(project_root) / CSV_FILE), help="CSV to sample rows from")
+    parser.add_argument("--rows", type=parse_rows, default=SIZES["10k"], help="Row count, or one of 10k/100k/1m")
+    parser.add_argument("--output", required=True, help="Where to write the generated CSV")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    written = generate(args.source, args.output, args.rows, args.seed)
+    print(f"Wrote {written} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
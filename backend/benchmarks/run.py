@@ -0,0 +1,209 @@
+"""Offline benchmark suite for the food trucks backend.
+
+Generates (or reuses) a scaled permits CSV, loads it into the in-memory engine or,
+with --mongodb-url, into a scratch database on a local MongoDB, then measures:
+
+- FoodTruckService.get_food_trucks latency (p50/p99) and throughput for a first page,
+  text search, status filter, the deepest skip page and the deepest cursor page
+- ingest throughput (rows/sec) of the init_db.py pipeline
+- response serialization cost (see bench_serialization.py)
+- bytes on the wire and encode CPU per response format and compression (see bench_encoding.py)
+
+Results are printed (or written with --output) as JSON so runs on different commits
+can be compared with compare.py.
+
+    python benchmarks/run.py --rows 100k --output results.json
+    python benchmarks/run.py --rows 10k --mongodb-url mongodb://localhost:27017
+"""
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+SEARCH_QUERIES = ("taco", "coffee", "hot dog", "market st", "burrito", "geez")
+BENCH_DATABASE = "foodtruck_bench"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").strip().split("\n")[0])
+    parser.add_argument("--rows", default="10k", help="Synthetic dataset size: a row count or 10k/100k/1m")
+    parser.add_argument("--dataset", help="Use this CSV instead of generating one")
+    parser.add_argument("--mongodb-url", help="Benchmark the MongoDB path against this server instead of the in-memory engine")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per get_food_trucks scenario")
+    parser.add_argument("--workers", type=int, default=None, help="Ingest parser processes")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum time per serialization measurement")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace):
+    """Point the app settings at the benchmark database before any app module is imported."""
+    os.environ["MONGODB_URL"] = args.mongodb_url or "mongodb://localhost:27017"
+    os.environ["DATABASE_NAME"] = BENCH_DATABASE
+    os.environ["COLLECTION_NAME"] = "foodtrucks"
+    # Measure query cost, not cache hits.
+    os.environ["COUNT_CACHE_SIZE"] = "0"
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=project_root, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "iterations": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "requests_per_sec": len(latencies) / elapsed
+    }
+
+async def measure(call: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    await call(0)  # warm up
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        await call(i)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+async def bench_get_food_trucks(service, iterations: int) -> Dict[str, Dict[str, float]]:
+    from app.services.pagination import PAGE_SIZE, encode_cursor
+
+    _, total = await service.get_food_trucks(query=None, status=None, page=1)
+    last_page = max(1, -(-total // PAGE_SIZE))
+    last_page_trucks, _ = await service.get_food_trucks(query=None, status=None, page=last_page)
+    # Walking every keyset page to reach the end would dominate setup on big datasets; seek
+    # just before the smallest locationid on the last skip page instead.
+    deep_cursor = encode_cursor(min(truck.locationid for truck in last_page_trucks) - 1)
+
+    scenarios = {
+        "first_page": lambda i: service.get_food_trucks(query=None, status=None, page=1),
+        "search": lambda i: service.get_food_trucks(query=SEARCH_QUERIES[i % len(SEARCH_QUERIES)], status=None, page=1),
+        "status": lambda i: service.get_food_trucks(query=None, status="APPROVED", page=1),
+        "deep_page": lambda i: service.get_food_trucks(query=None, status=None, page=last_page),
+        "deep_cursor": lambda i: service.get_food_trucks(query=None, status=None, page=1, cursor=deep_cursor, limit=PAGE_SIZE),
+    }
+    results = {}
+    for name, call in scenarios.items():
+        results[name] = await measure(call, iterations)
+    results["meta"] = {"total": total, "last_page": last_page}
+    return results
+
+async def load_memory(path: str, workers) -> Dict[str, Any]:
+    from scripts.init_db import CHUNK_SIZE, ingest
+    from app.database.mongodb import mongodb
+    from app.services.food_truck_engine import food_truck_engine
+
+    docs = []
+
+    async def collect(foodtrucks, stats):
+        docs.extend(foodtrucks)
+        stats.inserted += len(foodtrucks)
+
+    stats = await ingest(path, CHUNK_SIZE, workers, collect)
+    elapsed = time.perf_counter() - stats.started_at
+    load_started = time.perf_counter()
+    food_truck_engine.load_documents(docs, version=0)
+    # The client connects lazily; with the engine loaded the service never uses it.
+    await mongodb.connect_to_database()
+    return {
+        "mode": "parse_only",
+        "rows": stats.rows,
+        "rows_per_sec": stats.rows / elapsed,
+        "rejected": sum(stats.rejected.values()),
+        "engine_load_sec": time.perf_counter() - load_started
+    }
+
+async def load_mongodb(path: str, workers) -> Dict[str, Any]:
+    from scripts.init_db import CHUNK_SIZE, rebuild_food_trucks
+    from app.database.mongodb import mongodb
+    from app.database.dataset_version import bump_dataset_version
+    from app.config.settings import get_settings
+
+    await mongodb.connect_to_database()
+    collection = mongodb.get_collection(get_settings().collection_name)
+    stats = await rebuild_food_trucks(collection, path, CHUNK_SIZE, workers)
+    elapsed = time.perf_counter() - stats.started_at
+    await bump_dataset_version(mongodb.db)
+    return {
+        "mode": "rebuild",
+        "rows": stats.rows,
+        "rows_per_sec": stats.rows / elapsed,
+        "rejected": sum(stats.rejected.values())
+    }
+
+async def run(args: argparse.Namespace, dataset: str) -> Dict[str, Any]:
+    from app.database.mongodb import mongodb
+    from app.services.food_truck_service import FoodTruckService
+
+    try:
+        if args.mongodb_url:
+            ingest_results = await load_mongodb(dataset, args.workers)
+        else:
+            ingest_results = await load_memory(dataset, args.workers)
+        service_results = await bench_get_food_trucks(FoodTruckService(), args.iterations)
+    finally:
+        if args.mongodb_url:
+            await mongodb.client.drop_database(BENCH_DATABASE)
+        await mongodb.close_database_connection()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": "mongodb" if args.mongodb_url else "memory",
+            "dataset": dataset,
+            "rows": ingest_results["rows"]
+        },
+        "get_food_trucks": service_results,
+        "ingest": ingest_results
+    }
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    import bench_encoding
+    import bench_serialization
+    from generate_dataset import generate, parse_rows
+    from scripts.init_db import CSV_FILE
+
+    source = str(Path(project_root) / CSV_FILE)
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = args.dataset
+        if not dataset:
+            dataset = os.path.join(tmp, "permits.csv")
+            generate(source, dataset, parse_rows(args.rows))
+        results = asyncio.run(run(args, dataset))
+        results["encoding"] = bench_encoding.run(source, args.min_seconds) + bench_encoding.run(dataset, args.min_seconds, label=str(args.rows))
+    # Page rendering cost doesn't depend on the dataset size, so it's measured on the bundled file.
+    results["serialization"] = bench_serialization.run(source, args.min_seconds)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Wrote results to {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -4,77 +4,356 @@ from pathlib import Path
 project_root = str(Path(__file__).parent.parent)
 sys.path.insert(0, project_root)
 
+import argparse
 import asyncio
 import csv
+import hashlib
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError
 from app.config.settings import get_settings
+from app.database.indexes import ensure_indexes
+from app.models.food_truck import FOOD_TRUCK_PROJECTION, FoodTruckStatus, normalize_status
+from app.database.dataset_version import bump_dataset_version
+from app.database.cluster_tables import rebuild_cluster_tables
+from app.database.facet_summary import rebuild_facet_summary
+from app.services.food_truck_engine import save_snapshot
+from app.services.schedule import ScheduleError, schedule_bitmap
+from app.services.search_index import food_tokens, search_grams
 
 settings = get_settings()
 
-async def init_database():
+CSV_FILE = "Mobile_Food_Facility_Permit.csv"
+CHUNK_SIZE = 5000
+DELETE_BATCH_SIZE = 1000
+MODES = ("sync", "rebuild")
+EXPIRATION_DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+DUPLICATE_KEY_ERROR = 11000
+KNOWN_STATUSES = {status.value for status in FoodTruckStatus}
+
+class RowError(ValueError):
+    """A CSV row that can't be turned into a food truck document."""
+
+@dataclass
+class IngestStats:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    unparsed_schedules: Counter = field(default_factory=Counter)
+    unknown_statuses: Counter = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def reject(self, reason: str, count: int = 1):
+        self.rejected[reason] += count
+
+    def count_schedules(self, foodtrucks: List[Dict[str, Any]]):
+        """Tally rows kept without an `open_hours` bitmap because days_hours didn't parse."""
+        for foodtruck in foodtrucks:
+            if foodtruck.get('days_hours') and foodtruck.get('open_hours') is None:
+                self.unparsed_schedules[foodtruck['days_hours']] += 1
+
+    def count_statuses(self, foodtrucks: List[Dict[str, Any]]):
+        """Tally rows kept with a status outside FoodTruckStatus, which no status filter offers."""
+        for foodtruck in foodtrucks:
+            if foodtruck.get('status') is not None and foodtruck['status'] not in KNOWN_STATUSES:
+                self.unknown_statuses[foodtruck['status']] += 1
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.rows / elapsed if elapsed else 0.0
+        lines = [
+            f"Read {self.rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)",
+            f"Inserted {self.inserted}, updated {self.updated}, unchanged {self.unchanged}, deleted {self.deleted} food trucks",
+            f"Rejected {sum(self.rejected.values())} rows"
+        ]
+        lines += [f"  {count:>6}  {reason}" for reason, count in self.rejected.most_common()]
+        if self.unparsed_schedules:
+            lines.append(f"Kept {sum(self.unparsed_schedules.values())} rows with an unparseable days_hours (not matched by open_at)")
+            lines += [f"  {count:>6}  {value!r}" for value, count in self.unparsed_schedules.most_common(5)]
+        if self.unknown_statuses:
+            lines.append(f"Kept {sum(self.unknown_statuses.values())} rows with an unknown status")
+            lines += [f"  {count:>6}  {value!r}" for value, count in self.unknown_statuses.most_common()]
+        return "\n".join(lines)
+
+@lru_cache(maxsize=4096)
+def parse_expiration_date(value: str) -> datetime:
+    # Permit dumps repeat a handful of expiration dates, so the strptime cost is paid once per value.
+    return datetime.strptime(value, EXPIRATION_DATE_FORMAT)
+
+def _number(row: Dict[str, Any], key: str, kind):
+    value = row.get(key)
+    if not value:
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        raise RowError(f"invalid {key}")
+
+def row_hash(foodtruck: Dict[str, Any]) -> str:
+    """Content hash of a parsed document, used by sync mode to skip unchanged rows."""
+    canonical = json.dumps(foodtruck, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+def parse_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn one CSV row into a food truck document, raising RowError with a short reason."""
+    row = {key: (value if value != '' else None) for key, value in row.items()}
+    locationid = _number(row, 'locationid', int)
+    if locationid is None:
+        raise RowError("missing locationid")
+    latitude = _number(row, 'Latitude', float)
+    longitude = _number(row, 'Longitude', float)
+    expiration_date = None
+    if row.get('ExpirationDate'):
+        try:
+            expiration_date = parse_expiration_date(row['ExpirationDate'])
+        except ValueError:
+            raise RowError("invalid ExpirationDate")
+
+    try:
+        open_hours = schedule_bitmap(row.get('dayshours'))
+    except ScheduleError:
+        open_hours = None
+
+    food_items = []
+    if row.get('FoodItems'):
+        food_items = [
+            item.strip()
+            for item in row['FoodItems'].split(':')
+            if item.strip()
+        ]
+
+    foodtruck = {
+        'locationid': locationid,
+        'applicant': row.get('Applicant'),
+        'facility_type': row.get('FacilityType') or 'Not Assigned',
+        'location_description': row.get('LocationDescription'),
+        'address': row.get('Address'),
+        'food_items': food_items,
+        'latitude': latitude,
+        'longitude': longitude,
+        'schedule': row.get('Schedule'),
+        'status': normalize_status(row.get('Status')),
+        'permit': row.get('permit'),
+        'days_hours': row.get('dayshours'),
+        'expiration_date': expiration_date,
+        'search_grams': search_grams(row.get('Applicant'), row.get('Address')),
+        'food_tokens': food_tokens(food_items),
+        'open_hours': open_hours
+    }
+    if latitude is not None and longitude is not None:
+        foodtruck['location'] = {
+            'type': 'Point',
+            'coordinates': [longitude, latitude]
+        }
+    foodtruck['row_hash'] = row_hash(foodtruck)
+    return foodtruck
+
+def parse_chunk(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Counter]:
+    """Parse a chunk of rows in a worker process; returns the documents and rejection reasons."""
+    foodtrucks = []
+    rejected = Counter()
+    for row in rows:
+        try:
+            foodtrucks.append(parse_row(row))
+        except RowError as e:
+            rejected[str(e)] += 1
+        except Exception as e:
+            rejected[f"{type(e).__name__}: {e}"] += 1
+    return foodtrucks, rejected
+
+def iter_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Stream the CSV file as lists of at most chunk_size rows."""
+    with open(path, 'r', newline='') as file:
+        csv_reader = csv.DictReader(file)
+        while True:
+            chunk = list(islice(csv_reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+async def insert_chunk(collection: AsyncIOMotorCollection, foodtrucks: List[Dict[str, Any]], stats: IngestStats):
+    """Unordered bulk insert: one bad document doesn't stop the rest of the chunk."""
+    if not foodtrucks:
+        return
+    try:
+        result = await collection.insert_many(foodtrucks, ordered=False)
+        stats.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        stats.inserted += e.details.get("nInserted", 0)
+        reject_write_errors(e, stats)
+
+def reject_write_errors(error: BulkWriteError, stats: IngestStats):
+    """Count the documents MongoDB refused (duplicate keys, invalid coordinates...) as rejected rows."""
+    for write_error in error.details.get("writeErrors", []):
+        code = write_error.get("code")
+        stats.reject("duplicate locationid" if code == DUPLICATE_KEY_ERROR else write_error.get("errmsg", "write error"))
+
+async def ingest(
+    path: str,
+    chunk_size: int,
+    workers: Optional[int],
+    write: Callable[[List[Dict[str, Any]], IngestStats], Awaitable[None]]
+) -> IngestStats:
+    """Parse the CSV in chunks on a process pool and write each chunk while later ones parse."""
+    stats = IngestStats()
+    loop = asyncio.get_running_loop()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        async def write_oldest():
+            foodtrucks, rejected = await pending.popleft()
+            stats.rejected.update(rejected)
+            stats.count_schedules(foodtrucks)
+            stats.count_statuses(foodtrucks)
+            await write(foodtrucks, stats)
+
+        for chunk in iter_chunks(path, chunk_size):
+            stats.rows += len(chunk)
+            pending.append(loop.run_in_executor(executor, parse_chunk, chunk))
+            # Keep every worker busy plus one parsed chunk ready, without reading the whole file ahead.
+            if len(pending) > workers:
+                await write_oldest()
+        while pending:
+            await write_oldest()
+    return stats
+
+async def load_food_trucks(
+    collection: AsyncIOMotorCollection,
+    path: str = CSV_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None
+) -> IngestStats:
+    """Insert every row of the CSV into an empty collection."""
+    async def write(foodtrucks: List[Dict[str, Any]], stats: IngestStats):
+        await insert_chunk(collection, foodtrucks, stats)
+
+    return await ingest(path, chunk_size, workers, write)
+
+async def read_row_hashes(collection: AsyncIOMotorCollection) -> Dict[int, str]:
+    cursor = collection.find({}, {"_id": 0, "locationid": 1, "row_hash": 1})
+    return {doc["locationid"]: doc.get("row_hash") async for doc in cursor}
+
+async def sync_food_trucks(
+    collection: AsyncIOMotorCollection,
+    path: str = CSV_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None
+) -> IngestStats:
+    """Apply only the differences between the CSV and the live collection.
+
+    Rows whose hash matches the stored one are skipped, changed and new rows are
+    upserted by locationid, and stored rows missing from the CSV are deleted.
+    Readers keep seeing a complete dataset throughout.
+    """
+    stored = await read_row_hashes(collection)
+    seen: Set[int] = set()
+
+    async def write(foodtrucks: List[Dict[str, Any]], stats: IngestStats):
+        operations = []
+        for foodtruck in foodtrucks:
+            locationid = foodtruck['locationid']
+            seen.add(locationid)
+            if stored.get(locationid) == foodtruck['row_hash']:
+                stats.unchanged += 1
+                continue
+            stored[locationid] = foodtruck['row_hash']
+            operations.append(ReplaceOne({'locationid': locationid}, foodtruck, upsert=True))
+        if not operations:
+            return
+        # Unordered, so a document the server refuses is rejected without stopping the sync.
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            stats.inserted += result.upserted_count
+            stats.updated += result.matched_count
+        except BulkWriteError as e:
+            stats.inserted += e.details.get("nUpserted", 0)
+            stats.updated += e.details.get("nMatched", 0)
+            reject_write_errors(e, stats)
+
+    stats = await ingest(path, chunk_size, workers, write)
+    removed = [locationid for locationid in stored if locationid not in seen]
+    for start in range(0, len(removed), DELETE_BATCH_SIZE):
+        batch = removed[start:start + DELETE_BATCH_SIZE]
+        await collection.bulk_write([DeleteMany({'locationid': {'$in': batch}})], ordered=False)
+    stats.deleted = len(removed)
+    return stats
+
+async def rebuild_food_trucks(
+    collection: AsyncIOMotorCollection,
+    path: str = CSV_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None
+) -> IngestStats:
+    """Load everything into a staging collection, then rename it over the live one in one step."""
+    staging = collection.database[f"{collection.name}_staging"]
+    await staging.drop()
+    await ensure_indexes(staging)
+    stats = await load_food_trucks(staging, path, chunk_size, workers)
+    await staging.rename(collection.name, dropTarget=True)
+    return stats
+
+async def init_database(
+    path: str = CSV_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None,
+    mode: str = "sync"
+):
     client = AsyncIOMotorClient(settings.mongodb_url)
     db = client[settings.database_name]
     collection = db[settings.collection_name]
-    
+
     try:
-        await collection.drop()
-        
-        foodtrucks = []
-        with open("Mobile_Food_Facility_Permit.csv", 'r') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                try:
-                    for key in row:
-                        if row[key] == '':
-                            row[key] = None
-                    
-                    if row['locationid']:
-                        row['locationid'] = int(row['locationid'])
-                    if row['Latitude']:
-                        row['latitude'] = float(row['Latitude'])
-                    if row['Longitude']:
-                        row['longitude'] = float(row['Longitude'])
-                    if row['ExpirationDate']:
-                        row['expiration_date'] = datetime.strptime(row['ExpirationDate'], '%m/%d/%Y %I:%M:%S %p')
-                    
-                    food_items = []
-                    if row['FoodItems']:
-                        food_items = [
-                            item.strip() 
-                            for item in row['FoodItems'].split(':') 
-                            if item.strip()
-                        ]
-                    
-                    foodtruck = {
-                        'locationid': row['locationid'],
-                        'applicant': row['Applicant'],
-                        'facility_type': row['FacilityType'] or 'Not Assigned',
-                        'location_description': row['LocationDescription'],
-                        'address': row['Address'],
-                        'food_items': food_items,
-                        'latitude': row.get('latitude'),
-                        'longitude': row.get('longitude'),
-                        'schedule': row['Schedule'],
-                        'status': row['Status'],
-                        'permit': row['permit'],
-                        'days_hours': row['dayshours'],
-                        'expiration_date': row.get('expiration_date')
-                    }
-                    foodtrucks.append(foodtruck)
-                except Exception as e:
-                    print(f"Error processing row: {row}. Error: {str(e)}")
-                    continue
-            
-            if foodtrucks:
-                await collection.insert_many(foodtrucks)
-                print(f"Successfully inserted {len(foodtrucks)} food trucks into the database")
-                
+        if mode == "rebuild":
+            stats = await rebuild_food_trucks(collection, path, chunk_size, workers)
+        else:
+            await ensure_indexes(collection)
+            stats = await sync_food_trucks(collection, path, chunk_size, workers)
+        print(stats.summary())
+
+        version = await bump_dataset_version(db)
+        print(f"Dataset version is now {version}")
+        facets = await rebuild_facet_summary(db, version)
+        print(f"Rebuilt facet summary over {facets['total']} food trucks")
+        cells = await rebuild_cluster_tables(db, version)
+        print(f"Rebuilt map cluster tables ({cells} cells)")
+        if settings.snapshot_dir:
+            docs = await collection.find({}, FOOD_TRUCK_PROJECTION).to_list(length=None)
+            save_snapshot(docs, version)
+            print(f"Wrote a snapshot of {len(docs)} food trucks to {settings.snapshot_dir}")
+
     except Exception as e:
         print(f"Error initializing database: {str(e)}")
         raise
     finally:
         client.close()
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load the food truck permits CSV into MongoDB")
+    parser.add_argument("--file", default=CSV_FILE, help="CSV file to load")
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="sync",
+        help="sync applies only changed rows; rebuild loads a staging collection and swaps it in"
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows parsed and inserted per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (defaults to the CPU count)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    asyncio.run(init_database()) 
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(init_database(args.file, args.chunk_size, args.workers, args.mode))
@@ -0,0 +1,41 @@
+from unittest.mock import patch
+from app.services.cache import LRUCache
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL"""
+    cache = LRUCache(maxsize=10, ttl=5)
+    with patch("app.services.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.services.cache.time.monotonic", return_value=104.0):
+        assert cache.get("a") == 1
+    with patch("app.services.cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_hit_ratio():
+    """Test that hits and misses are counted"""
+    cache = LRUCache(maxsize=10)
+    assert cache.hit_ratio == 0.0
+    cache.set("a", 0)
+    assert cache.get("a") == 0
+    assert cache.get("b", "default") == "default"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_ratio == 0.5
+
+def test_disabled_cache():
+    """Test that a zero-sized cache stores nothing"""
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from app.database import cluster_tables
+from app.database.cluster_tables import read_clusters, rebuild_cluster_tables
+from app.services.clusters import MAX_CLUSTER_ZOOM, ClusterTable, cell_range, parse_bbox
+from app.services.food_truck_engine import FoodTruckEngine
+
+MISSION = (37.7599, -122.4148)
+MARKET = (37.7936, -122.3958)
+SF = (-122.52, 37.70, -122.35, 37.82)
+
+def test_parse_bbox():
+    """Test bbox parsing and validation"""
+    assert parse_bbox("-122.5,37.7,-122.3,37.8") == (-122.5, 37.7, -122.3, 37.8)
+    for bbox in ("-122.5,37.7,-122.3", "a,b,c,d", "-122.3,37.7,-122.5,37.8", "-190,0,0,0", "nan,0,0,0"):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_bbox(bbox)
+        assert exc_info.value.status_code == 400
+
+def test_cell_range_grows_with_zoom():
+    """Test that a box spans one cell when zoomed out and many when zoomed in"""
+    x0, y0, x1, y1 = cell_range(SF, 0)
+    assert (x0, y0) == (x1, y1)
+    x0, y0, x1, y1 = cell_range(SF, 12)
+    assert x1 > x0 and y1 > y0
+
+def test_cluster_table():
+    """Test counts, centroids and status breakdowns per zoom"""
+    table = ClusterTable()
+    table.add(*MISSION, "APPROVED")
+    table.add(MISSION[0] + 0.0001, MISSION[1], "EXPIRED")
+    table.add(*MARKET, "APPROVED")
+    table.add(None, None, "APPROVED")
+    table.add(float("nan"), 0.0, "APPROVED")
+
+    [cluster] = table.query(SF, 5)
+    assert cluster["count"] == 3
+    assert cluster["status"] == {"APPROVED": 2, "EXPIRED": 1}
+    assert cluster["latitude"] == pytest.approx((2 * MISSION[0] + 0.0001 + MARKET[0]) / 3)
+
+    clusters = table.query(SF, 14)
+    assert sorted(cluster["count"] for cluster in clusters) == [1, 2]
+    assert table.query(SF, 20) == table.query(SF, MAX_CLUSTER_ZOOM)
+    assert table.query((0.0, 0.0, 1.0, 1.0), 14) == []
+    documents = list(table.documents(version=7))
+    assert {document["zoom"] for document in documents} == set(range(MAX_CLUSTER_ZOOM + 1))
+    assert all(document["version"] == 7 for document in documents)
+
+def test_engine_viewport():
+    """Test that the engine switches from trucks to clusters above the truck limit"""
+    engine = FoodTruckEngine()
+    engine.load_documents([
+        {"locationid": 1, "applicant": "A", "latitude": MISSION[0], "longitude": MISSION[1], "status": "APPROVED"},
+        {"locationid": 2, "applicant": "B", "latitude": MARKET[0], "longitude": MARKET[1], "status": "REQUESTED"},
+        {"locationid": 3, "applicant": "C", "latitude": None, "longitude": None, "status": "APPROVED"},
+    ], version=1)
+
+    viewport = engine.viewport(SF, 12, max_trucks=10)
+    assert [truck["locationid"] for truck in viewport["food_trucks"]] == [1, 2]
+    assert viewport["clusters"] == [] and viewport["total"] == 2
+
+    viewport = engine.viewport((-122.42, 37.75, -122.41, 37.77), 12, max_trucks=10)
+    assert [truck["locationid"] for truck in viewport["food_trucks"]] == [1]
+
+    viewport = engine.viewport(SF, 5, max_trucks=1)
+    assert viewport["food_trucks"] == []
+    assert viewport["clusters"][0]["status"] == {"APPROVED": 1, "REQUESTED": 1}
+    assert viewport["total"] == 2
+
+@pytest.mark.asyncio
+async def test_read_clusters_checks_version():
+    """Test that clusters are only read from a table built for the current dataset version"""
+    metadata, clusters = MagicMock(), MagicMock()
+    metadata.find_one = AsyncMock(return_value={"_id": "foodtrucks.clusters", "version": 3})
+    cursor = clusters.find.return_value.sort.return_value
+    cursor.to_list = AsyncMock(return_value=[{"latitude": 1.0, "longitude": 2.0, "count": 4, "status": {"APPROVED": 4}}])
+    db = MagicMock()
+    db.__getitem__.side_effect = lambda name: metadata if name == "metadata" else clusters
+
+    with patch("app.database.cluster_tables.settings") as mock_settings, patch.object(cluster_tables, "_built_versions", set()):
+        mock_settings.metadata_collection_name = "metadata"
+        mock_settings.collection_name = "foodtrucks"
+        assert await read_clusters(db, 4, SF, 12) is None
+        stored = await read_clusters(db, 3, SF, 12)
+        assert stored is not None and stored[0]["count"] == 4
+        await read_clusters(db, 3, SF, 12)
+
+    assert metadata.find_one.await_count == 2
+    query = clusters.find.call_args.args[0]
+    assert query["version"] == 3 and query["zoom"] == 12
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_the_previous_version():
+    """Test that a rebuild only drops tables older than the version it replaces"""
+    metadata, clusters, foodtrucks = MagicMock(), MagicMock(), MagicMock()
+    metadata.find_one = AsyncMock(return_value={"_id": "foodtrucks.clusters", "version": 3})
+    metadata.replace_one = AsyncMock()
+    clusters.index_information = AsyncMock(return_value={})
+    clusters.create_indexes = AsyncMock()
+    clusters.insert_many = AsyncMock()
+    clusters.delete_many = AsyncMock()
+    foodtrucks.find.return_value.__aiter__.return_value = [{"latitude": 37.76, "longitude": -122.42, "status": "APPROVED"}]
+    collections = {"metadata": metadata, "clusters": clusters, "foodtrucks": foodtrucks}
+    db = MagicMock()
+    db.__getitem__.side_effect = collections.__getitem__
+
+    with patch("app.database.cluster_tables.settings") as mock_settings:
+        mock_settings.metadata_collection_name = "metadata"
+        mock_settings.clusters_collection_name = "clusters"
+        mock_settings.collection_name = "foodtrucks"
+        assert await rebuild_cluster_tables(db, 4) > 0
+
+    assert metadata.replace_one.call_args.args[1]["version"] == 4
+    assert clusters.delete_many.call_args.args[0] == {"version": {"$nin": [3, 4]}}
@@ -0,0 +1,98 @@
+import asyncio
+import zlib
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.services.compression import STREAM_FLUSH_SIZE, CompressionMiddleware, compress, negotiate_encoding
+
+BODY = b'{"applicant":"Senor Sisig"}' * 100
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+@app.get("/large")
+async def large():
+    return Response(BODY, media_type="application/json")
+
+@app.get("/small")
+async def small():
+    return Response(b"{}", media_type="application/json")
+
+@app.get("/stream")
+async def stream():
+    async def chunks():
+        for _ in range(10):
+            yield BODY
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+@app.get("/encoded")
+async def encoded():
+    return Response(compress(BODY, "gzip"), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+client = TestClient(app)
+
+def test_negotiate_encoding():
+    """Test Accept-Encoding parsing and quality values"""
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("*") in ("br", "gzip")
+    assert negotiate_encoding("identity") is None
+
+def test_compresses_bodies_over_threshold():
+    """Test that only large bodies are compressed, with a matching Content-Length"""
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BODY
+    assert int(response.headers["content-length"]) < len(BODY)
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"{}"
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+def test_compresses_streams():
+    """Test that streamed responses are compressed chunk by chunk"""
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == BODY * 10
+
+def test_flushes_streams_as_they_go():
+    """Test that a compressed stream can be decoded before it ends, not only after finish"""
+    row = b'{"applicant":"Senor Sisig","address":"1 Market St"}\n'
+    sent = []
+
+    async def stream_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for _ in range(2000):
+            await send({"type": "http.response.body", "body": row, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(stream_app, minimum_size=1024)(scope, None, send))
+
+    chunks = [message["body"] for message in sent if message["type"] == "http.response.body"]
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(chunks[0]) == row
+    streamed = decoder.decompress(b"".join(chunks[1:-1]))
+    assert len(row) * 1999 - len(streamed) < STREAM_FLUSH_SIZE
+    assert row + streamed + decoder.decompress(chunks[-1]) == row * 2000
+
+def test_leaves_encoded_responses_alone():
+    """Test that pre-compressed bodies aren't compressed twice"""
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BODY
+
+def test_brotli():
+    """Test that brotli is preferred when the client accepts it"""
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.content == BODY
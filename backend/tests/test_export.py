@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+from app.services.export import EXPORT_FIELDS, encode_csv, encode_ndjson
+
+TRUCKS = [
+    {
+        "locationid": 1571753,
+        "applicant": "The Geez Freeze",
+        "facility_type": "Truck",
+        "address": "3750 18TH ST",
+        "food_items": ["Snow Cones", "Soft Serve Ice Cream"],
+        "latitude": 37.7620,
+        "longitude": -122.4273,
+        "status": "APPROVED",
+        "permit": "21MFF-00015",
+        "expiration_date": datetime(2024, 12, 31)
+    },
+    {
+        "locationid": 1569152,
+        "applicant": "Anzu, \"To You\"",
+        "facility_type": "Truck",
+        "address": None,
+        "food_items": [],
+        "latitude": 37.8058,
+        "longitude": -122.4159,
+        "status": "REQUESTED",
+        "permit": "21MFF-00106"
+    }
+]
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+@pytest.mark.asyncio
+async def test_encode_ndjson():
+    """Test that every document becomes one JSON line"""
+    chunks = await collect(encode_ndjson(iterate(TRUCKS)))
+    assert len(chunks) == 2
+    first = json.loads(chunks[0])
+    assert first["expiration_date"] == "2024-12-31T00:00:00"
+    assert first["location_description"] is None
+    assert list(first) == list(EXPORT_FIELDS)
+
+@pytest.mark.asyncio
+async def test_encode_csv():
+    """Test that the CSV has a header, quoting and joined food items"""
+    chunks = await collect(encode_csv(iterate(TRUCKS)))
+    assert len(chunks) == 3  # header, then one chunk per document
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0]["food_items"] == "Snow Cones: Soft Serve Ice Cream"
+    assert rows[1]["applicant"] == "Anzu, \"To You\""
+    assert rows[1]["address"] == ""
@@ -0,0 +1,53 @@
+import pytest
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock
+from app.database.facet_summary import facet_pipeline, parse_facet_result, read_facet_summary, top_counts
+
+def test_top_counts():
+    """Test that facet values are ordered by count, then value, with None last"""
+    counts = Counter({"Truck": 3, "Push Cart": 3, None: 3, "Not Assigned": 1})
+    assert top_counts(counts) == [
+        {"value": "Push Cart", "count": 3},
+        {"value": "Truck", "count": 3},
+        {"value": None, "count": 3},
+        {"value": "Not Assigned", "count": 1}
+    ]
+    assert len(top_counts(counts, 2)) == 2
+
+def test_facet_pipeline():
+    """Test that filters become a $match ahead of a single $facet stage"""
+    pipeline = facet_pipeline({"status": "APPROVED"}, 5)
+    assert pipeline[0] == {"$match": {"status": "APPROVED"}}
+    facets = pipeline[1]["$facet"]
+    assert set(facets) == {"status", "facility_type", "food_items", "total"}
+    assert facets["food_items"][0] == {"$unwind": "$food_items"}
+    assert facets["food_items"][-1] == {"$limit": 5}
+    assert len(facet_pipeline({}, 5)) == 1
+
+def test_parse_facet_result():
+    """Test that $facet output is reshaped into value/count lists"""
+    facets = parse_facet_result({
+        "status": [{"_id": "APPROVED", "count": 2}],
+        "facility_type": [{"_id": "Truck", "count": 2}],
+        "food_items": [{"_id": "Tacos", "count": 1}],
+        "total": [{"count": 2}]
+    })
+    assert facets == {
+        "status": [{"value": "APPROVED", "count": 2}],
+        "facility_type": [{"value": "Truck", "count": 2}],
+        "food_items": [{"value": "Tacos", "count": 1}],
+        "total": 2
+    }
+    assert parse_facet_result({})["total"] == 0
+
+@pytest.mark.asyncio
+async def test_read_facet_summary_checks_version():
+    """Test that a summary built for another dataset version is ignored"""
+    stored = {"_id": "foodtrucks", "version": 3, "status": [], "facility_type": [], "food_items": [], "total": 0}
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=stored)
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+
+    assert await read_facet_summary(db, 3) == {"status": [], "facility_type": [], "food_items": [], "total": 0}
+    assert await read_facet_summary(db, 4) is None
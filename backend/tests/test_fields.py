@@ -0,0 +1,22 @@
+import pytest
+from fastapi import HTTPException
+from app.models.food_truck import FOOD_TRUCK_PROJECTION
+from app.services.fields import parse_fields, projection_for
+
+def test_parse_fields():
+    """Test that fields come back in model order and always include locationid"""
+    assert parse_fields(None) is None
+    assert parse_fields("") is None
+    assert parse_fields(" status, applicant ,status") == ("locationid", "applicant", "status")
+
+def test_parse_fields_rejects_unknown():
+    """Test that unknown fields are a client error"""
+    with pytest.raises(HTTPException) as exc_info:
+        parse_fields("applicant,_id,search_grams")
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Unknown fields: _id, search_grams"
+
+def test_projection_for():
+    """Test the MongoDB projection for selected fields"""
+    assert projection_for(None) == FOOD_TRUCK_PROJECTION
+    assert projection_for(("locationid", "status")) == {"_id": 0, "locationid": 1, "status": 1}
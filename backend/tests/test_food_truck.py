@@ -1,6 +1,6 @@
 import pytest
 from datetime import datetime
-from app.models.food_truck import FoodTruck, FoodTruckListResponse
+from app.models.food_truck import FoodTruck, FoodTruckListResponse, FoodTruckStatus, normalize_status
 
 def test_food_truck_required_fields():
     """Test that required fields are properly validated"""
@@ -108,4 +108,11 @@ def test_food_truck_list_response():
     
     assert len(response.food_trucks) == 1
     assert response.total == 1
-    assert response.food_trucks[0].locationid == 1571753 
\ No newline at end of file
+    assert response.food_trucks[0].locationid == 1571753 
+
+
+def test_normalize_status():
+    """Test that statuses are stored upper case"""
+    assert normalize_status(" approved ") == FoodTruckStatus.APPROVED.value
+    assert normalize_status("") is None
+    assert normalize_status(None) is None
@@ -0,0 +1,228 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.food_truck_engine import FoodTruckEngine
+from app.services.food_truck_service import FoodTruckService
+from app.models.food_truck import FoodTruck
+
+def make_truck(locationid, applicant, address, status, **extra):
+    truck = {
+        "locationid": locationid,
+        "applicant": applicant,
+        "facility_type": "Truck",
+        "address": address,
+        "food_items": ["Test Food"],
+        "latitude": 37.7620,
+        "longitude": -122.4273,
+        "status": status,
+        "permit": "21MFF-00015"
+    }
+    truck.update(extra)
+    return truck
+
+@pytest.fixture
+def engine():
+    """Fixture to create an engine loaded with a small dataset."""
+    engine = FoodTruckEngine()
+    engine.load_documents([
+        make_truck(1, "The Geez Freeze", "3750 18TH ST", "APPROVED"),
+        make_truck(2, "Anzu To You", "2535 TAYLOR ST", "REQUESTED", latitude=37.8058, longitude=-122.4159),
+        make_truck(3, "Taco Express", "18TH ST & MISSION", "APPROVED", latitude=None),
+        make_truck(4, "Geez Tacos", "1 MARKET ST", "EXPIRED"),
+    ], version=1)
+    return engine
+
+def test_search_without_filters(engine):
+    """Test that an unfiltered search returns everything in load order"""
+    trucks, total = engine.search(query=None, status=None, page=1, page_size=10)
+    assert total == 4
+    assert [truck["locationid"] for truck in trucks] == [1, 2, 3, 4]
+    assert trucks[0] == FoodTruck(**make_truck(1, "The Geez Freeze", "3750 18TH ST", "APPROVED")).model_dump()
+
+def test_unfiltered_match_is_not_copied(engine):
+    """Test that listing everything doesn't materialize a list of every row id"""
+    assert engine._match(engine._columns, None, None) == range(4)
+    assert list(engine._match(engine._columns, None, "approved")) == [0, 2]
+
+def test_search_matches_applicant_or_address(engine):
+    """Test that the query is a case-insensitive substring match on applicant and address"""
+    trucks, total = engine.search(query="18th st", status=None, page=1, page_size=10)
+    assert total == 2
+    assert [truck["locationid"] for truck in trucks] == [1, 3]
+
+    trucks, total = engine.search(query="  GEEZ ", status=None, page=1, page_size=10)
+    assert total == 2
+
+def test_search_relevance_order(engine):
+    """Test that applicant prefix matches rank ahead of mid-word and address matches"""
+    trucks, _ = engine.search(query="geez", status=None, page=1, page_size=10)
+    assert [truck["locationid"] for truck in trucks] == [4, 1]
+
+    trucks, _ = engine.search(query="ta", status=None, page=1, page_size=10)
+    assert [truck["locationid"] for truck in trucks] == [3, 4, 2]
+
+def test_search_with_status(engine):
+    """Test that the status filter is case-insensitive and 'all' disables it"""
+    trucks, total = engine.search(query=None, status="approved", page=1, page_size=10)
+    assert total == 2
+    assert all(truck["status"] == "APPROVED" for truck in trucks)
+
+    _, total = engine.search(query=None, status="all", page=1, page_size=10)
+    assert total == 4
+
+    trucks, total = engine.search(query="geez", status="EXPIRED", page=1, page_size=10)
+    assert total == 1
+    assert trucks[0]["locationid"] == 4
+
+def test_search_pagination(engine):
+    """Test that pages are sliced after filtering and the total covers every match"""
+    trucks, total = engine.search(query=None, status=None, page=2, page_size=3)
+    assert total == 4
+    assert [truck["locationid"] for truck in trucks] == [4]
+
+def test_missing_coordinates_round_trip(engine):
+    """Test that missing floats survive the typed column storage"""
+    trucks, _ = engine.search(query="taco express", status=None, page=1, page_size=10)
+    assert trucks[0]["latitude"] is None
+
+def test_is_stale(engine):
+    """Test that a version bump marks the engine as stale"""
+    with patch("app.services.food_truck_engine.settings") as mock_settings:
+        mock_settings.engine_refresh_seconds = 0
+        assert not engine.is_stale(1)
+        assert engine.is_stale(2)
+
+@pytest.mark.asyncio
+async def test_service_uses_loaded_engine(engine):
+    """Test that the service answers from memory without touching MongoDB"""
+    with patch("app.services.food_truck_service.mongodb") as mock_mongodb, \
+            patch("app.services.food_truck_service.food_truck_engine", engine):
+        service = FoodTruckService()
+        trucks, total = await service.get_food_trucks(query="geez", status=None, page=1)
+        by_status = await service.get_food_trucks_by_status("approved", fields=("locationid", "applicant"))
+
+    assert total == 2
+    assert all(isinstance(truck, FoodTruck) for truck in trucks)
+    assert [truck.locationid for truck in by_status] == [1, 3]
+    mock_mongodb.get_collection.return_value.count_documents.assert_not_called()
+    mock_mongodb.get_collection.return_value.find.assert_not_called()
+
+def test_nearby(engine):
+    """Test that nearby results are sorted by distance and carry it"""
+    trucks = engine.nearby(latitude=37.7620, longitude=-122.4273, radius=1000, k=2)
+    assert [truck["locationid"] for truck in trucks] == [1, 4]
+    assert trucks[0]["distance"] == 0
+    assert all(truck["distance"] <= 1000 for truck in trucks)
+
+    trucks = engine.nearby(latitude=37.8058, longitude=-122.4159, radius=1000, k=10)
+    assert [truck["locationid"] for truck in trucks] == [2]
+
+def test_search_after(engine):
+    """Test that keyset pages follow locationid order and report the full total"""
+    trucks, total = engine.search_after(query=None, status=None, after=None, limit=3)
+    assert [truck["locationid"] for truck in trucks] == [1, 2, 3]
+    assert total == 4
+
+    trucks, total = engine.search_after(query=None, status=None, after=3, limit=3)
+    assert [truck["locationid"] for truck in trucks] == [4]
+
+    trucks, total = engine.search_after(query="geez", status=None, after=1, limit=3)
+    assert [truck["locationid"] for truck in trucks] == [4]
+    assert total == 2
+
+    trucks, total = engine.search_after(query=None, status="APPROVED", after=None, limit=1)
+    assert [truck["locationid"] for truck in trucks] == [1]
+    assert total == 2
+
+def test_search_with_fields(engine):
+    """Test that only the selected columns are materialized"""
+    trucks, _ = engine.search(query=None, status=None, page=1, page_size=2, fields=("locationid", "status"))
+    assert trucks == [{"locationid": 1, "status": "APPROVED"}, {"locationid": 2, "status": "REQUESTED"}]
+
+def test_lookup(engine):
+    """Test lookups by locationid and by permit"""
+    trucks = engine.lookup(locationids=[4, 2, 99], permits=[])
+    assert sorted(truck["locationid"] for truck in trucks) == [2, 4]
+    trucks = engine.lookup(locationids=[1], permits=["21MFF-00015", "NOPE"])
+    assert sorted(truck["locationid"] for truck in trucks) == [1, 2, 3, 4]
+
+def test_facets(engine):
+    """Test precomputed and query-scoped facet counts"""
+    facets = engine.facets(query=None, food_items_limit=10)
+    assert facets["total"] == 4
+    assert facets["status"] == [
+        {"value": "APPROVED", "count": 2},
+        {"value": "EXPIRED", "count": 1},
+        {"value": "REQUESTED", "count": 1}
+    ]
+    assert facets["facility_type"] == [{"value": "Truck", "count": 4}]
+    assert facets["food_items"] == [{"value": "Test Food", "count": 4}]
+
+    facets = engine.facets(query="geez", food_items_limit=10)
+    assert facets["total"] == 2
+    assert facets["status"] == [{"value": "APPROVED", "count": 1}, {"value": "EXPIRED", "count": 1}]
+
+def test_search_with_food(engine):
+    """Test the food filter on its own and combined with status and keyset pagination"""
+    engine.load_documents([
+        make_truck(1, "A", "1 ST", "APPROVED", food_items=["Tacos", "Burritos"]),
+        make_truck(2, "B", "2 ST", "APPROVED", food_items=["Hot dogs"]),
+        make_truck(3, "C", "3 ST", "EXPIRED", food_items=["Fish taco"]),
+    ], version=2)
+    trucks, total = engine.search(query=None, status=None, page=1, page_size=10, food="taco")
+    assert [truck["locationid"] for truck in trucks] == [1, 3]
+    trucks, total = engine.search(query=None, status="approved", page=1, page_size=10, food="tacos")
+    assert [truck["locationid"] for truck in trucks] == [1]
+    trucks, total = engine.search_after(query=None, status=None, after=1, limit=10, food="taco")
+    assert [truck["locationid"] for truck in trucks] == [3]
+    assert total == 2
+
+def test_suggest(engine):
+    """Test type-ahead over applicants and food items"""
+    assert [s["text"] for s in engine.suggest("gee", 10)] == ["Geez Tacos", "The Geez Freeze"]
+    assert engine.suggest("test", 10) == [{"text": "Test Food", "kind": "food_item", "count": 4}]
+
+def test_search_open_at(engine):
+    """Test that open_slot keeps trucks whose schedule covers that half hour"""
+    engine.load_documents([
+        make_truck(1, "A", "1 ST", "APPROVED", days_hours="Mo-Fr:10AM-2PM"),
+        make_truck(2, "B", "2 ST", "APPROVED", days_hours="Sa-Su:10AM-2PM"),
+        make_truck(3, "C", "3 ST", "EXPIRED", days_hours="Mo-Fr:11AM-12PM"),
+        make_truck(4, "D", "4 ST", "APPROVED", days_hours="sometimes"),
+    ], version=2)
+    monday_11am = 22
+    trucks, total = engine.search(query=None, status=None, page=1, page_size=10, open_slot=monday_11am)
+    assert [truck["locationid"] for truck in trucks] == [1, 3]
+    trucks, total = engine.search(query=None, status="approved", page=1, page_size=10, open_slot=monday_11am)
+    assert [truck["locationid"] for truck in trucks] == [1]
+    trucks, total = engine.search_after(query=None, status=None, after=1, limit=10, open_slot=monday_11am)
+    assert [truck["locationid"] for truck in trucks] == [3]
+    assert total == 2
+
+def test_search_fuzzy(engine):
+    """Test that fuzzy queries tolerate typos in applicant names and rank by distance"""
+    trucks, total = engine.search(query="Geez Frieze", status=None, page=1, page_size=10)
+    assert total == 0
+    trucks, total = engine.search(query="Geez Frieze", status=None, page=1, page_size=10, fuzzy=True)
+    assert [truck["locationid"] for truck in trucks] == [1]
+    trucks, total = engine.search(query="tacos", status=None, page=1, page_size=10, fuzzy=True)
+    assert [truck["locationid"] for truck in trucks] == [4, 3]
+    trucks, total = engine.search_after(query="tacso", status="approved", after=None, limit=10, fuzzy=True)
+    assert [truck["locationid"] for truck in trucks] == [3]
+    assert total == 1
+
+@pytest.mark.asyncio
+async def test_load_builds_columns_off_the_event_loop():
+    """Test that load builds the columns in a worker thread and swaps them in"""
+    engine = FoodTruckEngine()
+    with patch("app.services.food_truck_engine.settings") as mock_settings, \
+            patch("app.services.food_truck_engine.dataset_version.fetch", AsyncMock(return_value=3)), \
+            patch("app.services.food_truck_engine.mongodb") as mock_mongodb, \
+            patch("app.services.food_truck_engine.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+        mock_settings.snapshot_dir = ""
+        mock_mongodb.get_collection.return_value.find.return_value.to_list = AsyncMock(return_value=[make_truck(1, "A", "1 ST", "APPROVED")])
+        await engine.load()
+
+    assert to_thread.call_count == 1
+    assert engine.version == 3
+    assert engine.search(query=None, status=None, page=1, page_size=10)[1] == 1
@@ -1,8 +1,14 @@
+import asyncio
 import pytest
+from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.services.food_truck_service import FoodTruckService
-from app.models.food_truck import FoodTruck
+from fastapi import HTTPException
+from pymongo.errors import ExecutionTimeout
+from app.services.food_truck_service import FoodTruckService, count_cache
+from app.services.limiter import query_timeouts
+from app.models.food_truck import FOOD_TRUCK_PROJECTION, FoodTruck
 from app.database.mongodb import MongoDB
+from app.services.pagination import encode_cursor
 
 @pytest.fixture
 def mock_collection():
@@ -24,7 +30,15 @@ def mock_mongodb(mock_collection):
         yield mock_mongodb
 
 @pytest.fixture
-def food_truck_service(mock_mongodb, mock_collection):
+def mock_dataset_version():
+    """Fixture to pin the dataset version and start every test with an empty count cache."""
+    with patch('app.services.food_truck_service.dataset_version') as mock_dataset_version:
+        mock_dataset_version.current = AsyncMock(return_value=1)
+        count_cache.clear()
+        yield mock_dataset_version
+
+@pytest.fixture
+def food_truck_service(mock_mongodb, mock_collection, mock_dataset_version):
     """Fixture to create a FoodTruckService instance with a mock collection."""
     service = FoodTruckService()
     return service
@@ -35,10 +49,13 @@ def setup_mock_cursor(mock_collection, mock_trucks):
     cursor = MagicMock()
     cursor.skip = MagicMock(return_value=cursor)
     cursor.limit = MagicMock(return_value=cursor)
+    cursor.sort = MagicMock(return_value=cursor)
+    cursor.max_time_ms = MagicMock(return_value=cursor)
     cursor.to_list = AsyncMock(return_value=mock_trucks)
     
-    # Make find() return our cursor
+    # Make find() and aggregate() (ranked searches) return our cursor
     mock_collection.find = MagicMock(return_value=cursor)
+    mock_collection.aggregate = MagicMock(return_value=cursor)
     return cursor
 
 @pytest.mark.asyncio
@@ -72,11 +89,15 @@ async def test_get_food_trucks_with_query(food_truck_service, mock_collection):
     assert isinstance(trucks[0], FoodTruck)
     assert trucks[0].applicant == "Test Truck"
     
-    # Verify MongoDB was called correctly
-    mock_collection.find.assert_called_once()
+    # Verify MongoDB was called correctly: a query ranks its matches in an aggregation
+    pipeline = mock_collection.aggregate.call_args[0][0]
     mock_collection.count_documents.assert_called_once()
-    mock_cursor.skip.assert_called_once_with(0)  # (page - 1) * page_size
-    mock_cursor.limit.assert_called_once_with(10)  # page_size
+    assert pipeline[0]["$match"] == mock_collection.count_documents.call_args[0][0]
+    assert pipeline[2] == {"$sort": {"search_rank": 1, "locationid": 1}}
+    assert pipeline[3:5] == [{"$skip": 0}, {"$limit": 10}]  # (page - 1) * page_size, page_size
+    assert mock_collection.aggregate.call_args.kwargs == {"maxTimeMS": 2000}
+    mock_cursor.to_list.assert_awaited_once()
+    mock_collection.find.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_get_food_trucks_with_status(food_truck_service, mock_collection):
@@ -143,7 +164,7 @@ async def test_get_food_trucks_by_status(food_truck_service, mock_collection):
     assert trucks[0].status == "APPROVED"
     
     # Verify MongoDB was called correctly
-    mock_collection.find.assert_called_once_with({"status": {"$regex": "^APPROVED$", "$options": "i"}})
+    mock_collection.find.assert_called_once_with({"status": "APPROVED"}, FOOD_TRUCK_PROJECTION)
 
 @pytest.mark.asyncio
 async def test_get_food_trucks_by_status_not_found(food_truck_service, mock_collection):
@@ -158,7 +179,7 @@ async def test_get_food_trucks_by_status_not_found(food_truck_service, mock_coll
     assert "No food trucks found with status: INVALID_STATUS" in str(exc_info.value)
     
     # Verify MongoDB was called correctly
-    mock_collection.find.assert_called_once_with({"status": {"$regex": "^INVALID_STATUS$", "$options": "i"}})
+    mock_collection.find.assert_called_once_with({"status": "INVALID_STATUS"}, FOOD_TRUCK_PROJECTION)
 
 @pytest.mark.asyncio
 async def test_get_food_trucks_pagination(food_truck_service, mock_collection):
@@ -178,8 +199,8 @@ async def test_get_food_trucks_pagination(food_truck_service, mock_collection):
         }
     ]
     
-    # Mock MongoDB responses
-    mock_collection.count_documents.return_value = 15  # Total of 15 items
+    # Mock MongoDB responses (unfiltered requests use the estimated count)
+    mock_collection.estimated_document_count.return_value = 15  # Total of 15 items
     mock_cursor = setup_mock_cursor(mock_collection, mock_trucks)
     
     # Test the service with page 2
@@ -192,4 +213,355 @@ async def test_get_food_trucks_pagination(food_truck_service, mock_collection):
     # Verify MongoDB was called correctly with pagination
     mock_collection.find.assert_called_once()
     mock_cursor.skip.assert_called_once_with(10)  # (page - 1) * page_size
-    mock_cursor.limit.assert_called_once_with(10)  # page_size 
\ No newline at end of file
+    mock_cursor.limit.assert_called_once_with(10)  # page_size 
+
+
+@pytest.mark.asyncio
+async def test_get_nearby_food_trucks(food_truck_service, mock_collection):
+    """Test getting the food trucks closest to a point."""
+    # Mock data
+    mock_trucks = [
+        {
+            "locationid": 1571753,
+            "applicant": "Test Truck",
+            "facility_type": "Truck",
+            "address": "123 Test St",
+            "food_items": ["Test Food"],
+            "latitude": 37.7620,
+            "longitude": -122.4273,
+            "status": "APPROVED",
+            "permit": "21MFF-00015",
+            "distance": 12.5
+        }
+    ]
+
+    # Mock MongoDB response
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=mock_trucks)
+    mock_collection.aggregate = MagicMock(return_value=cursor)
+
+    # Test the service
+    trucks = await food_truck_service.get_nearby_food_trucks(latitude=37.7621, longitude=-122.4273, radius=500, k=5)
+
+    # Verify results
+    assert len(trucks) == 1
+    assert trucks[0].distance == 12.5
+
+    # Verify MongoDB was called with a $geoNear pipeline
+    pipeline = mock_collection.aggregate.call_args[0][0]
+    assert pipeline[0]["$geoNear"]["near"] == {"type": "Point", "coordinates": [-122.4273, 37.7621]}
+    assert pipeline[0]["$geoNear"]["maxDistance"] == 500
+    assert pipeline[1] == {"$limit": 5}
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_query_uses_search_grams(food_truck_service, mock_collection):
+    """Test that the search query is matched literally and narrowed through the trigram index."""
+    mock_collection.count_documents.return_value = 0
+    setup_mock_cursor(mock_collection, [])
+
+    await food_truck_service.get_food_trucks(query="Taco (SF)", status=None, page=1)
+
+    filters = mock_collection.aggregate.call_args[0][0][0]["$match"]
+    assert filters["search_grams"] == {"$all": ["tac", "aco", "co ", "o (", " (s", "(sf", "sf)"]}
+    assert filters["$or"][0] == {"applicant": {"$regex": r"taco\s+\(sf\)", "$options": "i"}}
+    mock_collection.count_documents.assert_called_once_with(filters, maxTimeMS=500)
+
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_with_cursor(food_truck_service, mock_collection):
+    """Test keyset pagination seeks past the cursor instead of skipping."""
+    mock_collection.count_documents.return_value = 15
+    mock_cursor = setup_mock_cursor(mock_collection, [])
+
+    await food_truck_service.get_food_trucks(query=None, status="APPROVED", page=1, cursor=encode_cursor(42), limit=5)
+
+    # The total ignores the cursor, the page seeks past it
+    count_filters = mock_collection.count_documents.call_args[0][0]
+    assert "locationid" not in count_filters
+    find_filters = mock_collection.find.call_args[0][0]
+    assert find_filters["locationid"] == {"$gt": 42}
+    mock_cursor.sort.assert_called_once_with("locationid", 1)
+    mock_cursor.limit.assert_called_once_with(5)
+    mock_cursor.skip.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_with_invalid_cursor(food_truck_service, mock_collection):
+    """Test that a malformed cursor is rejected."""
+    with pytest.raises(HTTPException) as exc_info:
+        await food_truck_service.get_food_trucks(query=None, status=None, page=1, cursor="not-a-cursor", limit=5)
+
+    assert exc_info.value.status_code == 400
+    mock_collection.find.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_count_is_cached(food_truck_service, mock_collection, mock_dataset_version):
+    """Test that totals are cached per filter and dataset version."""
+    mock_collection.count_documents.return_value = 3
+    setup_mock_cursor(mock_collection, [])
+
+    _, first = await food_truck_service.get_food_trucks(query="taco", status=None, page=1)
+    _, second = await food_truck_service.get_food_trucks(query="  TACO", status=None, page=2)
+    assert first == second == 3
+    mock_collection.count_documents.assert_called_once()
+
+    # A new dataset version invalidates the cached total
+    mock_dataset_version.current.return_value = 2
+    await food_truck_service.get_food_trucks(query="taco", status=None, page=1)
+    assert mock_collection.count_documents.call_count == 2
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_without_total(food_truck_service, mock_collection):
+    """Test that no count is issued when the total is not requested."""
+    setup_mock_cursor(mock_collection, [])
+
+    trucks, total = await food_truck_service.get_food_trucks(query="taco", status=None, page=1, include_total=False)
+
+    assert total is None
+    mock_collection.count_documents.assert_not_called()
+    mock_collection.estimated_document_count.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_status_is_normalized(food_truck_service, mock_collection):
+    """Test that the status filter is an exact match on the normalized status."""
+    mock_collection.count_documents.return_value = 0
+    setup_mock_cursor(mock_collection, [])
+
+    await food_truck_service.get_food_trucks(query=None, status=" approved ", page=1)
+
+    mock_collection.find.assert_called_once_with({"status": "APPROVED"}, FOOD_TRUCK_PROJECTION)
+
+@pytest.mark.asyncio
+async def test_export_food_trucks(food_truck_service, mock_collection):
+    """Test that the export streams a batched cursor."""
+    mock_trucks = [{"locationid": 1}, {"locationid": 2}]
+
+    async def iterate():
+        for truck in mock_trucks:
+            yield truck
+
+    cursor = MagicMock()
+    cursor.batch_size = MagicMock(return_value=cursor)
+    cursor.__aiter__ = MagicMock(side_effect=iterate)
+    mock_collection.find = MagicMock(return_value=cursor)
+
+    trucks = [truck async for truck in food_truck_service.export_food_trucks(status="approved")]
+
+    assert trucks == mock_trucks
+    filters, projection = mock_collection.find.call_args[0]
+    assert filters == {"status": "APPROVED"}
+    assert projection["_id"] == 0
+    cursor.batch_size.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_skips_revalidation(food_truck_service, mock_collection):
+    """Test that trusted documents are projected and wrapped without validation."""
+    mock_collection.count_documents.return_value = 1
+    # A document that would fail validation proves the fast path doesn't validate
+    setup_mock_cursor(mock_collection, [{"locationid": "not-validated", "applicant": "Test Truck"}])
+
+    trucks, _ = await food_truck_service.get_food_trucks(query="Test", status=None, page=1)
+
+    assert trucks[0].locationid == "not-validated"
+    assert mock_collection.aggregate.call_args[0][0][-1] == {"$project": FOOD_TRUCK_PROJECTION}
+    assert FOOD_TRUCK_PROJECTION["_id"] == 0
+    assert "search_grams" not in FOOD_TRUCK_PROJECTION
+
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_with_fields(food_truck_service, mock_collection):
+    """Test that selected fields become a MongoDB projection."""
+    mock_collection.count_documents.return_value = 1
+    setup_mock_cursor(mock_collection, [{"locationid": 1571753, "applicant": "Test Truck"}])
+
+    trucks, _ = await food_truck_service.get_food_trucks(
+        query="Test", status=None, page=1, fields=("locationid", "applicant")
+    )
+
+    assert trucks[0].applicant == "Test Truck"
+    assert mock_collection.aggregate.call_args[0][0][-1] == {"$project": {"_id": 0, "locationid": 1, "applicant": 1}}
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_batch(food_truck_service, mock_collection):
+    """Test that a batch is one $in query answered in request order with missing ids reported."""
+    mock_trucks = [
+        {"locationid": 3, "applicant": "C", "permit": "P2"},
+        {"locationid": 1, "applicant": "A", "permit": "P1"},
+        {"locationid": 2, "applicant": "B", "permit": "P2"},
+        {"locationid": 4, "applicant": "D", "permit": None},
+    ]
+    setup_mock_cursor(mock_collection, mock_trucks)
+
+    trucks, missing_locationids, missing_permits = await food_truck_service.get_food_trucks_batch(
+        locationids=[3, 99, 1, 4], permits=["P2", "NOPE"]
+    )
+
+    assert [truck.locationid for truck in trucks] == [3, 1, 4, 2]
+    assert missing_locationids == [99]
+    assert missing_permits == ["NOPE"]
+    mock_collection.find.assert_called_once_with(
+        {"$or": [{"locationid": {"$in": [3, 99, 1, 4]}}, {"permit": {"$in": ["P2", "NOPE"]}}]},
+        FOOD_TRUCK_PROJECTION
+    )
+
+@pytest.mark.asyncio
+async def test_get_food_truck_not_found(food_truck_service, mock_collection):
+    """Test that an unknown locationid is a 404."""
+    setup_mock_cursor(mock_collection, [])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await food_truck_service.get_food_truck(42)
+
+    assert exc_info.value.status_code == 404
+    mock_collection.find.assert_called_once_with({"locationid": {"$in": [42]}}, FOOD_TRUCK_PROJECTION)
+
+@pytest.mark.asyncio
+async def test_get_facets_from_summary(food_truck_service, mock_collection):
+    """Test that unscoped facets come from the stored summary without aggregating."""
+    summary = {"status": [], "facility_type": [], "food_items": [{"value": "Tacos", "count": 2}, {"value": "Soda", "count": 1}], "total": 3}
+    with patch('app.services.food_truck_service.read_facet_summary', AsyncMock(return_value=summary)):
+        facets = await food_truck_service.get_facets(query=None, food_items_limit=1)
+
+    assert facets["food_items"] == [{"value": "Tacos", "count": 2}]
+    mock_collection.aggregate.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_facets_with_query_aggregates(food_truck_service, mock_collection):
+    """Test that query-scoped facets fall back to one aggregation."""
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[{"status": [{"_id": "APPROVED", "count": 1}], "total": [{"count": 1}]}])
+    mock_collection.aggregate = MagicMock(return_value=cursor)
+
+    facets = await food_truck_service.get_facets(query="taco", food_items_limit=10)
+
+    assert facets["status"] == [{"value": "APPROVED", "count": 1}]
+    assert facets["total"] == 1
+    pipeline = mock_collection.aggregate.call_args.args[0]
+    assert "search_grams" in pipeline[0]["$match"]
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_with_food(food_truck_service, mock_collection):
+    """Test that the food filter uses the food_tokens index."""
+    mock_collection.count_documents.return_value = 0
+    setup_mock_cursor(mock_collection, [])
+
+    await food_truck_service.get_food_trucks(query=None, status="approved", page=1, food="Tacos")
+
+    mock_collection.find.assert_called_once_with(
+        {"status": "APPROVED", "food_tokens": {"$all": ["taco"]}}, FOOD_TRUCK_PROJECTION
+    )
+
+@pytest.mark.asyncio
+async def test_suggest_uses_suggester(food_truck_service, mock_collection):
+    """Test that suggestions come from the in-memory trie, not a query."""
+    with patch('app.services.food_truck_service.suggester.suggest', AsyncMock(return_value=[{"text": "Tacos", "kind": "food_item", "count": 3}])):
+        suggestions = await food_truck_service.suggest("tac", 5)
+
+    assert [suggestion.text for suggestion in suggestions] == ["Tacos"]
+    mock_collection.find.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_coalesces_identical_calls(food_truck_service, mock_collection):
+    """Test that identical concurrent searches share one query."""
+    async def slow_page(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return [{"locationid": 1, "applicant": "Test Truck"}]
+
+    cursor = setup_mock_cursor(mock_collection, [])
+    cursor.to_list = AsyncMock(side_effect=slow_page)
+    mock_collection.count_documents.return_value = 1
+
+    results = await asyncio.gather(
+        food_truck_service.get_food_trucks(query="Test", status=None, page=1),
+        food_truck_service.get_food_trucks(query="  test ", status=None, page=1),
+        food_truck_service.get_food_trucks(query="other", status=None, page=1)
+    )
+
+    assert results[0] is results[1]
+    assert mock_collection.aggregate.call_count == 2
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_count_timeout_drops_total(food_truck_service, mock_collection):
+    """Test that a count over its time budget degrades to a page without a total."""
+    setup_mock_cursor(mock_collection, [{"locationid": 1, "applicant": "Test Truck"}])
+    mock_collection.count_documents.side_effect = ExecutionTimeout("operation exceeded time limit")
+    timeouts = query_timeouts.value(query="count")
+
+    trucks, total = await food_truck_service.get_food_trucks(query="Test", status=None, page=1)
+
+    assert [truck.locationid for truck in trucks] == [1]
+    assert total is None
+    assert len(count_cache) == 0
+    assert query_timeouts.value(query="count") == timeouts + 1
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_query_timeout_is_503(food_truck_service, mock_collection):
+    """Test that a page query over its time budget is a fast 503."""
+    cursor = setup_mock_cursor(mock_collection, [])
+    cursor.to_list = AsyncMock(side_effect=ExecutionTimeout("operation exceeded time limit"))
+    mock_collection.count_documents.return_value = 1
+
+    with pytest.raises(HTTPException) as exc_info:
+        await food_truck_service.get_food_trucks(query="Test", status=None, page=1)
+
+    assert exc_info.value.status_code == 503
+    assert (exc_info.value.headers or {}).get("Retry-After") == "1"
+    assert mock_collection.aggregate.call_args.kwargs == {"maxTimeMS": 2000}
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_open_at(food_truck_service, mock_collection):
+    """Test that open_at becomes a $bitsAnySet filter on the schedule bitmap."""
+    mock_collection.count_documents.return_value = 0
+    setup_mock_cursor(mock_collection, [])
+
+    await food_truck_service.get_food_trucks(query=None, status=None, page=1, open_at=datetime(2024, 5, 6, 11, 15))
+
+    mock_collection.find.assert_called_once_with({"open_hours": {"$bitsAnySet": [22]}}, FOOD_TRUCK_PROJECTION)
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_fuzzy(food_truck_service, mock_collection):
+    """Test that fuzzy queries fetch the matcher's locationids and keep its ranking."""
+    setup_mock_cursor(mock_collection, [{"locationid": 3, "applicant": "Taco Express"}, {"locationid": 7, "applicant": "Geez Tacos"}])
+
+    with patch('app.services.food_truck_service.fuzzy_matcher.search', AsyncMock(return_value=[7, 3])) as search:
+        food_trucks, total = await food_truck_service.get_food_trucks(query="tacso", status="approved", page=1, fuzzy=True)
+
+    search.assert_called_once_with("tacso", 1000)
+    mock_collection.find.assert_called_once_with({"status": "APPROVED", "locationid": {"$in": [7, 3]}}, FOOD_TRUCK_PROJECTION)
+    assert [truck.locationid for truck in food_trucks] == [7, 3]
+    assert total == 2
+
+@pytest.mark.asyncio
+async def test_get_food_trucks_fuzzy_without_query(food_truck_service, mock_collection):
+    """Test that fuzzy without a query lists trucks like a plain search instead of matching nothing."""
+    setup_mock_cursor(mock_collection, [{"locationid": 3, "applicant": "Taco Express"}])
+    mock_collection.count_documents.return_value = 1
+
+    with patch('app.services.food_truck_service.fuzzy_matcher.search', AsyncMock()) as search:
+        food_trucks, total = await food_truck_service.get_food_trucks(query=None, status=None, page=1, fuzzy=True)
+
+    search.assert_not_called()
+    assert [truck.locationid for truck in food_trucks] == [3]
+
+@pytest.mark.asyncio
+async def test_get_viewport(food_truck_service, mock_collection):
+    """Test that a crowded viewport answers from the cluster table and a sparse one with a bbox query."""
+    bbox = (-122.5, 37.7, -122.3, 37.8)
+    cluster = {"latitude": 37.76, "longitude": -122.42, "count": 300, "status": {"APPROVED": 300}}
+    setup_mock_cursor(mock_collection, [{"locationid": 1, "applicant": "Test Truck"}])
+
+    with patch('app.services.food_truck_service.read_clusters', AsyncMock(return_value=[cluster])):
+        viewport = await food_truck_service.get_viewport(bbox=bbox, zoom=10)
+    assert viewport["total"] == 300
+    assert viewport["clusters"][0].count == 300
+    mock_collection.find.assert_not_called()
+
+    with patch('app.services.food_truck_service.read_clusters', AsyncMock(return_value=[{**cluster, "count": 1}])):
+        viewport = await food_truck_service.get_viewport(bbox=bbox, zoom=10)
+    assert [truck.locationid for truck in viewport["food_trucks"]] == [1]
+    assert viewport["clusters"] == []
+    mock_collection.find.assert_called_once_with(
+        {"latitude": {"$gte": 37.7, "$lte": 37.8}, "longitude": {"$gte": -122.5, "$lte": -122.3}}, FOOD_TRUCK_PROJECTION
+    )
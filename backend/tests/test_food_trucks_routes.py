@@ -1,11 +1,14 @@
+import json
 import pytest
 from unittest.mock import AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
 from app.services.food_truck_service import FoodTruckService
-from app.models.food_truck import FoodTruck
+from app.models.food_truck import Cluster, FoodTruck, NearbyFoodTruck, Suggestion
 from datetime import datetime
-from app.routes.food_trucks import get_food_truck_service
+from app.routes.food_trucks import get_food_truck_service, get_response_cache
+from app.services.response_cache import ResponseCache
+from app.services.pagination import encode_cursor
 from fastapi import HTTPException
 
 
@@ -13,7 +16,10 @@ from fastapi import HTTPException
 def mock_food_truck_service():
     """Fixture to create a mock FoodTruckService."""
     service = AsyncMock(spec=FoodTruckService)
+    service.get_dataset_version.return_value = 1
+    cache = ResponseCache(maxsize=16, ttl=None)
     app.dependency_overrides[get_food_truck_service] = lambda: service
+    app.dependency_overrides[get_response_cache] = lambda: cache
     yield service
     app.dependency_overrides = {}  # Clean up after test
 
@@ -60,7 +66,14 @@ def test_read_foodtrucks_with_query(client, mock_food_truck_service):
     mock_food_truck_service.get_food_trucks.assert_called_once_with(
         query="Test",
         status=None,
-        page=1
+        page=1,
+        cursor=None,
+        limit=None,
+        include_total=True,
+        fields=None,
+        food=None,
+        open_at=None,
+        fuzzy=False
     )
 
 def test_read_foodtrucks_with_status(client, mock_food_truck_service):
@@ -101,7 +114,14 @@ def test_read_foodtrucks_with_status(client, mock_food_truck_service):
     mock_food_truck_service.get_food_trucks.assert_called_once_with(
         query=None,
         status="APPROVED",
-        page=1
+        page=1,
+        cursor=None,
+        limit=None,
+        include_total=True,
+        fields=None,
+        food=None,
+        open_at=None,
+        fuzzy=False
     )
 
 def test_read_foodtrucks_pagination(client, mock_food_truck_service):
@@ -141,7 +161,14 @@ def test_read_foodtrucks_pagination(client, mock_food_truck_service):
     mock_food_truck_service.get_food_trucks.assert_called_once_with(
         query=None,
         status=None,
-        page=2
+        page=2,
+        cursor=None,
+        limit=None,
+        include_total=True,
+        fields=None,
+        food=None,
+        open_at=None,
+        fuzzy=False
     )
 
 def test_read_foodtrucks_by_status(client, mock_food_truck_service):
@@ -178,7 +205,7 @@ def test_read_foodtrucks_by_status(client, mock_food_truck_service):
     assert data[0]["status"] == "APPROVED"
     
     # Verify service was called correctly with status parameter
-    mock_food_truck_service.get_food_trucks_by_status.assert_called_once_with(status="APPROVED")
+    mock_food_truck_service.get_food_trucks_by_status.assert_called_once_with(status="APPROVED", fields=None)
 
 def test_read_foodtrucks_by_status_not_found(client, mock_food_truck_service):
     """Test getting food trucks by status when none are found."""
@@ -197,4 +224,439 @@ def test_read_foodtrucks_by_status_not_found(client, mock_food_truck_service):
     assert "No food trucks found with status: INVALID_STATUS" in data["detail"]
     
     # Verify service was called correctly with status parameter
-    mock_food_truck_service.get_food_trucks_by_status.assert_called_once_with(status="INVALID_STATUS") 
\ No newline at end of file
+    mock_food_truck_service.get_food_trucks_by_status.assert_called_once_with(status="INVALID_STATUS", fields=None) 
+
+
+def test_read_nearby_foodtrucks(client, mock_food_truck_service):
+    """Test getting food trucks near a point."""
+    # Mock data
+    mock_trucks = [
+        NearbyFoodTruck(
+            locationid=1571753,
+            applicant="Test Truck",
+            facility_type="Truck",
+            address="123 Test St",
+            food_items=["Test Food"],
+            latitude=37.7620,
+            longitude=-122.4273,
+            status="APPROVED",
+            permit="21MFF-00015",
+            distance=12.5
+        ) # type: ignore -> optional fields omitted
+    ]
+
+    # Mock service response
+    mock_food_truck_service.get_nearby_food_trucks.return_value = mock_trucks
+
+    # Make request
+    response = client.get("/foodtrucks/nearby?lat=37.7621&lon=-122.4273&radius=500&k=5")
+
+    # Verify response
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["distance"] == 12.5
+
+    # Verify service was called correctly
+    mock_food_truck_service.get_nearby_food_trucks.assert_called_once_with(
+        latitude=37.7621,
+        longitude=-122.4273,
+        radius=500,
+        k=5
+    )
+
+def test_read_nearby_foodtrucks_validation(client, mock_food_truck_service):
+    """Test that out of range coordinates are rejected."""
+    response = client.get("/foodtrucks/nearby?lat=120&lon=-122.4273")
+    assert response.status_code == 422
+    mock_food_truck_service.get_nearby_food_trucks.assert_not_called()
+
+
+def test_read_foodtrucks_with_cursor(client, mock_food_truck_service):
+    """Test keyset pagination returns a cursor for the next page."""
+    # Mock data
+    mock_trucks = [
+        FoodTruck(
+            locationid=locationid,
+            applicant="Test Truck",
+            facility_type="Truck",
+            address="123 Test St",
+            food_items=["Test Food"],
+            latitude=37.7620,
+            longitude=-122.4273,
+            status="APPROVED",
+            permit="21MFF-00015"
+        ) # type: ignore -> optional fields omitted
+        for locationid in (5, 7)
+    ]
+
+    # Mock service response
+    mock_food_truck_service.get_food_trucks.return_value = (mock_trucks, 15)
+
+    # Make request
+    response = client.get(f"/foodtrucks/?limit=2&cursor={encode_cursor(3)}")
+
+    # Verify response
+    assert response.status_code == 200
+    data = response.json()
+    assert [truck["locationid"] for truck in data["food_trucks"]] == [5, 7]
+    assert data["next_cursor"] == encode_cursor(7)
+
+    # Verify service was called correctly
+    mock_food_truck_service.get_food_trucks.assert_called_once_with(
+        query=None,
+        status=None,
+        page=1,
+        cursor=encode_cursor(3),
+        limit=2,
+        include_total=True,
+        fields=None,
+        food=None,
+        open_at=None,
+        fuzzy=False
+    )
+
+def test_read_foodtrucks_last_cursor_page(client, mock_food_truck_service):
+    """Test that a short keyset page has no next cursor."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 15)
+
+    response = client.get("/foodtrucks/?limit=2&cursor=abc")
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+def test_read_foodtrucks_limit_validation(client, mock_food_truck_service):
+    """Test that the limit is capped."""
+    response = client.get("/foodtrucks/?limit=1000")
+    assert response.status_code == 422
+    mock_food_truck_service.get_food_trucks.assert_not_called()
+
+
+def test_read_foodtrucks_without_total(client, mock_food_truck_service):
+    """Test that clients can opt out of the total."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], None)
+
+    response = client.get("/foodtrucks/?include_total=false")
+
+    assert response.status_code == 200
+    assert response.json()["total"] is None
+    assert mock_food_truck_service.get_food_trucks.call_args.kwargs["include_total"] is False
+
+
+def test_read_foodtrucks_is_cached(client, mock_food_truck_service):
+    """Test that repeated requests are served from the response cache with an ETag."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+
+    first = client.get("/foodtrucks/?query=Taco&status=approved")
+    second = client.get("/foodtrucks/?query=%20taco&status=APPROVED")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert "max-age" in first.headers["cache-control"]
+    mock_food_truck_service.get_food_trucks.assert_called_once()
+
+def test_read_foodtrucks_not_modified(client, mock_food_truck_service):
+    """Test that a matching If-None-Match is answered with 304 without querying."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+    etag = client.get("/foodtrucks/?page=3").headers["etag"]
+    mock_food_truck_service.get_food_trucks.reset_mock()
+
+    response = client.get("/foodtrucks/?page=3", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    mock_food_truck_service.get_food_trucks.assert_not_called()
+
+def test_read_foodtrucks_etag_changes_with_dataset_version(client, mock_food_truck_service):
+    """Test that a dataset version bump invalidates cached responses and ETags."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+    etag = client.get("/foodtrucks/").headers["etag"]
+
+    mock_food_truck_service.get_dataset_version.return_value = 2
+    response = client.get("/foodtrucks/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert mock_food_truck_service.get_food_trucks.call_count == 2
+
+def test_export_foodtrucks_ndjson(client, mock_food_truck_service):
+    """Test streaming an NDJSON export."""
+    async def export(status):
+        for locationid in (1, 2):
+            yield {"locationid": locationid, "applicant": "Test Truck", "food_items": []}
+
+    mock_food_truck_service.export_food_trucks.side_effect = export
+
+    response = client.get("/foodtrucks/export?status=APPROVED")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line)["locationid"] for line in lines] == [1, 2]
+    mock_food_truck_service.export_food_trucks.assert_called_once_with(status="APPROVED")
+
+def test_export_foodtrucks_csv(client, mock_food_truck_service):
+    """Test streaming a CSV export."""
+    async def export(status):
+        yield {"locationid": 1, "applicant": "Test Truck", "food_items": ["Tacos", "Burritos"]}
+
+    mock_food_truck_service.export_food_trucks.side_effect = export
+
+    response = client.get("/foodtrucks/export?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "foodtrucks.csv" in response.headers["content-disposition"]
+    header, row = response.text.splitlines()
+    assert header.startswith("locationid,applicant")
+    assert "Tacos: Burritos" in row
+
+def test_export_foodtrucks_invalid_format(client, mock_food_truck_service):
+    """Test that unknown formats are rejected."""
+    response = client.get("/foodtrucks/export?format=xml")
+    assert response.status_code == 422
+
+
+def test_read_foodtrucks_with_fields(client, mock_food_truck_service):
+    """Test that only the requested fields are returned."""
+    mock_trucks = [
+        FoodTruck.model_construct(locationid=1571753, applicant="Test Truck", latitude=37.7620, longitude=-122.4273)
+    ]
+    mock_food_truck_service.get_food_trucks.return_value = (mock_trucks, 1)
+
+    response = client.get("/foodtrucks/?fields=applicant,latitude,longitude")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["food_trucks"] == [
+        {"locationid": 1571753, "applicant": "Test Truck", "latitude": 37.7620, "longitude": -122.4273}
+    ]
+    assert data["total"] == 1
+    assert mock_food_truck_service.get_food_trucks.call_args.kwargs["fields"] == (
+        "locationid", "applicant", "latitude", "longitude"
+    )
+
+def test_read_foodtrucks_by_status_with_fields(client, mock_food_truck_service):
+    """Test sparse fields on the status route."""
+    mock_food_truck_service.get_food_trucks_by_status.return_value = [
+        FoodTruck.model_construct(locationid=1571753, status="APPROVED")
+    ]
+
+    response = client.get("/foodtrucks/status/APPROVED?fields=status")
+
+    assert response.status_code == 200
+    assert response.json() == [{"locationid": 1571753, "status": "APPROVED"}]
+    mock_food_truck_service.get_food_trucks_by_status.assert_called_once_with(
+        status="APPROVED", fields=("locationid", "status")
+    )
+
+def test_read_foodtrucks_with_unknown_fields(client, mock_food_truck_service):
+    """Test that unknown fields are rejected."""
+    response = client.get("/foodtrucks/?fields=applicant,secret")
+
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+    mock_food_truck_service.get_food_trucks.assert_not_called()
+
+def test_read_foodtruck(client, mock_food_truck_service):
+    """Test fetching one food truck by locationid."""
+    mock_food_truck_service.get_food_truck.return_value = FoodTruck.model_construct(locationid=1571753, applicant="Test Truck")
+
+    response = client.get("/foodtrucks/1571753")
+
+    assert response.status_code == 200
+    assert response.json()["applicant"] == "Test Truck"
+    mock_food_truck_service.get_food_truck.assert_called_once_with(1571753)
+
+def test_read_foodtruck_not_found(client, mock_food_truck_service):
+    """Test that an unknown locationid is a 404."""
+    mock_food_truck_service.get_food_truck.side_effect = HTTPException(status_code=404, detail="No food truck found with locationid: 1")
+
+    response = client.get("/foodtrucks/1")
+
+    assert response.status_code == 404
+
+def test_read_foodtruck_not_found_with_if_none_match_any(client, mock_food_truck_service):
+    """Test that If-None-Match: * doesn't turn a 404 into a 304."""
+    mock_food_truck_service.get_food_truck.side_effect = HTTPException(status_code=404, detail="No food truck found with locationid: 999")
+
+    response = client.get("/foodtrucks/999", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 404
+
+def test_read_foodtrucks_if_none_match_any(client, mock_food_truck_service):
+    """Test that If-None-Match: * is a 304 once the response exists."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+
+    response = client.get("/foodtrucks/", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 304
+    assert "etag" in response.headers
+
+def test_fixed_routes_win_over_locationid(client, mock_food_truck_service):
+    """Test that /nearby isn't captured by /{locationid}."""
+    mock_food_truck_service.get_nearby_food_trucks.return_value = []
+
+    response = client.get("/foodtrucks/nearby?lat=37.76&lon=-122.42")
+
+    assert response.status_code == 200
+    mock_food_truck_service.get_food_truck.assert_not_called()
+
+def test_read_foodtrucks_batch(client, mock_food_truck_service):
+    """Test the batch endpoint."""
+    mock_food_truck_service.get_food_trucks_batch.return_value = (
+        [FoodTruck.model_construct(locationid=2, applicant="B"), FoodTruck.model_construct(locationid=1, applicant="A")],
+        [99],
+        []
+    )
+
+    response = client.post("/foodtrucks/batch", json={"locationids": [2, 1, 99]})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [truck["locationid"] for truck in data["food_trucks"]] == [2, 1]
+    assert data["missing_locationids"] == [99]
+    assert data["missing_permits"] == []
+    mock_food_truck_service.get_food_trucks_batch.assert_called_once_with(locationids=[2, 1, 99], permits=[])
+
+def test_read_foodtrucks_batch_limits(client, mock_food_truck_service):
+    """Test that empty and oversized batches are rejected."""
+    assert client.post("/foodtrucks/batch", json={}).status_code == 422
+    assert client.post("/foodtrucks/batch", json={"locationids": list(range(101))}).status_code == 422
+    mock_food_truck_service.get_food_trucks_batch.assert_not_called()
+
+def test_read_foodtruck_facets(client, mock_food_truck_service):
+    """Test the facets endpoint."""
+    mock_food_truck_service.get_facets.return_value = {
+        "status": [{"value": "APPROVED", "count": 2}],
+        "facility_type": [{"value": "Truck", "count": 2}],
+        "food_items": [{"value": "Tacos", "count": 1}],
+        "total": 2
+    }
+
+    response = client.get("/foodtrucks/facets?query=taco&food_items=5")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == [{"value": "APPROVED", "count": 2}]
+    mock_food_truck_service.get_facets.assert_called_once_with(query="taco", food_items_limit=5)
+
+def test_suggest_foodtrucks(client, mock_food_truck_service):
+    """Test the type-ahead endpoint."""
+    mock_food_truck_service.suggest.return_value = [Suggestion(text="Tacos", kind="food_item", count=3)]
+
+    response = client.get("/foodtrucks/suggest?prefix=tac&limit=5")
+
+    assert response.status_code == 200
+    assert response.json() == [{"text": "Tacos", "kind": "food_item", "count": 3}]
+    mock_food_truck_service.suggest.assert_called_once_with(prefix="tac", limit=5)
+    assert client.get("/foodtrucks/suggest?prefix=").status_code == 422
+
+def test_read_foodtrucks_degraded_is_not_cached(client, mock_food_truck_service):
+    """Test that a list whose count timed out is served but not cached."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], None)
+
+    first = client.get("/foodtrucks/?query=taco")
+    client.get("/foodtrucks/?query=taco")
+
+    assert first.status_code == 200
+    assert first.json()["total"] is None
+    assert first.headers["cache-control"] == "no-store"
+    assert "etag" not in first.headers
+    assert mock_food_truck_service.get_food_trucks.call_count == 2
+
+def test_read_foodtrucks_overloaded(client, mock_food_truck_service):
+    """Test that shed requests surface as 503 with Retry-After."""
+    mock_food_truck_service.get_food_trucks.side_effect = HTTPException(
+        status_code=503, detail="Too many concurrent requests", headers={"Retry-After": "1"}
+    )
+
+    response = client.get("/foodtrucks/")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_read_foodtrucks_open_at(client, mock_food_truck_service):
+    """Test that open_at is passed through and open_now resolves to the current local time."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+
+    response = client.get("/foodtrucks/?open_at=2024-05-06T11:00:00")
+
+    assert response.status_code == 200
+    assert mock_food_truck_service.get_food_trucks.call_args.kwargs["open_at"] == datetime(2024, 5, 6, 11, 0)
+
+    client.get("/foodtrucks/?open_now=true")
+    assert mock_food_truck_service.get_food_trucks.call_args.kwargs["open_at"].tzinfo is not None
+    assert client.get("/foodtrucks/?open_at=noon").status_code == 422
+
+def test_read_foodtrucks_rejects_bad_page(client, mock_food_truck_service):
+    """Test that page numbers start at 1."""
+    assert client.get("/foodtrucks/?page=0").status_code == 422
+    assert client.get("/foodtrucks/?page=-1").status_code == 422
+    mock_food_truck_service.get_food_trucks.assert_not_called()
+
+def test_read_foodtrucks_fuzzy(client, mock_food_truck_service):
+    """Test that fuzzy is passed through and cached separately from the exact search."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+
+    exact = client.get("/foodtrucks/?query=geez+frieze")
+    fuzzy = client.get("/foodtrucks/?query=geez+frieze&fuzzy=true")
+
+    assert fuzzy.status_code == 200
+    assert mock_food_truck_service.get_food_trucks.call_args.kwargs["fuzzy"] is True
+    assert mock_food_truck_service.get_food_trucks.call_count == 2
+    assert exact.headers["etag"] != fuzzy.headers["etag"]
+
+def test_read_foodtrucks_columns_and_compression(client, mock_food_truck_service):
+    """Test the column-oriented shape and that cached bodies are served compressed per encoding."""
+    trucks = [FoodTruck.model_construct(locationid=i, applicant=f"Truck {i}" * 20) for i in range(20)]
+    mock_food_truck_service.get_food_trucks.return_value = (trucks, 20)
+
+    response = client.get(
+        "/foodtrucks/?fields=applicant",
+        headers={"Accept": "application/vnd.foodtrucks.columns+json", "Accept-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.foodtrucks.columns+json"
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    data = response.json()
+    assert data["food_trucks"]["locationid"] == list(range(20))
+    assert data["total"] == 20
+
+    plain = client.get("/foodtrucks/?fields=applicant", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json()["food_trucks"][0] == {"locationid": 0, "applicant": "Truck 0" * 20}
+    assert plain.headers["etag"] != response.headers["etag"]
+    assert mock_food_truck_service.get_food_trucks.call_count == 2
+    assert client.get("/foodtrucks/", headers={"Accept": "text/html"}).status_code == 406
+
+def test_small_cached_body_etag_has_no_encoding(client, mock_food_truck_service):
+    """Test that a body under the compression threshold is tagged as the identity body it is sent as."""
+    mock_food_truck_service.get_food_trucks.return_value = ([], 0)
+
+    compressed = client.get("/foodtrucks/", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/foodtrucks/", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in compressed.headers
+    assert compressed.headers["etag"] == plain.headers["etag"]
+    assert not compressed.headers["etag"].endswith('-gzip"')
+
+def test_read_foodtrucks_viewport(client, mock_food_truck_service):
+    """Test the viewport route's bbox parsing and cluster response."""
+    mock_food_truck_service.get_viewport.return_value = {
+        "food_trucks": [],
+        "clusters": [Cluster(latitude=37.76, longitude=-122.42, count=250, status={"APPROVED": 250})],
+        "total": 250
+    }
+
+    response = client.get("/foodtrucks/viewport?bbox=-122.5,37.7,-122.3,37.8&zoom=11")
+
+    assert response.status_code == 200
+    assert response.json()["clusters"][0]["count"] == 250
+    mock_food_truck_service.get_viewport.assert_called_once_with(bbox=(-122.5, 37.7, -122.3, 37.8), zoom=11)
+    assert client.get("/foodtrucks/viewport?bbox=1,2,3&zoom=11").status_code == 400
+    assert client.get("/foodtrucks/viewport?bbox=-122.5,37.7,-122.3,37.8&zoom=40").status_code == 422
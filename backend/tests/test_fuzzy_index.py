@@ -0,0 +1,29 @@
+from app.services.fuzzy_index import FuzzyIndex, deletes, edit_distance, max_distance_for, words
+
+NAMES = ["The Geez Freeze", "Geez Tacos", "Freezer Burn", None, "Taco Express"]
+
+def test_edit_distance():
+    """Test substitutions, insertions and adjacent swaps, and the distance cap"""
+    assert edit_distance("frieze", "freeze", 2) == 1
+    assert edit_distance("tacso", "tacos", 2) == 1
+    assert edit_distance("taco", "tacos", 1) == 1
+    assert edit_distance("kitten", "sitting", 2) is None
+    assert edit_distance("a", "abcd", 2) is None
+
+def test_deletes_and_thresholds():
+    """Test that deletes include the word itself and short words allow no typos"""
+    assert sorted(deletes("abc", 1)) == ["ab", "abc", "ac", "bc"]
+    assert len(list(deletes("aab", 2))) == len({"aab", "ab", "aa", "a", "b"})
+    assert [max_distance_for(word) for word in ("taco", "geez", "tac", "freezers")] == [1, 1, 0, 2]
+    assert words("  The GEEZ, the Freeze!") == ["the", "geez", "freeze"]
+
+def test_search_ranks_by_distance():
+    """Test that every query word must match and closer rows come first"""
+    index = FuzzyIndex(NAMES)
+    assert index.search("Geez Frieze", 10) == [0]
+    assert index.search("geex", 10) == [0, 1]
+    assert index.search("freezer", 10) == [2, 0]
+    assert index.search("tacos", 10) == [1, 4]
+    assert index.search("tacos", 1) == [1]
+    assert index.search("pizza", 10) == []
+    assert index.search("  ", 10) == []
@@ -0,0 +1,41 @@
+import math
+import random
+from app.services.geo_index import GeoGrid, haversine_meters
+
+def test_haversine_meters():
+    """Test the great-circle distance against a known value"""
+    # One degree of latitude is roughly 111.2 km
+    assert abs(haversine_meters(37.0, -122.0, 38.0, -122.0) - 111195) < 10
+    assert haversine_meters(37.7620, -122.4273, 37.7620, -122.4273) == 0
+
+def test_nearest_matches_brute_force():
+    """Test that the grid returns the same neighbours as a full scan"""
+    rng = random.Random(42)
+    latitudes = [37.70 + rng.random() * 0.12 for _ in range(500)]
+    longitudes = [-122.51 + rng.random() * 0.15 for _ in range(500)]
+    grid = GeoGrid(latitudes, longitudes)
+
+    for _ in range(20):
+        lat, lon = 37.70 + rng.random() * 0.12, -122.51 + rng.random() * 0.15
+        expected = sorted(
+            (haversine_meters(lat, lon, latitudes[i], longitudes[i]), i) for i in range(500)
+        )[:7]
+        assert grid.nearest(lat, lon, k=7) == expected
+
+def test_nearest_respects_radius():
+    """Test that points outside the radius are never returned"""
+    grid = GeoGrid([37.7620, 37.7700, 37.9000], [-122.4273, -122.4273, -122.4273])
+    results = grid.nearest(37.7620, -122.4273, k=10, max_distance=2000)
+    assert [i for _, i in results] == [0, 1]
+    assert results[1][0] < 2000
+
+def test_nearest_skips_missing_coordinates():
+    """Test that rows without coordinates are not indexed"""
+    grid = GeoGrid([math.nan, 37.7620], [math.nan, -122.4273])
+    assert [i for _, i in grid.nearest(37.7620, -122.4273, k=5)] == [1]
+
+def test_nearest_on_sparse_grid():
+    """Test that far-apart outliers are still found without walking every empty cell"""
+    grid = GeoGrid([0.0, 37.7620], [0.0, -122.4273])
+    assert [i for _, i in grid.nearest(37.7620, -122.4273, k=2)] == [1, 0]
+    assert GeoGrid([], []).nearest(37.7620, -122.4273, k=2) == []
@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+from app.main import app
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_healthz(client):
+    """Test that liveness reports pool state without touching the database"""
+    with patch("app.routes.health.mongodb.ping", new_callable=AsyncMock) as ping:
+        response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    assert set(response.json()["pool"]) == {"max_pool_size", "min_pool_size", "open_connections", "connections_in_use"}
+    ping.assert_not_called()
+
+def test_readyz(client):
+    """Test that readiness pings the database"""
+    with patch("app.routes.health.mongodb.ping", new_callable=AsyncMock) as ping:
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"database": "ok"}
+    ping.assert_awaited_once()
+
+def test_readyz_database_unavailable(client):
+    """Test that readiness fails with 503 when the database can't be reached"""
+    with patch("app.routes.health.mongodb.ping", new_callable=AsyncMock, side_effect=ServerSelectionTimeoutError("no servers")):
+        response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert response.json()["checks"]["database"] == "unavailable: ServerSelectionTimeoutError"
+
+def test_readyz_engine_loading(client):
+    """Test that readiness waits for the in-memory dataset when the engine is enabled"""
+    with patch("app.routes.health.mongodb.ping", new_callable=AsyncMock), \
+            patch("app.routes.health.settings.engine_enabled", True), \
+            patch("app.routes.health.food_truck_engine._columns", None):
+        response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["engine"] == "loading"
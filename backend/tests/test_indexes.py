@@ -0,0 +1,32 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.database.indexes import FOOD_TRUCK_INDEXES, ensure_indexes
+
+def test_registry_covers_query_fields():
+    """Test that every filtered and sorted field has an index"""
+    keys = {key for index in FOOD_TRUCK_INDEXES for key, _ in index.document["key"].items()}
+    assert {"locationid", "status", "permit", "search_grams", "food_tokens", "location", "latitude", "longitude"} <= keys
+    names = [index.document["name"] for index in FOOD_TRUCK_INDEXES]
+    assert len(names) == len(set(names))
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_missing_only():
+    """Test that only indexes missing from the collection are created"""
+    collection = AsyncMock()
+    collection.index_information.return_value = {"_id_": {}, "locationid_unique": {}}
+    collection.create_indexes.return_value = ["status_locationid"]
+
+    await ensure_indexes(collection)
+
+    created = collection.create_indexes.call_args[0][0]
+    assert "locationid_unique" not in [index.document["name"] for index in created]
+    assert len(created) == len(FOOD_TRUCK_INDEXES) - 1
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_is_idempotent():
+    """Test that nothing is created when every index exists"""
+    collection = AsyncMock()
+    collection.index_information.return_value = {index.document["name"]: {} for index in FOOD_TRUCK_INDEXES}
+
+    assert await ensure_indexes(collection) == []
+    collection.create_indexes.assert_not_called()
@@ -0,0 +1,211 @@
+import csv
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError
+from app.models.food_truck import FoodTruck
+from scripts.init_db import (
+    IngestStats, RowError, insert_chunk, iter_chunks, load_food_trucks, parse_chunk, parse_row,
+    rebuild_food_trucks, sync_food_trucks
+)
+
+CSV_PATH = str(Path(__file__).parent.parent / "Mobile_Food_Facility_Permit.csv")
+
+ROW = {
+    "locationid": "1571753",
+    "Applicant": "The Geez Freeze",
+    "FacilityType": "",
+    "LocationDescription": "18TH ST: DOLORES ST to CHURCH ST",
+    "Address": "3750 18TH ST",
+    "permit": "21MFF-00015",
+    "Status": "approved",
+    "FoodItems": "Snow Cones: Soft Serve Ice Cream: ",
+    "Latitude": "37.76201920035647",
+    "Longitude": "-122.42730642251331",
+    "Schedule": "http://example.com/schedule",
+    "dayshours": "",
+    "ExpirationDate": "11/15/2022 12:00:00 AM"
+}
+
+def test_parse_row():
+    """Test that a CSV row becomes a valid food truck document"""
+    foodtruck = parse_row(ROW)
+    assert foodtruck["locationid"] == 1571753
+    assert foodtruck["facility_type"] == "Not Assigned"
+    assert foodtruck["food_items"] == ["Snow Cones", "Soft Serve Ice Cream"]
+    assert foodtruck["status"] == "APPROVED"
+    assert foodtruck["days_hours"] is None
+    assert foodtruck["expiration_date"] == datetime(2022, 11, 15)
+    assert foodtruck["location"] == {"type": "Point", "coordinates": [-122.42730642251331, 37.76201920035647]}
+    assert "gee" in foodtruck["search_grams"]
+    assert foodtruck["food_tokens"] == ["snow", "cone", "soft", "serve", "ice", "cream"]
+    assert foodtruck["open_hours"] is None
+    FoodTruck(**foodtruck)
+
+def test_parse_row_schedule():
+    """Test that days_hours is compiled to a bitmap, and kept without one when it doesn't parse"""
+    assert parse_row({**ROW, "dayshours": "Mo:12AM-1AM"})["open_hours"][0] == 0b11
+    foodtruck = parse_row({**ROW, "dayshours": "whenever"})
+    assert foodtruck["open_hours"] is None
+    stats = IngestStats()
+    stats.count_schedules([foodtruck, parse_row(ROW)])
+    assert stats.unparsed_schedules == {"whenever": 1}
+    assert "'whenever'" in stats.summary()
+
+def test_unknown_statuses_are_reported():
+    """Test that statuses outside FoodTruckStatus are kept but tallied"""
+    foodtruck = parse_row({**ROW, "Status": " pending "})
+    assert foodtruck["status"] == "PENDING"
+    stats = IngestStats()
+    stats.count_statuses([foodtruck, parse_row(ROW), parse_row({**ROW, "Status": ""})])
+    assert stats.unknown_statuses == {"PENDING": 1}
+    assert "1 rows with an unknown status" in stats.summary()
+
+def test_parse_row_rejections():
+    """Test that bad rows raise a RowError with a short reason"""
+    with pytest.raises(RowError, match="missing locationid"):
+        parse_row({**ROW, "locationid": ""})
+    with pytest.raises(RowError, match="invalid Latitude"):
+        parse_row({**ROW, "Latitude": "north"})
+    with pytest.raises(RowError, match="invalid ExpirationDate"):
+        parse_row({**ROW, "ExpirationDate": "tomorrow"})
+
+def test_parse_chunk_counts_rejections():
+    """Test that a chunk reports rejected rows by reason instead of failing"""
+    foodtrucks, rejected = parse_chunk([ROW, {**ROW, "locationid": "x"}, {**ROW, "locationid": "y"}])
+    assert len(foodtrucks) == 1
+    assert rejected == {"invalid locationid": 2}
+
+def test_iter_chunks():
+    """Test that the bundled CSV is streamed in fixed-size chunks"""
+    sizes = [len(chunk) for chunk in iter_chunks(CSV_PATH, 200)]
+    assert sizes == [200, 200, 88]
+
+@pytest.mark.asyncio
+async def test_insert_chunk_counts_duplicates():
+    """Test that duplicate keys in an unordered insert are reported as rejections"""
+    collection = AsyncMock()
+    collection.insert_many.side_effect = BulkWriteError({
+        "nInserted": 2,
+        "writeErrors": [{"code": 11000, "errmsg": "E11000 duplicate key"}]
+    })
+    stats = IngestStats()
+
+    await insert_chunk(collection, [{}, {}, {}], stats)
+
+    assert stats.inserted == 2
+    assert stats.rejected == {"duplicate locationid": 1}
+    assert collection.insert_many.call_args.kwargs["ordered"] is False
+
+@pytest.mark.asyncio
+async def test_load_food_trucks():
+    """Test the whole pipeline against the bundled CSV"""
+    collection = MagicMock()
+    inserted = []
+
+    async def insert_many(foodtrucks, ordered):
+        inserted.extend(foodtrucks)
+        return MagicMock(inserted_ids=[truck["locationid"] for truck in foodtrucks])
+
+    collection.insert_many = insert_many
+
+    stats = await load_food_trucks(collection, CSV_PATH, chunk_size=100, workers=2)
+
+    assert stats.rows == 488
+    assert stats.inserted == len(inserted) == 488 - sum(stats.rejected.values())
+    assert "488 rows" in stats.summary()
+
+def test_row_hash_tracks_content():
+    """Test that the stored hash changes only when the parsed content does"""
+    assert parse_row(ROW)["row_hash"] == parse_row(dict(ROW))["row_hash"]
+    assert parse_row(ROW)["row_hash"] != parse_row({**ROW, "Status": "EXPIRED"})["row_hash"]
+
+def mock_stored_collection(stored):
+    """Collection mock whose find() streams the given stored documents."""
+    async def iterate():
+        for doc in stored:
+            yield doc
+
+    async def bulk_write(operations, ordered):
+        # Replaces of a stored locationid match it, the others upsert.
+        stored_ids = {doc["locationid"] for doc in stored}
+        filters = [operation._filter for operation in operations if isinstance(operation, ReplaceOne)]
+        matched = sum(operation["locationid"] in stored_ids for operation in filters)
+        return MagicMock(matched_count=matched, upserted_count=len(filters) - matched)
+
+    cursor = MagicMock()
+    cursor.__aiter__ = MagicMock(side_effect=iterate)
+    collection = MagicMock()
+    collection.find = MagicMock(return_value=cursor)
+    collection.bulk_write = AsyncMock(side_effect=bulk_write)
+    return collection
+
+@pytest.mark.asyncio
+async def test_sync_food_trucks_applies_only_changes(tmp_path):
+    """Test that sync skips unchanged rows, upserts changed/new ones and deletes missing ones"""
+    path = tmp_path / "permits.csv"
+    rows = [ROW, {**ROW, "locationid": "2", "Status": "EXPIRED"}, {**ROW, "locationid": "3"}]
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(ROW))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    collection = mock_stored_collection([
+        {"locationid": 1571753, "row_hash": parse_row(ROW)["row_hash"]},
+        {"locationid": 2, "row_hash": "stale"},
+        {"locationid": 99, "row_hash": "gone"}
+    ])
+
+    stats = await sync_food_trucks(collection, str(path), chunk_size=2, workers=1)
+
+    assert (stats.unchanged, stats.updated, stats.inserted, stats.deleted) == (1, 1, 1, 1)
+    operations = [operation for call in collection.bulk_write.call_args_list for operation in call[0][0]]
+    replaced = [operation._filter["locationid"] for operation in operations if isinstance(operation, ReplaceOne)]
+    deleted = [operation._filter for operation in operations if isinstance(operation, DeleteMany)]
+    assert sorted(replaced) == [2, 3]
+    assert deleted == [{"locationid": {"$in": [99]}}]
+
+@pytest.mark.asyncio
+async def test_sync_food_trucks_rejects_refused_documents(tmp_path):
+    """Test that a document the server refuses is a rejection, not the end of the sync"""
+    path = tmp_path / "permits.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(ROW))
+        writer.writeheader()
+        writer.writerows([ROW, {**ROW, "locationid": "2"}])
+
+    collection = mock_stored_collection([])
+    collection.bulk_write.side_effect = BulkWriteError({
+        "nUpserted": 1,
+        "nMatched": 0,
+        "writeErrors": [{"code": 16755, "errmsg": "Can't extract geo keys"}]
+    })
+
+    stats = await sync_food_trucks(collection, str(path), chunk_size=10, workers=1)
+
+    assert (stats.inserted, stats.updated) == (1, 0)
+    assert stats.rejected == {"Can't extract geo keys": 1}
+
+@pytest.mark.asyncio
+async def test_rebuild_food_trucks_swaps_staging(monkeypatch):
+    """Test that a rebuild loads a staging collection and renames it over the live one"""
+    staging = MagicMock()
+    staging.drop = AsyncMock()
+    staging.rename = AsyncMock()
+    staging.index_information = AsyncMock(return_value={})
+    staging.create_indexes = AsyncMock()
+    collection = MagicMock()
+    collection.name = "foodtrucks"
+    collection.database.__getitem__.return_value = staging
+    load = AsyncMock(return_value=IngestStats())
+    monkeypatch.setattr("scripts.init_db.load_food_trucks", load)
+
+    await rebuild_food_trucks(collection, CSV_PATH, chunk_size=100, workers=1)
+
+    collection.database.__getitem__.assert_called_once_with("foodtrucks_staging")
+    staging.drop.assert_awaited_once()
+    staging.create_indexes.assert_awaited_once()
+    assert load.call_args[0][0] is staging
+    staging.rename.assert_awaited_once_with("foodtrucks", dropTarget=True)
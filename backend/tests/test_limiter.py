@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.services.limiter import ConcurrencyLimiter
+from app.services.metrics import registry
+
+@pytest.mark.asyncio
+async def test_slots_are_bounded():
+    """Test that at most max_concurrent holders run at once"""
+    limiter = ConcurrencyLimiter(max_concurrent=2, max_queued=10, queue_timeout=1)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work() for _ in range(6)))
+    assert peak == 2
+    assert (limiter.active, limiter.queued, limiter.rejected) == (0, 0, 0)
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_fast():
+    """Test that requests beyond the queue limit get a 503 with Retry-After"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queued=1, queue_timeout=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        async with limiter.slot():
+            pass
+    assert exc_info.value.status_code == 503
+    assert "Retry-After" in (exc_info.value.headers or {})
+    assert limiter.rejected == 1
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+
+@pytest.mark.asyncio
+async def test_queue_timeout():
+    """Test that waiting longer than the queue timeout is a 503"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queued=10, queue_timeout=0.01)
+    async with limiter.slot():
+        with pytest.raises(HTTPException) as exc_info:
+            async with limiter.slot():
+                pass
+    assert exc_info.value.status_code == 503
+    assert limiter.queued == 0
+
+def test_limiter_counters_are_exported():
+    """Test that rejections and timeouts are exposed as counters"""
+    output = registry.render()
+    assert "# TYPE query_limiter_rejected_total counter" in output
+    assert "# TYPE query_timeouts_total counter" in output
+    assert "# TYPE query_limiter_active gauge" in output
@@ -0,0 +1,94 @@
+import pytest
+from types import SimpleNamespace
+from typing import Any
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database.monitoring import CommandTimer, PoolMonitor
+from app.services.cache import LRUCache
+from app.services.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    mongodb_command_duration,
+    mongodb_pool_checkout_wait,
+    mongodb_pool_connections,
+    registry
+)
+
+def test_histogram_render():
+    """Test that histogram buckets are cumulative and include +Inf, sum and count"""
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+def test_gauge_and_label_escaping():
+    """Test gauge updates and escaping of label values"""
+    gauge = Gauge("in_flight", "In flight.", ("path",))
+    gauge.inc(path='say "hi"')
+    gauge.inc(path='say "hi"')
+    gauge.dec(path='say "hi"')
+    assert gauge.render()[-1] == 'in_flight{path="say \\"hi\\""} 1'
+
+def test_counter_render():
+    """Test that counters are typed as such, end in _total and never decrease"""
+    counter = Counter("requests", "Requests.", ("route",))
+    counter.inc(route="/a")
+    counter.inc(2, route="/a")
+    assert counter.render() == ["# HELP requests_total Requests.", "# TYPE requests_total counter", 'requests_total{route="/a"} 3']
+    with pytest.raises(ValueError):
+        counter.inc(-1, route="/a")
+
+def test_cache_hit_ratio():
+    """Test that registered caches are exposed with their hit ratio"""
+    cache = LRUCache(maxsize=4)
+    registry.register_cache("test", cache)
+    try:
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        output = registry.render()
+    finally:
+        del registry.caches["test"]
+    assert 'cache_hit_ratio{cache="test"} 0.5' in output
+    assert 'cache_hits_total{cache="test"} 1' in output
+    assert "# TYPE cache_misses_total counter" in output
+    assert "# TYPE single_flight_coalesced_total counter" in output
+    assert 'cache_hit_ratio{cache="count"}' in output
+    assert 'cache_hit_ratio{cache="response"}' in output
+
+def event(**fields) -> Any:
+    """A stand-in for a pymongo monitoring event carrying only `fields`."""
+    return SimpleNamespace(**fields)
+
+def test_mongodb_listeners():
+    """Test that command and pool events are recorded"""
+    before = mongodb_command_duration.count(command="find", outcome="success")
+    CommandTimer().succeeded(event(duration_micros=1500, command_name="find"))
+    assert mongodb_command_duration.count(command="find", outcome="success") == before + 1
+
+    waits = mongodb_pool_checkout_wait.count(outcome="success")
+    in_use = mongodb_pool_connections.value(state="in_use")
+    monitor = PoolMonitor()
+    monitor.connection_checked_out(event(duration=0.002))
+    assert mongodb_pool_checkout_wait.count(outcome="success") == waits + 1
+    assert mongodb_pool_connections.value(state="in_use") == in_use + 1
+    monitor.connection_checked_in(event())
+    assert mongodb_pool_connections.value(state="in_use") == in_use
+
+def test_metrics_endpoint():
+    """Test that requests are recorded under their route template"""
+    client = TestClient(app)
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert 'http_requests_in_progress{method="GET"} 1' in response.text
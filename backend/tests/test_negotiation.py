@@ -0,0 +1,40 @@
+import msgpack
+import pytest
+from typing import List
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from app.models.food_truck import Suggestion
+from app.services.negotiation import COLUMNS, JSON, MSGPACK, encode, negotiate
+
+OFFERED = (JSON, COLUMNS, MSGPACK)
+SUGGESTIONS = [Suggestion(text="Tacos", kind="food_item", count=3), Suggestion(text="Taco Bell", kind="applicant", count=1)]
+adapter = TypeAdapter(List[Suggestion])
+
+def test_negotiate_prefers_quality_then_offer_order():
+    """Test Accept parsing, quality values, wildcards and the JSON default"""
+    assert negotiate(None, OFFERED) == JSON
+    assert negotiate("*/*", OFFERED) == JSON
+    assert negotiate("application/msgpack", OFFERED) == MSGPACK
+    assert negotiate("application/x-msgpack", OFFERED) == MSGPACK
+    assert negotiate("application/json;q=0.5, application/msgpack", OFFERED) == MSGPACK
+    assert negotiate("application/*;q=0.2, application/vnd.foodtrucks.columns+json", OFFERED) == COLUMNS
+    assert negotiate("text/html, */*;q=0.1", OFFERED) == JSON
+
+def test_negotiate_not_acceptable():
+    """Test that a client accepting nothing offered gets a 406"""
+    with pytest.raises(HTTPException) as exc_info:
+        negotiate("text/html", (JSON,))
+    assert exc_info.value.status_code == 406
+    with pytest.raises(HTTPException):
+        negotiate("application/json;q=0", (JSON,))
+
+def test_encode_columns():
+    """Test that lists of rows become one array per field"""
+    body = encode(COLUMNS, adapter, SUGGESTIONS, columns=("text", "count"))
+    assert body == b'{"text":["Tacos","Taco Bell"],"count":[3,1]}'
+    assert encode(JSON, adapter, SUGGESTIONS) == adapter.dump_json(SUGGESTIONS)
+    assert encode(COLUMNS, adapter, SUGGESTIONS) == b'{"text":["Tacos","Taco Bell"],"kind":["food_item","applicant"],"count":[3,1]}'
+
+def test_encode_msgpack():
+    """Test that msgpack bodies decode to the JSON document"""
+    assert msgpack.unpackb(encode(MSGPACK, adapter, SUGGESTIONS)) == adapter.dump_python(SUGGESTIONS, mode="json")
@@ -0,0 +1,19 @@
+from app.services.packed import PackedText, Postings
+
+def test_postings():
+    """Test lookups, missing keys and tuple keys surviving a JSON round trip of the state"""
+    postings = Postings.from_dict({"taco": [0, 2], (1, 2): [5]})
+    assert list(postings["taco"]) == [0, 2]
+    assert postings.get("pizza") is None
+    assert list(postings) == ["taco", (1, 2)] and len(postings) == 2
+    state = postings.state()
+    restored = Postings.from_state({**state, "keys": ["taco", [1, 2]]})
+    assert list(restored[(1, 2)]) == [5]
+    assert restored.position("taco") == 0 and list(restored.at(1)) == [5]
+
+def test_packed_text():
+    """Test that strings, empty strings and None read back unchanged"""
+    values = ["Señor Sisig", "", None, "tacos"]
+    packed = PackedText.from_strings(values)
+    assert list(packed) == values
+    assert list(PackedText.from_state(packed.state())) == values
@@ -0,0 +1,36 @@
+from app.services.prefix_trie import PrefixTrie
+
+TERMS = [
+    ("applicant", "Senor Sisig"),
+    ("applicant", "Sisig Express"),
+    ("food_item", "Sisig"),
+    ("food_item", "Sisig"),
+    ("food_item", "Soda"),
+    ("applicant", "  "),
+]
+
+def test_suggest_ranks_term_starts_then_counts():
+    """Test that completions starting the term come first, most common first"""
+    trie = PrefixTrie(TERMS)
+    assert [s["text"] for s in trie.suggest("sis")] == ["Sisig", "Sisig Express", "Senor Sisig"]
+    assert trie.suggest("sis")[0] == {"text": "Sisig", "kind": "food_item", "count": 2}
+
+def test_suggest_normalizes_and_limits():
+    """Test case-folding, limits and unknown prefixes"""
+    trie = PrefixTrie(TERMS)
+    assert [s["text"] for s in trie.suggest("  S", limit=2)] == ["Sisig", "Senor Sisig"]
+    assert trie.suggest("xyz") == []
+
+def test_spellings_are_merged():
+    """Test that spellings differing only in case or spacing are one suggestion under the most common one"""
+    trie = PrefixTrie([("food_item", "Tacos")] * 3 + [("food_item", "tacos "), ("food_item", "TACOS"), ("applicant", "Tacos")])
+    assert trie.suggest("tac") == [
+        {"text": "Tacos", "kind": "food_item", "count": 5},
+        {"text": "Tacos", "kind": "applicant", "count": 1}
+    ]
+
+def test_top_k_is_bounded():
+    """Test that each node keeps at most top_k completions"""
+    trie = PrefixTrie([("applicant", f"Truck {i}") for i in range(50)], top_k=5)
+    assert len(trie.suggest("truck")) == 5
+    assert len(trie.suggest("truck 4")) == 5  # "truck 4" and "truck 40".."truck 49", capped
@@ -0,0 +1,23 @@
+from app.services.response_cache import etag_matches, make_etag, ResponseCache
+
+def test_make_etag_is_strong_and_stable():
+    """Test that ETags are quoted, strong and depend only on the key"""
+    etag = make_etag("key")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("key")
+    assert etag != make_etag("other")
+
+def test_etag_matches():
+    """Test If-None-Match parsing"""
+    etag = make_etag("key")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"abc", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"abc"', etag)
+
+def test_make_key_normalizes_parameter_order():
+    """Test that keys don't depend on parameter order but do depend on the version"""
+    assert ResponseCache.make_key("list", {"a": 1, "b": 2}, 1) == ResponseCache.make_key("list", {"b": 2, "a": 1}, 1)
+    assert ResponseCache.make_key("list", {"a": 1}, 1) != ResponseCache.make_key("list", {"a": 1}, 2)
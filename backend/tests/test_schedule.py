@@ -0,0 +1,51 @@
+import csv
+import pytest
+from datetime import datetime, timezone
+from pathlib import Path
+from app.services.schedule import (
+    BITMAP_BYTES, SLOTS_PER_DAY, ScheduleError, open_at_filter, parse_days_hours, schedule_bitmap, slot_at
+)
+
+CSV_PATH = Path(__file__).parent.parent / "Mobile_Food_Facility_Permit.csv"
+
+def open_slots(text):
+    bitmap = parse_days_hours(text)
+    return [slot for slot in range(7 * SLOTS_PER_DAY) if bitmap >> slot & 1]
+
+def test_parse_day_ranges_and_lists():
+    """Test that day ranges, day lists and several time ranges set the matching half hours"""
+    assert open_slots("Mo-Fr:10AM-11AM") == [day * SLOTS_PER_DAY + slot for day in range(5) for slot in (20, 21)]
+    assert open_slots("Mo/We:9AM-10AM/1PM-1:30PM") == [18, 19, 26, 2 * SLOTS_PER_DAY + 18, 2 * SLOTS_PER_DAY + 19, 2 * SLOTS_PER_DAY + 26]
+    assert open_slots("Sa:12AM-12:30AM;Su:12PM-1PM") == [5 * SLOTS_PER_DAY, 6 * SLOTS_PER_DAY + 24, 6 * SLOTS_PER_DAY + 25]
+
+def test_parse_overnight_and_wrapping_days():
+    """Test that ranges past midnight spill into the next day, wrapping Sunday into Monday"""
+    assert open_slots("Su:11PM-1AM") == [0, 1, 6 * SLOTS_PER_DAY + 46, 6 * SLOTS_PER_DAY + 47]
+    assert open_slots("Sa-Mo:12PM-12:30PM") == [24, 5 * SLOTS_PER_DAY + 24, 6 * SLOTS_PER_DAY + 24]
+
+def test_parse_errors():
+    """Test that text outside the grammar raises ScheduleError"""
+    for text in ("Mo-Fr", "Xx:9AM-5PM", "Mo:9-5", "Mo:13PM-2PM", ";"):
+        with pytest.raises(ScheduleError):
+            parse_days_hours(text)
+
+def test_bundled_schedules_parse():
+    """Test that every days_hours value in the bundled CSV parses"""
+    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+        values = {row["dayshours"].strip() for row in csv.DictReader(f)} - {""}
+    assert all(parse_days_hours(value) for value in values)
+
+def test_schedule_bitmap_bit_order():
+    """Test the little-endian packing that $bitsAnySet reads"""
+    assert schedule_bitmap("") is None
+    bitmap = schedule_bitmap("Mo:12AM-12:30AM;Tu:12AM-12:30AM")
+    assert bitmap is not None and len(bitmap) == BITMAP_BYTES
+    assert bitmap[0] == 1
+    assert bitmap[SLOTS_PER_DAY // 8] == 1
+    assert open_at_filter(3) == {"open_hours": {"$bitsAnySet": [3]}}
+
+def test_slot_at():
+    """Test that naive times are local and aware ones are converted to San Francisco time"""
+    assert slot_at(datetime(2024, 5, 6, 0, 29)) == 0
+    assert slot_at(datetime(2024, 5, 8, 12, 30)) == 2 * SLOTS_PER_DAY + 25
+    assert slot_at(datetime(2024, 5, 6, 19, 0, tzinfo=timezone.utc)) == 24
@@ -0,0 +1,85 @@
+import random
+import re
+import string
+from app.services.search_index import (
+    TrigramIndex, food_filter, food_tokens, normalize_text, search_filter, search_grams, search_rank, trigrams
+)
+
+def test_normalize_text():
+    """Test that normalization case-folds and collapses whitespace"""
+    assert normalize_text("  The  Geez\tFREEZE ") == "the geez freeze"
+    assert normalize_text(None) == ""
+
+def test_trigrams():
+    """Test that trigrams are distinct and short strings have none"""
+    assert trigrams("tacos") == ["tac", "aco", "cos"]
+    assert trigrams("aaaa") == ["aaa"]
+    assert trigrams("ab") == []
+
+def test_search_grams():
+    """Test the grams stored at ingest cover applicant and address"""
+    grams = search_grams("Taco", "1 Main St")
+    assert "tac" in grams and "mai" in grams
+    assert len(grams) == len(set(grams))
+
+def test_search_filter_escapes_user_input():
+    """Test that regex metacharacters in the query are matched literally"""
+    filters = search_filter("Joe's (Tacos)")
+    pattern = filters["$or"][0]["applicant"]["$regex"]
+    assert pattern == r"joe's\s+\(tacos\)"
+    assert filters["search_grams"] == {"$all": trigrams("joe's (tacos)")}
+
+def test_search_filter_short_query():
+    """Test that queries shorter than a trigram don't require grams"""
+    assert "search_grams" not in search_filter("ta")
+
+def test_search_matches_scan():
+    """Test that the index returns exactly the rows a substring scan finds"""
+    rng = random.Random(7)
+    words = ["taco", "truck", "geez", "freeze", "market", "st", "coffee", "cafe"]
+    applicants = [" ".join(rng.choice(words) for _ in range(3)) for _ in range(300)]
+    addresses = [f"{rng.randint(1, 999)} {rng.choice(string.ascii_uppercase)} ST" for _ in range(300)]
+    index = TrigramIndex(applicants, addresses)
+
+    for query in ["taco", "eez fr", "1 a st", "coffee cafe", "zzz", "st", "e"]:
+        needle = normalize_text(query)
+        expected = {i for i in range(300) if needle in normalize_text(applicants[i]) or needle in normalize_text(addresses[i])}
+        assert set(index.search(query)) == expected
+
+def test_search_relevance():
+    """Test the ranking of exact, prefix, word and address matches"""
+    index = TrigramIndex(
+        ["Big Taco", "Taco", "Tacos El Primo", "Pistacos", "Burger Bar"],
+        ["1 Main St", "2 Main St", "3 Main St", "4 Main St", "5 Taco Way"]
+    )
+    assert index.search("taco") == [1, 2, 0, 3, 4]
+    assert index.search("") == [0, 1, 2, 3, 4]
+
+def test_food_tokens():
+    """Test that food items become distinct words with simple plurals folded"""
+    assert food_tokens(["Tacos", "Hot Dogs: Chips", "Glass Noodles", "taco"]) == ["taco", "hot", "dog", "chip", "glass", "noodle"]
+    assert food_tokens(None) == []
+    assert food_filter("TACOS") == {"food_tokens": {"$all": ["taco"]}}
+    assert food_filter("!!") == {}
+
+def test_search_rank_matches_trigram_index():
+    """Test that the MongoDB rank expression orders matches like the in-memory index"""
+    rows = [("Taco Express", "1 Main St"), ("Senor Taco", "2 Main St"), ("Tacos", "3 Main St"),
+            ("Burritos", "Taco Way"), ("Pizza", "9 Mistaco Ave"), ("Supertacos", None)]
+    index = TrigramIndex([applicant for applicant, _ in rows], [address for _, address in rows])
+
+    def evaluate(expression, applicant, address):
+        # Evaluates the $switch the way MongoDB would, with Python's re standing in for PCRE.
+        values = {"$applicant": applicant, "$address": address}
+        for branch in expression["$switch"]["branches"]:
+            match = branch["case"]["$regexMatch"]
+            if re.search(match["regex"], values[match["input"]["$ifNull"][0]] or "", re.IGNORECASE):
+                return branch["then"]
+        return expression["$switch"]["default"]
+
+    for query in ("taco", "TACO express", "tacos"):
+        expression = search_rank(query)
+        for i, (applicant, address) in enumerate(rows):
+            expected = index.rank(i, normalize_text(query))
+            if expected is not None:
+                assert evaluate(expression, applicant, address) == expected, (query, applicant)
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_task():
+    """Test that identical concurrent calls run the work once"""
+    group = SingleFlight()
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return runs
+
+    results = await asyncio.gather(*(group.do("key", work) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert runs == 1
+    assert (group.calls, group.coalesced) == (1, 4)
+    assert len(group) == 0
+
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_cached():
+    """Test that a finished call is not reused"""
+    group = SingleFlight()
+
+    async def work():
+        return object()
+
+    assert await group.do("key", work) is not await group.do("key", work)
+    assert group.coalesced == 0
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_forgotten():
+    """Test that every waiter sees the error and the next call retries"""
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(group.do("key", fail), group.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(group) == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """Test that one waiter going away leaves the shared task running"""
+    group = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.create_task(group.do("key", work))
+    second = asyncio.create_task(group.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
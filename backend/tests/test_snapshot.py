@@ -0,0 +1,116 @@
+import os
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.food_truck_engine import FoodTruckEngine, _Columns, save_snapshot
+from app.services.snapshot import Snapshot, SnapshotError, open_snapshot, snapshot_path
+
+DOCS = [
+    {
+        "locationid": 2, "applicant": "Señor Sisig", "facility_type": "Truck", "location_description": None,
+        "address": "1 MARKET ST", "food_items": ["Sisig", "Tacos"], "latitude": 37.79, "longitude": -122.39,
+        "schedule": "http://example.com/schedule", "status": "APPROVED", "permit": "21MFF-00001",
+        "days_hours": "Mo-Fr:11AM-2PM", "expiration_date": datetime(2024, 11, 15, 12, 30)
+    },
+    {
+        "locationid": 1, "applicant": "Geez Freeze", "facility_type": None, "location_description": "",
+        "address": None, "food_items": [], "latitude": None, "longitude": None, "schedule": None,
+        "status": "EXPIRED", "permit": None, "days_hours": None, "expiration_date": None
+    },
+]
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    with patch("app.services.snapshot.settings") as mock_settings:
+        mock_settings.snapshot_dir = str(tmp_path)
+        mock_settings.collection_name = "foodtrucks"
+        yield tmp_path
+
+def test_snapshot_round_trip(snapshot_dir):
+    """Test that every column type reads back from the mapped file unchanged"""
+    save_snapshot(DOCS, version=3)
+    snapshot = open_snapshot(3)
+    assert snapshot is not None
+    assert snapshot.version == 3 and snapshot.size == 2
+    mapped = _Columns.from_snapshot(snapshot)
+    loaded = _Columns.from_documents(DOCS)
+    assert [mapped.row(i) for i in range(2)] == [loaded.row(i) for i in range(2)]
+    assert mapped.search_index.search("sisig") == [0]
+    assert isinstance(snapshot.values["latitude"], memoryview)
+
+def test_snapshot_restores_indexes(snapshot_dir):
+    """Test that a mapped snapshot answers every kind of query without rebuilding its indexes"""
+    save_snapshot(DOCS, version=3)
+    snapshot = open_snapshot(3)
+    assert snapshot is not None
+    loaded = _Columns.from_documents(DOCS)
+    with patch.object(_Columns, "_build_indexes", side_effect=AssertionError("indexes were rebuilt")):
+        mapped = _Columns.from_snapshot(snapshot)
+    assert isinstance(mapped.search_index.postings.rows, memoryview)
+    assert mapped.fuzzy_index.search("senor sisg", 10) == loaded.fuzzy_index.search("senor sisg", 10) == [0]
+    assert mapped.suggestions.suggest("s") == loaded.suggestions.suggest("s")
+    assert mapped.rows_open_at(22) == loaded.rows_open_at(22) == [0]
+    assert list(mapped.rows_by_permit["21MFF-00001"]) == [0]
+    assert list(mapped.rows_by_status["EXPIRED"]) == [1]
+    assert mapped.facet_counts == loaded.facet_counts
+    assert mapped.geo.nearest(37.79, -122.39, 1) == loaded.geo.nearest(37.79, -122.39, 1)
+    bbox = (-122.5, 37.7, -122.3, 37.8)
+    assert mapped.clusters.query(bbox, 12) == loaded.clusters.query(bbox, 12)
+
+def test_save_snapshot_replaces_older_versions(snapshot_dir):
+    """Test that writing a new version removes older snapshots and leaves no temporary files"""
+    save_snapshot(DOCS, version=1)
+    save_snapshot(DOCS[:1], version=2)
+    assert os.listdir(snapshot_dir) == [os.path.basename(snapshot_path(2))]
+    assert open_snapshot(1) is None
+    snapshot = open_snapshot(2)
+    assert snapshot is not None and snapshot.size == 1
+
+def test_truncated_snapshot_is_rejected(snapshot_dir):
+    """Test that a damaged file is reported instead of mapped"""
+    save_snapshot(DOCS, version=1)
+    path = snapshot_path(1)
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 8)
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
+    assert open_snapshot(1) is None
+
+@pytest.mark.asyncio
+async def test_engine_load_builds_then_maps_snapshot(snapshot_dir):
+    """Test that only the first worker reads MongoDB; later ones map its snapshot"""
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(return_value=DOCS)
+    with patch("app.services.food_truck_engine.settings") as mock_settings, \
+            patch("app.services.food_truck_engine.dataset_version.fetch", AsyncMock(return_value=5)), \
+            patch("app.services.food_truck_engine.mongodb") as mock_mongodb:
+        mock_settings.snapshot_dir = str(snapshot_dir)
+        mock_settings.engine_refresh_seconds = 0
+        mock_mongodb.get_collection.return_value = collection
+        first, second = FoodTruckEngine(), FoodTruckEngine()
+        await first.load()
+        await second.load()
+
+    assert collection.find.call_count == 1
+    assert second.version == 5
+    trucks, total = second.search(query=None, status="approved", page=1, page_size=10)
+    assert total == 1 and trucks[0]["food_items"] == ["Sisig", "Tacos"]
+
+@pytest.mark.asyncio
+async def test_engine_load_falls_back_when_snapshot_is_unusable(snapshot_dir):
+    """Test that a snapshot that can't be written or read back leaves the engine loaded from MongoDB"""
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(return_value=DOCS)
+    with patch("app.services.food_truck_engine.settings") as mock_settings, \
+            patch("app.services.food_truck_engine.dataset_version.fetch", AsyncMock(return_value=5)), \
+            patch("app.services.food_truck_engine.save_snapshot", side_effect=OSError("disk full")), \
+            patch("app.services.food_truck_engine.mongodb") as mock_mongodb:
+        mock_settings.snapshot_dir = str(snapshot_dir)
+        mock_settings.engine_refresh_seconds = 0
+        mock_mongodb.get_collection.return_value = collection
+        engine = FoodTruckEngine()
+        await engine.load()
+
+    assert engine.version == 5
+    trucks, total = engine.search(query=None, status="approved", page=1, page_size=10)
+    assert total == 1 and trucks[0]["locationid"] == 2
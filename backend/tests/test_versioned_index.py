@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.versioned_index import VersionedIndex
+
+class CountingIndex(VersionedIndex):
+    def __init__(self):
+        super().__init__()
+        self.builds = 0
+
+    async def build(self):
+        self.builds += 1
+        return f"index {self.builds}"
+
+@pytest.mark.asyncio
+async def test_loads_on_first_use_and_rebuilds_on_version_change():
+    """Test that the index is built once per dataset version, in the background after the first"""
+    index = CountingIndex()
+    with patch("app.services.versioned_index.dataset_version") as version:
+        version.fetch = AsyncMock(return_value=1)
+        version.current = AsyncMock(return_value=1)
+        assert await index.get() == "index 1"
+        assert await index.get() == "index 1"
+        assert index.builds == 1
+
+        version.fetch.return_value = version.current.return_value = 2
+        # The previous index keeps answering while the new one builds.
+        assert await index.get() == "index 1"
+        await asyncio.sleep(0)
+        assert await index.get() == "index 2"
+        assert index.builds == 2
+
+@pytest.mark.asyncio
+async def test_failed_rebuild_keeps_the_previous_index():
+    """Test that a rebuild error is logged and the old index stays in service"""
+    index = CountingIndex()
+    with patch("app.services.versioned_index.dataset_version") as version:
+        version.fetch = AsyncMock(return_value=1)
+        version.current = AsyncMock(return_value=2)
+        await index.load()
+        version.fetch.side_effect = RuntimeError("down")
+        assert await index.get() == "index 1"
+        assert index._refresh is not None
+        await index._refresh
+        assert await index.get() == "index 1"